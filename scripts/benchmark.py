@@ -0,0 +1,352 @@
+from argparse import ArgumentParser
+from datetime import UTC, datetime
+import json
+import logging
+from pathlib import Path
+import platform
+import shutil
+import statistics
+import tempfile
+import time
+from typing import Any
+
+from torch.utils.data import DataLoader
+
+from scripts.preprocess_dataset import preprocess_dataset
+from src.dataset.batch_transforms import BatchTransform
+from src.dataset.collate import collate_compact
+from src.dataset.ct_log_dataset import CTLogDataset
+from src.dataset.ct_log_mask_preprocessor import CTLogMaskPreprocessor
+from src.dataset.ct_log_stream_dataset import CTLogStreamDataset
+from src.utils.rasterizer import rasterize_objects
+from src.utils.synthetic import generate_synthetic_dataset
+
+
+def benchmark_rasterization(data_dir: Path, limit: int | None = None) -> dict[str, dict[str, float]]:
+    """Measures the rasterization time of single objects per geometry type.
+
+    Args:
+        data_dir: Path to the dataset directory in the Supervisely format.
+        limit: Maximum number of annotations to take objects from. If None, all annotations are used.
+
+    Returns:
+        dict[str, dict[str, float]]: For every geometry type the number of objects and the mean, median and p95
+            rasterization time in milliseconds.
+    """
+    dataset = CTLogMaskPreprocessor(data_dir=data_dir)
+    num_items = len(dataset) if limit is None else min(limit, len(dataset))
+
+    timings: dict[str, list[float]] = {}
+    for idx in range(num_items):
+        annotation = dataset.load_annotation(idx)
+        shape = (annotation["size"]["height"], annotation["size"]["width"])
+
+        for obj in annotation["objects"]:
+            start = time.perf_counter()
+            rasterize_objects([obj], shape, dataset.class_to_id, dataset.class_priority)
+            timings.setdefault(obj["geometryType"], []).append((time.perf_counter() - start) * 1e3)
+
+    return {
+        geometry: {
+            "objects": len(values),
+            "mean_ms": statistics.fmean(values),
+            "median_ms": statistics.median(values),
+            "p95_ms": statistics.quantiles(values, n=20)[-1] if len(values) > 1 else values[0],
+        }
+        for geometry, values in timings.items()
+    }
+
+
+def benchmark_preprocessing(data_dir: Path, mask_dir: Path, workers: list[int]) -> list[dict[str, float]]:
+    """Measures the per-item throughput of `preprocess_dataset` for several worker counts.
+
+    Args:
+        data_dir: Path to the dataset directory in the Supervisely format.
+        mask_dir: Path to the directory where the masks are written. It is cleared before every run.
+        workers: Worker counts to measure.
+
+    Returns:
+        list[dict[str, float]]: Number of workers, items, seconds and items per second of every run.
+    """
+    results = []
+    for num_workers in workers:
+        shutil.rmtree(mask_dir, ignore_errors=True)
+
+        start = time.perf_counter()
+        resolutions = preprocess_dataset(data_dir, mask_dir, num_workers)
+        seconds = time.perf_counter() - start
+
+        num_items = resolutions.total()
+        results.append(
+            {"workers": num_workers, "items": num_items, "seconds": seconds, "items_per_second": num_items / seconds},
+        )
+
+    return results
+
+
+def benchmark_dataloader(
+    data_dir: Path, workers: list[int], resolution: tuple[int, int] | None = None,
+) -> list[dict[str, float]]:
+    """Measures the samples per second of a DataLoader over `CTLogDataset` for several worker counts.
+
+    Args:
+        data_dir: Path to the dataset directory with images, annotations and masks.
+        workers: Worker counts to measure.
+        resolution: Target resolution of the dataset. If None, no resizing is applied.
+
+    Returns:
+        list[dict[str, float]]: Number of workers, samples, seconds and samples per second of every run.
+    """
+    dataset = CTLogDataset(data_dir=str(data_dir), resolution=resolution)
+
+    results = []
+    for num_workers in workers:
+        loader = DataLoader(dataset, batch_size=None, num_workers=num_workers)
+
+        start = time.perf_counter()
+        num_samples = sum(1 for _ in loader)
+        seconds = time.perf_counter() - start
+
+        results.append(
+            {
+                "workers": num_workers,
+                "samples": num_samples,
+                "seconds": seconds,
+                "samples_per_second": num_samples / seconds,
+            },
+        )
+
+    return results
+
+
+def benchmark_stream_loader(
+    data_dir: Path, workers: list[int], threads: list[int], prefetch: int = 16,
+) -> list[dict[str, float]]:
+    """Measures the samples per second of a DataLoader over `CTLogStreamDataset` for worker and thread counts.
+
+    Args:
+        data_dir: Path to the dataset directory with images, annotations and masks.
+        workers: Worker counts to measure.
+        threads: Thread counts per worker to measure.
+        prefetch: Maximum number of items loaded ahead in every worker.
+
+    Returns:
+        list[dict[str, float]]: Number of workers, threads, samples, seconds and samples per second of every run.
+    """
+    dataset = CTLogDataset(data_dir=str(data_dir))
+
+    results = []
+    for num_workers in workers:
+        for num_threads in threads:
+            stream = CTLogStreamDataset(dataset, threads=num_threads, prefetch=prefetch, ordered=False)
+            loader = DataLoader(stream, batch_size=None, num_workers=num_workers)
+
+            start = time.perf_counter()
+            num_samples = sum(1 for _ in loader)
+            seconds = time.perf_counter() - start
+
+            results.append(
+                {
+                    "workers": num_workers,
+                    "threads": num_threads,
+                    "samples": num_samples,
+                    "seconds": seconds,
+                    "samples_per_second": num_samples / seconds,
+                },
+            )
+
+    return results
+
+
+def benchmark_batch_transform(
+    data_dir: Path,
+    workers: list[int],
+    resolution: tuple[int, int],
+    batch_size: int = 8,
+    threads: int | None = None,
+) -> list[dict[str, Any]]:
+    """Compares the samples per second of resizing every sample in the workers against resizing whole batches.
+
+    The per-sample path resizes in `CTLogDataset` and collates with `collate_compact`, the batch path collates
+    samples of the original size with `BatchTransform`. Both load compact samples and return float32 images and
+    int64 masks of the same resolution, without augmentation.
+
+    Args:
+        data_dir: Path to the dataset directory with images, annotations and masks.
+        workers: Worker counts to measure.
+        resolution: (height, width) the samples are resized to.
+        batch_size: Number of samples per batch.
+        threads: Intra-op threads of the batch transform. If None, the torch setting of the process is kept.
+
+    Returns:
+        list[dict[str, Any]]: Path, number of workers, samples, seconds and samples per second of every run.
+    """
+    per_sample = CTLogDataset(
+        data_dir=str(data_dir), resolution=resolution, compact=True, load_annotations=False,
+    )
+    batched = CTLogDataset(data_dir=str(data_dir), compact=True, load_annotations=False)
+    batch_transform = BatchTransform(resolution, threads=threads)
+
+    results = []
+    for num_workers in workers:
+        for path, dataset, collate_fn in (
+            ("per_sample", per_sample, collate_compact),
+            ("batch", batched, batch_transform),
+        ):
+            loader = DataLoader(dataset, batch_size=batch_size, num_workers=num_workers, collate_fn=collate_fn)
+
+            start = time.perf_counter()
+            num_samples = sum(len(batch["image"]) for batch in loader)
+            seconds = time.perf_counter() - start
+
+            results.append(
+                {
+                    "path": path,
+                    "workers": num_workers,
+                    "samples": num_samples,
+                    "seconds": seconds,
+                    "samples_per_second": num_samples / seconds,
+                },
+            )
+
+    return results
+
+
+def main() -> None:
+    parser = ArgumentParser("Benchmark rasterization, preprocessing and data loading")
+    parser.add_argument(
+        "--data_dir",
+        type=Path,
+        default=None,
+        help="Dataset in the Supervisely format. If not given, a synthetic dataset is generated.",
+    )
+    parser.add_argument("--num_items", type=int, default=50, help="Number of generated synthetic items.")
+    parser.add_argument(
+        "--resolution",
+        type=int,
+        nargs=2,
+        default=(1024, 1024),
+        metavar=("HEIGHT", "WIDTH"),
+        help="Resolution of the generated synthetic items.",
+    )
+    parser.add_argument("--objects_per_item", type=int, default=20, help="Objects per generated synthetic item.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 2, 4], help="Worker counts to measure.")
+    parser.add_argument(
+        "--threads",
+        type=int,
+        nargs="+",
+        default=[4],
+        help="Prefetch thread counts per worker to measure with the streaming loader.",
+    )
+    parser.add_argument(
+        "--batch_resolution",
+        type=int,
+        nargs=2,
+        default=(512, 512),
+        metavar=("HEIGHT", "WIDTH"),
+        help="Resolution the per-sample and batch resize paths are compared at.",
+    )
+    parser.add_argument("--batch_size", type=int, default=8, help="Batch size of the resize path comparison.")
+    parser.add_argument(
+        "--transform_threads",
+        type=int,
+        default=None,
+        help="Intra-op threads of the batch transform. Defaults to the torch setting of the loading process.",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=None,
+        help="Path to save the results as JSON. Defaults to data/benchmarks/<timestamp>.json.",
+    )
+    args = parser.parse_args()
+
+    logger = logging.getLogger(__name__)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    timestamp = datetime.now(UTC)
+    output = args.output or Path("data/benchmarks") / f"{timestamp:%Y%m%dT%H%M%S}.json"
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_dir = args.data_dir
+        if data_dir is None:
+            data_dir = Path(tmp_dir) / "synthetic"
+            logger.info("Generating %d synthetic items in %s", args.num_items, data_dir)
+            generate_synthetic_dataset(
+                data_dir,
+                args.num_items,
+                [tuple(args.resolution)],
+                list(CTLogMaskPreprocessor.class_to_id),
+                args.objects_per_item,
+            )
+
+        logger.info("Benchmarking rasterization...")
+        rasterization = benchmark_rasterization(data_dir)
+        # Masks of a given dataset are never overwritten, only the synthetic one gets its masks in place.
+        mask_dir = (data_dir if args.data_dir is None else Path(tmp_dir)) / CTLogDataset.masks_dir
+        logger.info("Benchmarking preprocessing...")
+        preprocessing = benchmark_preprocessing(
+            data_dir, mask_dir, list(dict.fromkeys(max(1, workers) for workers in args.workers)),
+        )
+
+        dataloader, stream_loader, batch_transform = [], [], []
+        if (data_dir / CTLogDataset.masks_dir).exists():
+            logger.info("Benchmarking data loading...")
+            dataloader = benchmark_dataloader(data_dir, args.workers)
+            logger.info("Benchmarking streaming data loading...")
+            stream_loader = benchmark_stream_loader(data_dir, args.workers, args.threads)
+            logger.info("Benchmarking per-sample against batch resizing...")
+            batch_transform = benchmark_batch_transform(
+                data_dir, args.workers, tuple(args.batch_resolution), args.batch_size, args.transform_threads,
+            )
+        else:
+            logger.warning("Skipping the DataLoader benchmark, %s has no masks.", data_dir)
+
+    results: dict[str, Any] = {
+        "timestamp": timestamp.isoformat(),
+        "platform": {"python": platform.python_version(), "machine": platform.machine(), "system": platform.system()},
+        "config": {
+            "data_dir": str(args.data_dir) if args.data_dir is not None else None,
+            "num_items": args.num_items,
+            "resolution": args.resolution,
+            "objects_per_item": args.objects_per_item,
+            "workers": args.workers,
+            "threads": args.threads,
+            "batch_resolution": args.batch_resolution,
+            "batch_size": args.batch_size,
+            "transform_threads": args.transform_threads,
+        },
+        "rasterization": rasterization,
+        "preprocessing": preprocessing,
+        "dataloader": dataloader,
+        "stream_loader": stream_loader,
+        "batch_transform": batch_transform,
+    }
+
+    for geometry, stats in rasterization.items():
+        logger.info("Rasterization %-8s %6d objects, mean %.3f ms", geometry, stats["objects"], stats["mean_ms"])
+    for run in preprocessing:
+        logger.info("Preprocessing %2d workers: %.1f items/s", run["workers"], run["items_per_second"])
+    for run in dataloader:
+        logger.info("DataLoader    %2d workers: %.1f samples/s", run["workers"], run["samples_per_second"])
+    for run in stream_loader:
+        logger.info(
+            "Stream loader %2d workers, %2d threads: %.1f samples/s",
+            run["workers"],
+            run["threads"],
+            run["samples_per_second"],
+        )
+
+    for run in batch_transform:
+        logger.info(
+            "Resize %-10s %2d workers: %.1f samples/s", run["path"], run["workers"], run["samples_per_second"],
+        )
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with output.open("w") as f:
+        json.dump(results, f, indent=2)
+    logger.info("Saved results to %s", output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+from argparse import ArgumentParser
+import json
+import logging
+from pathlib import Path
+import subprocess
+import sys
+from typing import Any
+
+HEAVY_MODULES = frozenset({"cv2", "PIL", "torch", "torchvision", "plotly"})
+ALLOWS_PIL = frozenset({"PIL"})
+
+# Modules that must start fast, and the heavy modules they are allowed to import.
+LIGHT_MODULES: dict[str, frozenset[str]] = {
+    "src.utils.metadata": frozenset(),
+    "src.utils.manifest": frozenset(),
+    "src.utils.file_index": frozenset(),
+    "src.utils.archive": frozenset(),
+    "src.utils.sharding": frozenset(),
+    "src.utils.supervisely": frozenset(),
+    "src.utils.scan": frozenset(),
+    "src.utils.mask_codec": frozenset(),
+    "src.utils.mask": frozenset(),
+    "src.utils.rasterizer": frozenset(),
+    "src.utils.annotation_index": frozenset(),
+    "src.utils.class_stats": frozenset(),
+    "src.utils.integrity": frozenset(),
+    "src.utils.synthetic": ALLOWS_PIL,
+    "scripts.compute_resolution": frozenset(),
+    "scripts.scan_resolutions": frozenset(),
+    "scripts.check_dataset": frozenset(),
+    "scripts.export_annotations": ALLOWS_PIL,
+    "scripts.generate_synthetic_dataset": ALLOWS_PIL,
+}
+# Modules whose import time is only reported.
+REPORTED_MODULES = ("src.dataset.ct_log_dataset", "scripts.preprocess_dataset", "scripts.visualize_dataset")
+
+
+def measure_import(module: str, cwd: Path) -> dict[str, Any]:
+    """Imports a module in a fresh interpreter with `-X importtime` and parses the timings.
+
+    Args:
+        module: Dotted name of the module.
+        cwd: Directory the interpreter runs in, i.e. the repository root.
+
+    Returns:
+        dict[str, Any]: keys:
+            - ok: True if the import succeeded.
+            - cumulative_ms: Import time of the module including its dependencies.
+            - packages: Sorted top-level packages imported along with the module.
+            - slowest: Up to 10 (package, self time in ms) pairs of the slowest imported modules.
+            - error: Last line of the error output if the import failed.
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+
+    cumulative_ms, packages, self_times = None, set(), []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:") :].split("|"))
+        if not self_us.isdigit():
+            continue  # header line
+
+        packages.add(name.split(".")[0])
+        self_times.append((name, int(self_us) / 1e3))
+        if name == module:
+            cumulative_ms = int(cumulative_us) / 1e3
+
+    if process.returncode != 0:
+        return {"ok": False, "error": process.stderr.strip().splitlines()[-1] if process.stderr.strip() else ""}
+
+    return {
+        "ok": True,
+        "cumulative_ms": cumulative_ms,
+        "packages": sorted(packages),
+        "slowest": sorted(self_times, key=lambda item: item[1], reverse=True)[:10],
+    }
+
+
+def benchmark_imports(cwd: Path, repeats: int = 3) -> dict[str, dict[str, Any]]:
+    """Measures the import time of the light and reported modules, keeping the fastest of several runs.
+
+    Args:
+        cwd: Repository root.
+        repeats: Number of fresh interpreters per module.
+
+    Returns:
+        dict[str, dict[str, Any]]: Result of `measure_import` for every module.
+    """
+    results = {}
+    for module in (*LIGHT_MODULES, *REPORTED_MODULES):
+        runs = [measure_import(module, cwd) for _ in range(repeats)]
+        successful = [run for run in runs if run["ok"]]
+        results[module] = min(successful, key=lambda run: run["cumulative_ms"]) if successful else runs[-1]
+
+    return results
+
+
+def find_regressions(
+    results: dict[str, dict[str, Any]],
+    baseline: dict[str, dict[str, Any]] | None,
+    tolerance: float,
+    slack_ms: float = 5.0,
+) -> list[str]:
+    """Lists the light modules that fail to import, import heavy modules or got slower than the baseline.
+
+    Args:
+        results: Current results of `benchmark_imports`.
+        baseline: Results of an earlier run. If None, import times are not compared.
+        tolerance: Allowed relative slowdown against the baseline, e.g. 0.5 for 50 %.
+        slack_ms: Allowed absolute slowdown on top, so the noise of modules importing in a few milliseconds is
+            not reported.
+
+    Returns:
+        list[str]: Descriptions of the regressions, empty if there are none.
+    """
+    regressions = []
+    for module, allowed in LIGHT_MODULES.items():
+        result = results[module]
+        if not result["ok"]:
+            regressions.append(f"{module} fails to import: {result['error']}")
+            continue
+
+        heavy = sorted((HEAVY_MODULES - allowed) & set(result["packages"]))
+        if heavy:
+            regressions.append(f"{module} imports {', '.join(heavy)}")
+
+        previous = (baseline or {}).get(module, {})
+        if previous.get("ok") and result["cumulative_ms"] > previous["cumulative_ms"] * (1 + tolerance) + slack_ms:
+            regressions.append(
+                f"{module} imports in {result['cumulative_ms']:.1f} ms, "
+                f"{previous['cumulative_ms']:.1f} ms in the baseline",
+            )
+
+    return regressions
+
+
+def main() -> None:
+    parser = ArgumentParser("Measure module import times with -X importtime and guard fast startup")
+    parser.add_argument("--repeats", type=int, default=3, help="Fresh interpreters per module, the fastest counts.")
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        default=None,
+        help="Results of an earlier run to compare the import times of the light modules against.",
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=0.5, help="Allowed relative slowdown against the baseline.",
+    )
+    parser.add_argument(
+        "--slack_ms", type=float, default=5.0, help="Allowed absolute slowdown against the baseline.",
+    )
+    parser.add_argument("--output", type=Path, default=None, help="Path to save the results as JSON.")
+    args = parser.parse_args()
+
+    logger = logging.getLogger(__name__)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    root = Path(__file__).resolve().parent.parent
+    results = benchmark_imports(root, args.repeats)
+    for module, result in results.items():
+        if result["ok"]:
+            logger.info("%-40s %8.1f ms", module, result["cumulative_ms"])
+        else:
+            logger.info("%-40s   failed: %s", module, result["error"])
+
+    baseline = None
+    if args.baseline is not None:
+        with args.baseline.open("r") as f:
+            baseline = json.load(f)
+
+    if args.output is not None:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        with args.output.open("w") as f:
+            json.dump(results, f, indent=2)
+        logger.info("Saved results to %s", args.output)
+
+    regressions = find_regressions(results, baseline, args.tolerance, args.slack_ms)
+    for regression in regressions:
+        logger.error("Regression: %s", regression)
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
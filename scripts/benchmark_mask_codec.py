@@ -0,0 +1,107 @@
+from argparse import ArgumentParser
+import io
+import json
+import logging
+from pathlib import Path
+import time
+from typing import Any
+
+import numpy as np
+from PIL import Image
+
+from src.utils.mask_codec import (
+    decode_rle,
+    decode_rle_many,
+    encode_rle,
+    encode_rle_many,
+)
+
+
+def benchmark_mask_codec(mask_dir: Path, limit: int | None = None, repeats: int = 3) -> dict[str, Any]:
+    """Compares the size and decode throughput of PNG masks and RLE masks.
+
+    Args:
+        mask_dir: Directory containing the PNG masks written by the preprocessing.
+        limit: Maximum number of masks to benchmark. If None, all masks are used.
+        repeats: Number of timed repetitions, the fastest one is reported.
+
+    Returns:
+        dict[str, Any]: Sizes in bytes and decode throughput in masks and megapixels per second for every codec.
+    """
+    mask_paths = sorted(mask_dir.glob("*.png"))[:limit]
+    png_blobs = [path.read_bytes() for path in mask_paths]
+    masks = [np.asarray(Image.open(io.BytesIO(blob)).convert("L")) for blob in png_blobs]
+    num_pixels = sum(mask.size for mask in masks)
+
+    start = time.perf_counter()
+    rle_blobs = encode_rle_many(masks)
+    bulk_encode_time = time.perf_counter() - start
+    assert rle_blobs == [encode_rle(mask) for mask in masks], "Bulk and single-mask RLE encoders differ."
+
+    def best_time(decode: Any) -> float:
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            decode()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    timings = {
+        "png": best_time(lambda: [np.asarray(Image.open(io.BytesIO(blob)).convert("L")) for blob in png_blobs]),
+        "rle": best_time(lambda: [decode_rle(blob) for blob in rle_blobs]),
+        "rle_bulk": best_time(lambda: decode_rle_many(rle_blobs)),
+    }
+    sizes = {"png": sum(map(len, png_blobs)), "rle": sum(map(len, rle_blobs))}
+
+    return {
+        "num_masks": len(masks),
+        "num_pixels": num_pixels,
+        "size_bytes": {"png": sizes["png"], "rle": sizes["rle"], "rle_bulk": sizes["rle"]},
+        "bulk_encode_seconds": bulk_encode_time,
+        "decode": {
+            codec: {
+                "seconds": seconds,
+                "masks_per_second": len(masks) / seconds,
+                "megapixels_per_second": num_pixels / seconds / 1e6,
+            }
+            for codec, seconds in timings.items()
+        },
+    }
+
+
+def main() -> None:
+    parser = ArgumentParser("Compare the size and decode throughput of PNG and RLE masks")
+    parser.add_argument(
+        "mask_dir",
+        type=Path,
+        nargs="?",
+        default="data/processed/set_24/mask",
+        help="Directory containing the PNG masks.",
+    )
+    parser.add_argument("--limit", type=int, default=None, help="Maximum number of masks to benchmark.")
+    parser.add_argument("--output", type=Path, default=None, help="Path to save the results as JSON.")
+    args = parser.parse_args()
+
+    logger = logging.getLogger(__name__)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    results = benchmark_mask_codec(args.mask_dir, args.limit)
+
+    logger.info("Masks: %d (%.1f megapixels)", results["num_masks"], results["num_pixels"] / 1e6)
+    for codec, decode in results["decode"].items():
+        logger.info(
+            "%-8s size: %10d B, decode: %8.1f masks/s, %8.1f MP/s",
+            codec,
+            results["size_bytes"][codec],
+            decode["masks_per_second"],
+            decode["megapixels_per_second"],
+        )
+
+    if args.output is not None:
+        with args.output.open("w") as f:
+            json.dump(results, f, indent=2)
+        logger.info("Saved results to %s", args.output)
+
+
+if __name__ == "__main__":
+    main()
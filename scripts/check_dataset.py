@@ -0,0 +1,68 @@
+from argparse import ArgumentParser
+import json
+import logging
+from pathlib import Path
+import sys
+import time
+
+from src.utils.integrity import check_dataset
+from src.utils.supervisely import CLASS_TO_ID, supervisely_layout
+
+
+def main() -> None:
+    parser = ArgumentParser("Check the integrity of a dataset from file headers and annotation json only")
+    parser.add_argument(
+        "--data_dir",
+        type=Path,
+        default="data/raw/set_24",
+        help="Directory containing the dataset in the Supervisely format.",
+    )
+    parser.add_argument(
+        "--mask_dir",
+        type=Path,
+        default=None,
+        help="Directory with the processed masks to check against the images, e.g. data/processed/set_24/mask.",
+    )
+    parser.add_argument(
+        "--mask_format", choices=["png", "rle"], default="png", help="Format of the processed masks.",
+    )
+    parser.add_argument("--workers", type=int, default=8, help="Number of worker processes checking the items.")
+    parser.add_argument(
+        "--report",
+        type=Path,
+        default=None,
+        help="Path to save the machine-readable report as JSON.",
+    )
+    args = parser.parse_args()
+
+    logger = logging.getLogger(__name__)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    start = time.perf_counter()
+    report = check_dataset(
+        args.data_dir,
+        supervisely_layout(),
+        frozenset(CLASS_TO_ID),
+        args.mask_dir,
+        args.mask_format,
+        args.workers,
+    )
+    logger.info("Checked %d items in %.1f s", report["items"], time.perf_counter() - start)
+
+    for check, count in report["counts"].items():
+        logger.warning("%-26s %d issues", check, count)
+    for issue in report["issues"][:20]:
+        logger.warning("%s [%s] %s", issue["item"], issue["check"], issue["message"])
+
+    if args.report is not None:
+        args.report.parent.mkdir(parents=True, exist_ok=True)
+        with args.report.open("w") as f:
+            json.dump(report, f, indent=2)
+        logger.info("Saved report to %s", args.report)
+
+    # A non-zero exit status lets the check gate preprocessing and training runs.
+    sys.exit(0 if report["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+from argparse import ArgumentParser
+from functools import partial
+import json
+import logging
+from multiprocessing import Pool
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+from tqdm import tqdm
+
+from src.utils.file_index import IMAGE_SUFFIX
+from src.utils.mask import mask_to_bitmap_objects
+from src.utils.mask_codec import RLE_SUFFIX, load_rle
+from src.utils.supervisely import CLASS_TO_ID
+
+
+def load_class_mask(mask_path: Path) -> np.ndarray:
+    """Loads a [H, W] uint8 class-ID mask from a PNG or RLE file."""
+    if mask_path.suffix == RLE_SUFFIX:
+        return load_rle(mask_path)
+
+    return np.asarray(Image.open(mask_path).convert("L"))
+
+
+def export_annotation(mask_path: Path, output_dir: Path, min_area: int = 1, connectivity: int = 8) -> int:
+    """Converts a predicted class-ID mask into a Supervisely annotation with one bitmap object per component.
+
+    Args:
+        mask_path: Path to the PNG or RLE mask, named after its image, e.g. "0001.png" or "0001.rle".
+        output_dir: Directory the annotation is saved to as "<image name>.json".
+        min_area: Minimum number of pixels of a component, smaller ones are dropped.
+        connectivity: Pixel connectivity of the components, 4 or 8.
+
+    Returns:
+        int: Number of exported objects.
+    """
+    mask = load_class_mask(mask_path)
+    id_to_class = {class_id: title for title, class_id in CLASS_TO_ID.items()}
+    objects = mask_to_bitmap_objects(mask, id_to_class, min_area, connectivity)
+
+    height, width = mask.shape
+    annotation = {"description": "", "tags": [], "size": {"height": height, "width": width}, "objects": objects}
+    with (output_dir / f"{mask_path.stem}{IMAGE_SUFFIX}.json").open("w") as f:
+        json.dump(annotation, f)
+
+    return len(objects)
+
+
+def main() -> None:
+    parser = ArgumentParser("Export predicted class-ID masks as Supervisely bitmap annotations")
+    parser.add_argument(
+        "--mask_dir",
+        type=Path,
+        default="data/predictions/set_24",
+        help="Directory with the predicted PNG or RLE masks, named after their images.",
+    )
+    parser.add_argument(
+        "--output_dir",
+        type=Path,
+        default="data/predictions/set_24_supervisely/ann",
+        help="Directory to save the annotations to.",
+    )
+    parser.add_argument("--workers", type=int, default=8, help="Number of worker processes exporting masks.")
+    parser.add_argument("--min_area", type=int, default=1, help="Minimum number of pixels of an exported object.")
+    parser.add_argument(
+        "--connectivity", type=int, choices=[4, 8], default=8, help="Pixel connectivity of the objects.",
+    )
+    args = parser.parse_args()
+
+    logger = logging.getLogger(__name__)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    mask_paths = sorted(
+        path for path in args.mask_dir.iterdir() if path.suffix in (IMAGE_SUFFIX, RLE_SUFFIX) and path.is_file()
+    )
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+
+    export = partial(
+        export_annotation, output_dir=args.output_dir, min_area=args.min_area, connectivity=args.connectivity,
+    )
+    with Pool(processes=args.workers) as pool:
+        num_objects = sum(
+            tqdm(
+                pool.imap_unordered(export, mask_paths, chunksize=8),
+                total=len(mask_paths),
+                desc="Exporting annotations",
+                unit="mask",
+            ),
+        )
+
+    logger.info("Exported %d objects of %d masks to %s", num_objects, len(mask_paths), args.output_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+from argparse import ArgumentParser
+import logging
+from pathlib import Path
+
+from tqdm import tqdm
+
+from src.dataset.ct_log_dataset import CTLogDataset
+from src.utils.shards import ShardWriter
+
+
+def export_shards(data_dir: Path, out_dir: Path, shard_size: int, mask_format: str = "png") -> int:
+    """Packs the images and masks of a processed dataset into uint8 shard files.
+
+    Args:
+        data_dir: Path to the processed dataset directory containing images and masks.
+        out_dir: Path to the output directory where the shards and their index are written.
+        shard_size: Approximate maximum size of a single shard file in bytes.
+        mask_format: Format of the processed masks, "png" or "rle".
+
+    Returns:
+        int: Number of exported samples.
+    """
+    dataset = CTLogDataset(data_dir=data_dir, compact=True, mask_format=mask_format)
+
+    with ShardWriter(out_dir, shard_size) as writer:
+        for idx in tqdm(range(len(dataset)), desc="Exporting shards", unit="item"):
+            image = dataset.load_image(idx).numpy()
+            mask = dataset.load_mask(idx).squeeze(0).numpy()
+            writer.add(dataset.image_paths[idx].name, image, mask)
+
+    return len(dataset)
+
+
+def main() -> None:
+    parser = ArgumentParser("Pack a processed dataset into memory-mapped uint8 shards")
+    parser.add_argument(
+        "--data_dir",
+        type=Path,
+        default="data/processed/set_24",
+        help="Directory containing the processed dataset.",
+    )
+    parser.add_argument(
+        "--output_dir",
+        type=Path,
+        default=None,
+        help="Directory to save the shards. Defaults to <data_dir>/shards.",
+    )
+    parser.add_argument(
+        "--mask_format", choices=["png", "rle"], default="png", help="Format of the processed masks.",
+    )
+    parser.add_argument("--shard_size_mb", type=int, default=1024, help="Maximum size of a single shard in MB.")
+    args = parser.parse_args()
+
+    logger = logging.getLogger(__name__)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    output_dir = args.output_dir if args.output_dir is not None else args.data_dir / "shards"
+    num_items = export_shards(args.data_dir, output_dir, args.shard_size_mb * 1024 * 1024, args.mask_format)
+
+    logger.info("Exported %d samples to %s", num_items, output_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+from argparse import ArgumentParser
+import logging
+from pathlib import Path
+
+from src.utils.supervisely import CLASS_TO_ID
+from src.utils.synthetic import generate_synthetic_dataset
+
+
+def main() -> None:
+    parser = ArgumentParser("Generate a synthetic dataset in the Supervisely format")
+    parser.add_argument(
+        "--output_data_dir",
+        type=Path,
+        default="data/raw/synthetic",
+        help="Directory to save the synthetic dataset.",
+    )
+    parser.add_argument("--num_items", type=int, default=100, help="Number of images.")
+    parser.add_argument(
+        "--resolution",
+        type=int,
+        nargs=2,
+        action="append",
+        metavar=("HEIGHT", "WIDTH"),
+        help="Resolution of the images, may be given multiple times. Defaults to 512 512.",
+    )
+    parser.add_argument("--objects_per_item", type=int, default=20, help="Number of objects per annotation.")
+    parser.add_argument(
+        "--geometry_mix",
+        type=float,
+        nargs=3,
+        default=(0.1, 0.6, 0.3),
+        metavar=("POINT", "POLYGON", "BITMAP"),
+        help="Relative frequency of the point, polygon and bitmap geometry types.",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random number generator.")
+    args = parser.parse_args()
+
+    logger = logging.getLogger(__name__)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    resolutions = [tuple(resolution) for resolution in args.resolution] if args.resolution else [(512, 512)]
+    names = generate_synthetic_dataset(
+        args.output_data_dir,
+        args.num_items,
+        resolutions,
+        list(CLASS_TO_ID),
+        args.objects_per_item,
+        dict(zip(("point", "polygon", "bitmap"), args.geometry_mix)),
+        args.seed,
+    )
+
+    logger.info("Generated %d items in %s", len(names), args.output_data_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+from argparse import ArgumentParser
+import logging
+import os
+from pathlib import Path
+from typing import Any
+
+from torch.utils.data import DataLoader, Dataset
+
+from src.dataset.ct_log_dataset import CTLogDataset
+
+
+def read_memory() -> dict[str, int]:
+    """Reads the resident and private memory of the current process from /proc (Linux only).
+
+    Returns:
+        dict[str, int]: keys:
+            - rss_kb: Resident set size in kB, including pages shared with the parent process.
+            - private_kb: Private dirty memory in kB, i.e. pages written by this process, e.g. copied on write.
+    """
+    values = {}
+    with Path("/proc/self/smaps_rollup").open("r") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("Rss", "Private_Dirty"):
+                values[key] = int(rest.split()[0])
+
+    return {"rss_kb": values["Rss"], "private_kb": values["Private_Dirty"]}
+
+
+class MemoryProbe(Dataset):
+    """Wraps a dataset and returns the memory of the worker process after every item instead of the item.
+
+    Args:
+        dataset: Dataset to iterate over.
+        paths_only: If True, only the paths of an item are accessed, without loading any file.
+    """
+
+    def __init__(self, dataset: CTLogDataset, paths_only: bool = False) -> None:
+        self.dataset = dataset
+        self.paths_only = paths_only
+
+    def __len__(self) -> int:
+        return len(self.dataset)
+
+    def __getitem__(self, idx: int) -> dict[str, Any]:
+        if self.paths_only:
+            for paths in (self.dataset.annotation_paths, self.dataset.image_paths, self.dataset.mask_paths):
+                str(paths[idx])
+        else:
+            self.dataset[idx]
+
+        return {"pid": os.getpid(), **read_memory()}
+
+
+def measure_worker_memory(
+    dataset: CTLogDataset, workers: int, paths_only: bool = False,
+) -> dict[int, dict[str, int]]:
+    """Iterates over the dataset for one epoch and records the memory growth of every DataLoader worker.
+
+    Args:
+        dataset: Dataset to iterate over.
+        workers: Number of DataLoader workers.
+        paths_only: If True, only the paths of the items are accessed, without loading any file.
+
+    Returns:
+        dict[int, dict[str, int]]: For every worker pid the RSS and private memory after its first and last item
+            in kB.
+    """
+    loader = DataLoader(MemoryProbe(dataset, paths_only), batch_size=None, num_workers=workers)
+
+    workers_memory: dict[int, dict[str, int]] = {}
+    for sample in loader:
+        memory = workers_memory.setdefault(
+            sample["pid"], {"first_rss_kb": sample["rss_kb"], "first_private_kb": sample["private_kb"]},
+        )
+        memory["last_rss_kb"] = sample["rss_kb"]
+        memory["last_private_kb"] = sample["private_kb"]
+
+    return workers_memory
+
+
+def main() -> None:
+    parser = ArgumentParser("Measure the memory growth of DataLoader workers over one epoch")
+    parser.add_argument(
+        "--data_dir",
+        type=Path,
+        default="data/processed/set_24",
+        help="Directory containing the preprocessed dataset.",
+    )
+    parser.add_argument("--workers", type=int, default=4, help="Number of DataLoader workers.")
+    parser.add_argument(
+        "--paths_only",
+        action="store_true",
+        help="Only access the paths of the items, without loading any file.",
+    )
+    parser.add_argument(
+        "--path_lists",
+        action="store_true",
+        help="Replace the compact path stores with lists of Path objects, as before, for comparison.",
+    )
+    args = parser.parse_args()
+
+    logger = logging.getLogger(__name__)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    dataset = CTLogDataset(data_dir=str(args.data_dir), compact=True, load_annotations=False)
+    if args.path_lists:
+        for attribute in ("annotation_paths", "image_paths", "image_info_paths", "mask_paths"):
+            setattr(dataset, attribute, list(getattr(dataset, attribute)))
+
+    logger.info(
+        "%d items, %s paths, parent RSS %.1f MB",
+        len(dataset),
+        "list" if args.path_lists else "compact",
+        read_memory()["rss_kb"] / 1e3,
+    )
+
+    workers_memory = measure_worker_memory(dataset, args.workers, args.paths_only)
+    for pid, memory in sorted(workers_memory.items()):
+        logger.info(
+            "worker %d: RSS %.1f -> %.1f MB (+%.1f), private %.1f -> %.1f MB (+%.1f)",
+            pid,
+            memory["first_rss_kb"] / 1e3,
+            memory["last_rss_kb"] / 1e3,
+            (memory["last_rss_kb"] - memory["first_rss_kb"]) / 1e3,
+            memory["first_private_kb"] / 1e3,
+            memory["last_private_kb"] / 1e3,
+            (memory["last_private_kb"] - memory["first_private_kb"]) / 1e3,
+        )
+
+    growth = [memory["last_private_kb"] - memory["first_private_kb"] for memory in workers_memory.values()]
+    logger.info("Total private memory growth of %d workers: %.1f MB", len(growth), sum(growth) / 1e3)
+
+
+if __name__ == "__main__":
+    main()
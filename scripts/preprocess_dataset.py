@@ -1,41 +1,666 @@
 from argparse import ArgumentParser
-from collections import Counter
+from collections import Counter, deque
+from collections.abc import Iterable, Iterator
+from functools import partial
+import io
+from itertools import islice
+import json
 import logging
+from multiprocessing import Pool
+from multiprocessing.pool import AsyncResult
 from pathlib import Path
+import time
+from typing import Any
 import warnings
 
+import numpy as np
+from PIL import Image
 import torch
-import torchvision
 from tqdm import tqdm
 
+from scripts.compute_resolution import find_square_resolution_near_mean
+from src.dataset.ct_log_dataset import CTLogDataset
 from src.dataset.ct_log_mask_preprocessor import CTLogMaskPreprocessor
-from src.utils.metadata import save_resolutions
+from src.utils.archive import is_archive, iter_archive_items
+from src.utils.class_stats import mask_class_stats, save_class_stats
+from src.utils.file_index import format_unpaired
+from src.utils.instrumentation import StageRecords, instrumentation
+from src.utils.manifest import (
+    fingerprint_data,
+    hash_bytes,
+    is_file_unchanged,
+    load_manifest,
+    resolutions_from_manifest,
+    save_manifest,
+)
+from src.utils.mask_codec import RLE_SUFFIX, encode_rle
+from src.utils.metadata import load_resolutions, save_resolutions
+from src.utils.rasterizer import rasterize_objects
+from src.utils.sharding import shard_of, shard_path, validate_shard
+from src.utils.supervisely import ANNOTATIONS_DIR, IMAGE_DIR, supervisely_layout
 
+ChunkResult = tuple[Counter[tuple[int, int]], list[str], dict[str, dict[str, Any]], StageRecords]
+# Image file name, annotation and image content and their fingerprints of an item read from an archive.
+MemberItem = tuple[str, bytes, bytes, dict[str, dict[str, Any]]]
 
-def preprocess_dataset(src_dir: Path, out_dir: Path) -> Counter[tuple[int, int]]:
+_worker_dataset: CTLogMaskPreprocessor | None = None
+
+
+def mask_file_name(image_name: str, mask_format: str) -> str:
+    """Returns the file name of the mask of an image in the given format ("png" or "rle")."""
+    return image_name if mask_format == "png" else f"{Path(image_name).stem}{RLE_SUFFIX}"
+
+
+def encode_mask(mask: torch.Tensor, mask_format: str) -> bytes:
+    """Encodes a [H, W] class-ID mask as PNG or RLE bytes."""
+    if mask_format == "rle":
+        return encode_rle(mask.to(torch.uint8).numpy())
+
+    buffer = io.BytesIO()
+    Image.fromarray(mask.to(torch.uint8).numpy()).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def save_item(
+    name: str,
+    mask: torch.Tensor,
+    pith: torch.Tensor | None,
+    sources: dict[str, dict[str, Any]],
+    out_dir: Path,
+    mask_format: str = "png",
+) -> tuple[dict[str, Any], str | None]:
+    """Saves the mask of an item as a PNG image or an RLE file and computes its class statistics.
+
+    Args:
+        name: Image file name of the item.
+        mask: [H, W] uint8 mask with class IDs.
+        pith: [2] tensor with the pith point or None if the annotation has no point.
+        sources: Fingerprints of the "annotation" and "image" of the item.
+        out_dir: Path to the output directory where the mask will be saved.
+        mask_format: Format of the saved mask, "png" or "rle".
+
+    Returns:
+        tuple[dict[str, Any], str | None]: Manifest entry of the item and a warning message if the pith is
+            missing, None otherwise.
+    """
+    message = None
+    if pith is None:
+        message = f"Pith is None for image {name}. The annotation may be missing or incomplete."
+
+    with instrumentation.stage("class_stats", pixels=mask.numel()):
+        class_counts, class_bboxes = mask_class_stats(mask.numpy(), len(CTLogMaskPreprocessor.class_to_id))
+
+    with instrumentation.stage(f"mask_encode_{mask_format}", pixels=mask.numel()) as stage:
+        mask_bytes = encode_mask(mask, mask_format)
+        stage.nbytes = len(mask_bytes)
+
+    mask_path = out_dir / mask_file_name(name, mask_format)
+    with instrumentation.stage("mask_write", nbytes=len(mask_bytes)):
+        mask_path.write_bytes(mask_bytes)
+
+    mask_stat = mask_path.stat()
+    height, width = mask.shape
+    entry = {
+        **sources,
+        "mask": {"size": mask_stat.st_size, "mtime_ns": mask_stat.st_mtime_ns, "hash": hash_bytes(mask_bytes)},
+        "mask_file": mask_path.name,
+        "resolution": [height, width],
+        "class_counts": class_counts.tolist(),
+        "class_bboxes": class_bboxes.tolist(),
+        "pith": pith.tolist() if pith is not None else None,
+    }
+
+    return entry, message
+
+
+def process_item(
+    dataset: CTLogMaskPreprocessor, idx: int, out_dir: Path, mask_format: str = "png",
+) -> tuple[str, dict[str, Any], str | None]:
+    """Rasterizes the mask of a single item of a dataset and saves it with `save_item`.
+
+    Args:
+        dataset: Dataset to load the item from.
+        idx: Index of the item to process.
+        out_dir: Path to the output directory where the mask will be saved.
+        mask_format: Format of the saved mask, "png" or "rle".
+
+    Returns:
+        tuple[str, dict[str, Any], str | None]: Image file name, its manifest entry and a warning message
+            if the pith is missing, None otherwise.
+    """
+    batch = dataset[idx]
+    name = Path(batch["path"]).name
+    sources = {
+        "annotation": dataset.fingerprint(dataset.annotation_paths[idx]),
+        "image": dataset.fingerprint(dataset.image_paths[idx]),
+    }
+    entry, message = save_item(name, batch["mask"], batch["pith"], sources, out_dir, mask_format)
+
+    return name, entry, message
+
+
+def process_members(
+    name: str,
+    annotation_bytes: bytes,
+    image_bytes: bytes,
+    sources: dict[str, dict[str, Any]],
+    out_dir: Path,
+    mask_format: str = "png",
+) -> tuple[str, dict[str, Any], str | None]:
+    """Rasterizes the mask of a single item read from an archive and saves it with `save_item`.
+
+    The mask is identical to the one of `process_item` for the extracted item. The image is not decoded, its
+    size is read from its header.
+
+    Args:
+        name: Image file name of the item.
+        annotation_bytes: Content of the Supervisely json annotation.
+        image_bytes: Content of the image.
+        sources: Fingerprints of the "annotation" and "image" of the item.
+        out_dir: Path to the output directory where the mask will be saved.
+        mask_format: Format of the saved mask, "png" or "rle".
+
+    Returns:
+        tuple[str, dict[str, Any], str | None]: Image file name, its manifest entry and a warning message
+            if the pith is missing, None otherwise.
+    """
+    with instrumentation.stage("json_load", nbytes=len(annotation_bytes)):
+        annotation = json.loads(annotation_bytes)
+
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        width, height = image.size
+
+    with instrumentation.stage("rasterize", pixels=height * width):
+        mask = rasterize_objects(
+            annotation["objects"],
+            (height, width),
+            CTLogMaskPreprocessor.class_to_id,
+            CTLogMaskPreprocessor.class_priority,
+        )
+    pith = CTLogMaskPreprocessor.find_pith(annotation)
+    entry, message = save_item(name, torch.from_numpy(mask), pith, sources, out_dir, mask_format)
+
+    return name, entry, message
+
+
+def _chunk_result(results: Iterable[tuple[str, dict[str, Any], str | None]], in_worker: bool) -> ChunkResult:
+    """Collects the results of the items of a chunk."""
+    resolutions: Counter[tuple[int, int]] = Counter()
+    messages: list[str] = []
+    entries: dict[str, dict[str, Any]] = {}
+    for name, entry, message in results:
+        resolutions[tuple(entry["resolution"])] += 1
+        entries[name] = entry
+        if message is not None:
+            messages.append(message)
+
+    # In the main process the stages are already in place, only worker processes hand theirs over.
+    stage_records = instrumentation.drain() if in_worker else {}
+
+    return resolutions, messages, entries, stage_records
+
+
+def process_chunk(
+    indices: list[int], out_dir: Path, mask_format: str = "png", dataset: CTLogMaskPreprocessor | None = None,
+) -> ChunkResult:
+    """Processes a chunk of items, by default with the dataset of the current worker process.
+
+    Args:
+        indices: Indices of the items to process.
+        out_dir: Path to the output directory where the masks will be saved.
+        mask_format: Format of the saved masks, "png" or "rle".
+        dataset: Dataset to load the items from. If None, the worker dataset is used.
+
+    Returns:
+        ChunkResult: Partial resolutions counter, warning messages, manifest entries and the stages recorded by
+            the instrumentation of the chunk.
+    """
+    in_worker = dataset is None
+    dataset = _worker_dataset if in_worker else dataset
+    assert dataset is not None, "Worker dataset is not initialized."
+
+    return _chunk_result((process_item(dataset, idx, out_dir, mask_format) for idx in indices), in_worker)
+
+
+def process_member_chunk(
+    items: list[MemberItem], out_dir: Path, mask_format: str = "png", in_worker: bool = False,
+) -> ChunkResult:
+    """Processes a chunk of items read from an archive.
+
+    Args:
+        items: Items to process.
+        out_dir: Path to the output directory where the masks will be saved.
+        mask_format: Format of the saved masks, "png" or "rle".
+        in_worker: Whether the chunk is processed in a worker process, which hands over its recorded stages.
+
+    Returns:
+        ChunkResult: Partial resolutions counter, warning messages, manifest entries and the stages recorded by
+            the instrumentation of the chunk.
+    """
+    return _chunk_result((process_members(*item, out_dir, mask_format) for item in items), in_worker)
+
+
+def _init_worker(src_dir: Path) -> None:
+    """Creates the dataset once per worker process."""
+    global _worker_dataset
+    _worker_dataset = CTLogMaskPreprocessor(data_dir=src_dir)
+
+
+def _iterate_chunks(
+    dataset: CTLogMaskPreprocessor,
+    src_dir: Path,
+    out_dir: Path,
+    chunks: list[list[int]],
+    workers: int,
+    mask_format: str,
+) -> Iterator[ChunkResult]:
+    """Yields the results of the chunks in order, processing them in a process pool if workers > 1."""
+    if workers <= 1:
+        for chunk in chunks:
+            yield process_chunk(chunk, out_dir, mask_format, dataset)
+        return
+
+    with Pool(processes=workers, initializer=_init_worker, initargs=(src_dir,)) as pool:
+        yield from pool.imap(partial(process_chunk, out_dir=out_dir, mask_format=mask_format), chunks)
+
+
+def _iterate_member_chunks(
+    chunks: Iterable[list[MemberItem]], out_dir: Path, workers: int, mask_format: str,
+) -> Iterator[ChunkResult]:
+    """Yields the results of the chunks of archive items in order, processing them in a process pool if workers > 1.
+
+    At most two chunks per worker are submitted ahead, so the archive is not read faster than it is processed.
+    """
+    if workers <= 1:
+        for chunk in chunks:
+            yield process_member_chunk(chunk, out_dir, mask_format)
+        return
+
+    with Pool(processes=workers) as pool:
+        pending: deque[AsyncResult] = deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(process_member_chunk, (chunk, out_dir, mask_format, True)))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().get()
+
+        while pending:
+            yield pending.popleft().get()
+
+
+def is_item_current(
+    dataset: CTLogMaskPreprocessor, idx: int, out_dir: Path, entry: dict[str, Any] | None, mask_format: str,
+) -> bool:
+    """Checks whether the mask of an item is up to date with its sources.
+
+    Args:
+        dataset: Dataset the item belongs to.
+        idx: Index of the item.
+        out_dir: Path to the output directory with the masks.
+        entry: Manifest entry of the item, if any.
+        mask_format: Format of the masks, "png" or "rle".
+
+    Returns:
+        bool: True if the annotation, image and mask in the requested format all match the manifest entry and
+            the entry holds the class statistics.
+    """
+    if entry is None:
+        return False
+
+    sources = {
+        "annotation": dataset.fingerprint(dataset.annotation_paths[idx], entry["annotation"]),
+        "image": dataset.fingerprint(dataset.image_paths[idx], entry["image"]),
+    }
+    return is_entry_current(dataset.image_paths[idx].name, entry, sources, out_dir, mask_format)
+
+
+def is_entry_current(
+    name: str, entry: dict[str, Any] | None, sources: dict[str, dict[str, Any]], out_dir: Path, mask_format: str,
+) -> bool:
+    """Checks whether a manifest entry is up to date with the current fingerprints of its sources.
+
+    Args:
+        name: Image file name of the item.
+        entry: Manifest entry of the item, if any.
+        sources: Current fingerprints of the "annotation" and "image" of the item.
+        out_dir: Path to the output directory with the masks.
+        mask_format: Format of the masks, "png" or "rle".
+
+    Returns:
+        bool: True if the sources and the mask in the requested format match the entry and it holds the class
+            statistics.
+    """
+    mask_name = mask_file_name(name, mask_format)
+    return (
+        entry is not None
+        and "class_counts" in entry
+        and entry.get("mask_file", name) == mask_name
+        and all(fingerprint["hash"] == entry[source]["hash"] for source, fingerprint in sources.items())
+        and is_file_unchanged(out_dir / mask_name, entry["mask"])
+    )
+
+
+def write_class_stats(
+    names: list[str], out_dir: Path, manifest: dict[str, dict[str, Any]], output_path: Path,
+) -> None:
+    """Writes the class statistics sidecar of all items from their manifest entries.
+
+    The sidecar has the format of `CTLogDataset.get_class_stats`, so the dataset of the processed directory uses
+    it without decoding any mask.
+
+    Args:
+        names: Image file names of all items, in the order of the dataset.
+        out_dir: Path to the output directory with the masks.
+        manifest: Manifest entries of all items.
+        output_path: Path where the statistics (.npz) will be saved.
+    """
+    entries = [manifest[name] for name in names]
+    save_class_stats(
+        output_path,
+        names,
+        list(CTLogMaskPreprocessor.class_to_id),
+        np.array([entry["resolution"] for entry in entries], dtype=np.int64),
+        np.array([entry["class_counts"] for entry in entries], dtype=np.int64),
+        np.array([entry["class_bboxes"] for entry in entries], dtype=np.int32),
+        np.array([entry["pith"] or (np.nan, np.nan) for entry in entries], dtype=np.float64),
+        [out_dir / entry["mask_file"] for entry in entries],
+    )
+
+
+def preprocess_dataset(
+    src_dir: Path,
+    out_dir: Path,
+    workers: int = 1,
+    chunk_size: int = 8,
+    manifest_path: Path | None = None,
+    resolutions_path: Path | None = None,
+    checkpoint_interval: float = 30.0,
+    mask_format: str = "png",
+    class_stats_path: Path | None = None,
+    shard: tuple[int, int] | None = None,
+) -> Counter[tuple[int, int]]:
     """Preprocess the dataset by constructing and converting masks to PIL images and saving them.
 
+    With a manifest, only new or changed items are rasterized and masks of deleted items are pruned. The
+    manifest and resolutions are saved periodically, so a killed run resumes where it stopped. A zip or tar
+    archive of the dataset is read in one sequential pass by `preprocess_archive`.
+
     Args:
-        src_dir: Path to the source dataset directory containing CT images and masks.
+        src_dir: Path to the source dataset directory containing CT images and masks, or an archive of it.
         out_dir: Path to the output directory where processed masks will be saved.
+        workers: Number of worker processes. With 1, items are processed in the main process.
+        chunk_size: Number of items sent to a worker process at once.
+        manifest_path: Path to the manifest with the hashes of the sources and masks. If None, all items
+            are processed.
+        resolutions_path: Path where the resolutions are saved at every checkpoint. If None, they are only
+            returned.
+        checkpoint_interval: Minimum number of seconds between two saves of the manifest and resolutions.
+        mask_format: Format of the saved masks, "png" or "rle".
+        class_stats_path: Path where the per-image class statistics are saved at the end. If None, they are only
+            recorded in the manifest.
+        shard: (shard index, number of shards). If given, only the items assigned to the shard by `shard_of` are
+            processed, and the manifest and resolutions cover only them. See `merge_shards`.
+
+    Raises:
+        ValueError: If the shard index does not lie within the number of shards.
+
+    Returns:
+        Counter[tuple[int, int]]: Resolutions (height, width) of all masks and their counts.
     """
-    to_pil_image = torchvision.transforms.ToPILImage()
+    if shard is not None:
+        validate_shard(*shard)
+
+    if is_archive(src_dir):
+        return preprocess_archive(
+            src_dir,
+            out_dir,
+            workers,
+            chunk_size,
+            manifest_path,
+            resolutions_path,
+            checkpoint_interval,
+            mask_format,
+            class_stats_path,
+            shard,
+        )
+
+    logger = logging.getLogger(__name__)
     out_dir.mkdir(parents=True, exist_ok=True)
     dataset = CTLogMaskPreprocessor(data_dir=src_dir)
 
+    manifest = load_manifest(manifest_path) if manifest_path is not None else {}
+    names = {path.name for path in dataset.image_paths if shard is None or shard_of(path.name, shard[1]) == shard[0]}
+    for name in sorted(set(manifest) - names):
+        (out_dir / manifest[name].get("mask_file", name)).unlink(missing_ok=True)
+        del manifest[name]
+        logger.info("Pruned mask %s, its sources were deleted.", name)
+
+    stale_indices = [
+        idx for idx, path in enumerate(dataset.image_paths)
+        if path.name in names and not is_item_current(dataset, idx, out_dir, manifest.get(path.name), mask_format)
+    ]
+    stale_names = {dataset.image_paths[idx].name for idx in stale_indices}
+    logger.info("%d of %d items are new or changed.", len(stale_indices), len(names))
+
+    resolutions = resolutions_from_manifest({k: v for k, v in manifest.items() if k not in stale_names})
+    for name in stale_names:
+        entry = manifest.pop(name, None)
+        # A mask in the other format is left behind under a different name, so it is dropped here.
+        if entry is not None and (old_mask := entry.get("mask_file", name)) != mask_file_name(name, mask_format):
+            (out_dir / old_mask).unlink(missing_ok=True)
+
+    def checkpoint() -> None:
+        if manifest_path is not None:
+            save_manifest(manifest, manifest_path)
+        if resolutions_path is not None:
+            save_resolutions(resolutions, resolutions_path)
+
+    chunks = [stale_indices[start : start + chunk_size] for start in range(0, len(stale_indices), chunk_size)]
+    last_checkpoint = time.monotonic()
+    with tqdm(total=len(stale_indices), desc="Processing dataset", unit="item") as progress:
+        for partial_resolutions, messages, entries, stage_records in _iterate_chunks(
+            dataset, src_dir, out_dir, chunks, workers, mask_format,
+        ):
+            resolutions.update(partial_resolutions)
+            manifest.update(entries)
+            instrumentation.merge(stage_records)
+            for message in messages:
+                warnings.warn(message)
+            progress.update(len(entries))
+
+            if time.monotonic() - last_checkpoint >= checkpoint_interval:
+                checkpoint()
+                last_checkpoint = time.monotonic()
+
+    checkpoint()
+    if class_stats_path is not None:
+        write_class_stats([path.name for path in dataset.image_paths], out_dir, manifest, class_stats_path)
+
+    return resolutions
+
+
+def _batches(items: Iterable[MemberItem], size: int) -> Iterator[list[MemberItem]]:
+    """Groups items into lists of at most `size` items."""
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def preprocess_archive(
+    archive_path: Path,
+    out_dir: Path,
+    workers: int = 1,
+    chunk_size: int = 8,
+    manifest_path: Path | None = None,
+    resolutions_path: Path | None = None,
+    checkpoint_interval: float = 30.0,
+    mask_format: str = "png",
+    class_stats_path: Path | None = None,
+    shard: tuple[int, int] | None = None,
+) -> Counter[tuple[int, int]]:
+    """Preprocess a zip or tar (possibly compressed) archive of the dataset without extracting it.
+
+    The archive is read in one sequential pass, members are paired by stem as they arrive and every complete
+    item is sent to the workers. The masks, manifest, resolutions and class statistics are identical to those of
+    `preprocess_dataset` on the extracted directory.
+
+    Args:
+        archive_path: Path to the archive of the source dataset.
+        out_dir: Path to the output directory where processed masks will be saved.
+        workers: Number of worker processes. With 1, items are processed in the main process.
+        chunk_size: Number of items sent to a worker process at once.
+        manifest_path: Path to the manifest with the hashes of the sources and masks. If None, all items
+            are processed.
+        resolutions_path: Path where the resolutions are saved at every checkpoint. If None, they are only
+            returned.
+        checkpoint_interval: Minimum number of seconds between two saves of the manifest and resolutions.
+        mask_format: Format of the saved masks, "png" or "rle".
+        class_stats_path: Path where the per-image class statistics are saved at the end. If None, they are only
+            recorded in the manifest.
+        shard: (shard index, number of shards). If given, the whole archive is read, but only the items assigned
+            to the shard by `shard_of` are processed.
+
+    Raises:
+        ValueError: If some members of the archive have no counterpart in the other directories. All paired
+            items are processed and saved before.
+
+    Returns:
+        Counter[tuple[int, int]]: Resolutions (height, width) of all masks and their counts.
+    """
+    logger = logging.getLogger(__name__)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    layout = supervisely_layout()
+
+    manifest = load_manifest(manifest_path) if manifest_path is not None else {}
+    resolutions: Counter[tuple[int, int]] = Counter()
+    names: list[str] = []
+    unpaired: dict[str, list[str]] = {}
+
+    def stale_items() -> Iterator[MemberItem]:
+        for name, members in iter_archive_items(archive_path, layout, unpaired):
+            if shard is not None and shard_of(name, shard[1]) != shard[0]:
+                continue
+
+            names.append(name)
+            entry = manifest.get(name)
+            (_, annotation_mtime, annotation_bytes), (_, image_mtime, image_bytes) = (
+                members[ANNOTATIONS_DIR],
+                members[IMAGE_DIR],
+            )
+            sources = {
+                "annotation": fingerprint_data(annotation_bytes, annotation_mtime, entry and entry["annotation"]),
+                "image": fingerprint_data(image_bytes, image_mtime, entry and entry["image"]),
+            }
+            if is_entry_current(name, entry, sources, out_dir, mask_format):
+                resolutions[tuple(entry["resolution"])] += 1
+                continue
+
+            manifest.pop(name, None)
+            # A mask in the other format is left behind under a different name, so it is dropped here.
+            if entry is not None and (old_mask := entry.get("mask_file", name)) != mask_file_name(name, mask_format):
+                (out_dir / old_mask).unlink(missing_ok=True)
+            yield name, annotation_bytes, image_bytes, sources
+
+    def checkpoint() -> None:
+        if manifest_path is not None:
+            save_manifest(manifest, manifest_path)
+        if resolutions_path is not None:
+            save_resolutions(resolutions, resolutions_path)
+
+    last_checkpoint = time.monotonic()
+    with tqdm(desc="Processing archive", unit="item") as progress:
+        for partial_resolutions, messages, entries, stage_records in _iterate_member_chunks(
+            _batches(stale_items(), chunk_size), out_dir, workers, mask_format,
+        ):
+            resolutions.update(partial_resolutions)
+            manifest.update(entries)
+            instrumentation.merge(stage_records)
+            for message in messages:
+                warnings.warn(message)
+            progress.update(len(entries))
+
+            if time.monotonic() - last_checkpoint >= checkpoint_interval:
+                checkpoint()
+                last_checkpoint = time.monotonic()
+
+    logger.info("%d of %d items were new or changed.", progress.n, len(names))
+    for name in sorted(set(manifest) - set(names)):
+        (out_dir / manifest[name].get("mask_file", name)).unlink(missing_ok=True)
+        del manifest[name]
+        logger.info("Pruned mask %s, its sources were deleted.", name)
+
+    checkpoint()
+
+    if any(unpaired.values()):
+        message = f"Unpaired annotation, image and image info files in {archive_path}: {format_unpaired(unpaired)}"
+        raise ValueError(message)
+
+    if class_stats_path is not None:
+        write_class_stats(sorted(names), out_dir, manifest, class_stats_path)
+
+    return resolutions
+
+
+def merge_shards(
+    num_shards: int, manifest_path: Path, resolutions_path: Path, out_dir: Path, class_stats_path: Path,
+) -> Counter[tuple[int, int]]:
+    """Merges the partial manifests and resolutions of all shards into the outputs of a single-node run.
+
+    The merged manifest and class statistics are identical to those of an unsharded run over the same sources,
+    apart from the modification times of the masks. The merged resolutions hold the same counts and additionally
+    the "square-recommended-resolution" and "non-square-recommended-resolution" keys written by
+    `compute_resolution.py`, which a single-node run does not write.
+
+    Args:
+        num_shards: Number of shards the dataset was split into.
+        manifest_path: Path of the merged manifest. The partial manifests are read from `shard_path` of it.
+        resolutions_path: Path of the merged resolutions. The partial resolutions are read from `shard_path` of it.
+        out_dir: Path to the output directory with the masks of all shards.
+        class_stats_path: Path where the per-image class statistics of all items are saved.
+
+    Raises:
+        ValueError: If the output of a shard is missing, an item is in the output of a shard it does not belong
+            to, or the partial resolutions do not match the partial manifests.
+
+    Returns:
+        Counter[tuple[int, int]]: Resolutions (height, width) of all masks and their counts.
+    """
+    validate_shard(0, num_shards)
+    shards = range(num_shards)
+    missing = [
+        str(shard_path(path, shard_index, num_shards))
+        for shard_index in shards
+        for path in (manifest_path, resolutions_path)
+        if not shard_path(path, shard_index, num_shards).exists()
+    ]
+    if missing:
+        message = f"Outputs of {len(missing)} shard files are missing: {', '.join(missing)}"
+        raise ValueError(message)
+
+    manifest: dict[str, dict[str, Any]] = {}
     resolutions: Counter[tuple[int, int]] = Counter()
-    for _, batch in enumerate(tqdm(dataset, desc="Processing dataset", unit="item")):
-        mask, path = batch["mask"], Path(batch["path"])
+    for shard_index in shards:
+        shard_manifest = load_manifest(shard_path(manifest_path, shard_index, num_shards))
+        misplaced = [name for name in shard_manifest if shard_of(name, num_shards) != shard_index]
+        if misplaced:
+            message = (
+                f"Shard {shard_index} of {num_shards} holds items of other shards, e.g. {misplaced[0]}, "
+                "so it was processed with a different number of shards."
+            )
+            raise ValueError(message)
 
-        height, width = mask.shape
-        resolutions[(height, width)] += 1
+        shard_resolutions = load_resolutions(shard_path(resolutions_path, shard_index, num_shards))
+        if shard_resolutions != resolutions_from_manifest(shard_manifest):
+            message = f"Resolutions of shard {shard_index} of {num_shards} do not match its manifest."
+            raise ValueError(message)
 
-        if batch["pith"] is None:
-            message = f"Pith is None for image {path.name}. The annotation may be missing or incomplete."
-            warnings.warn(message)
+        manifest.update(shard_manifest)
+        resolutions.update(shard_resolutions)
 
-        mask_image = to_pil_image(mask.to(torch.uint8))
-        mask_image.save(out_dir / path.name)
+    manifest = dict(sorted(manifest.items()))
+    save_manifest(manifest, manifest_path)
+    save_resolutions(resolutions, resolutions_path)
+    write_class_stats(list(manifest), out_dir, manifest, class_stats_path)
+    find_square_resolution_near_mean(str(resolutions_path), logging.getLogger(__name__))
 
     return resolutions
 
@@ -46,7 +671,7 @@ def main() -> None:
         "--source_data_dir",
         type=Path,
         default="data/raw/set_24",
-        help="Directory containing the dataset.",
+        help="Directory containing the dataset, or a zip or tar archive of it, which is read without extraction.",
     )
     parser.add_argument(
         "--output_data_dir",
@@ -54,11 +679,60 @@ def main() -> None:
         default="data/processed/set_24",
         help="Directory to save the processed dataset.",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes used to rasterize and save the masks.",
+    )
+    parser.add_argument(
+        "--mask_format",
+        choices=["png", "rle"],
+        default="png",
+        help="Format of the saved masks, PNG images or run-length encoded files.",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Record the wall time and bytes of every preprocessing stage and log a summary at the end.",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Ignore the manifest and rebuild all masks.",
+    )
+    parser.add_argument(
+        "--num_shards",
+        "--num-shards",
+        type=int,
+        default=None,
+        help="Split the items by a stable hash of their file stem into this many shards, e.g. one per machine.",
+    )
+    parser.add_argument(
+        "--shard_index",
+        "--shard-index",
+        type=int,
+        default=None,
+        help="Index of the shard processed by this run. It writes its own manifest, resolutions and log.",
+    )
+    parser.add_argument(
+        "--merge",
+        action="store_true",
+        help="Merge the outputs of all --num_shards shards into the final manifest, resolutions and statistics.",
+    )
     args = parser.parse_args()
 
+    if (args.shard_index is not None or args.merge) and args.num_shards is None:
+        parser.error("--shard_index and --merge require --num_shards.")
+    if args.num_shards is not None and (args.shard_index is None) == (not args.merge):
+        parser.error("--num_shards requires exactly one of --shard_index and --merge.")
+
     args.output_data_dir.mkdir(parents=True, exist_ok=True)
 
+    shard = (args.shard_index, args.num_shards) if args.shard_index is not None else None
     log_file = args.output_data_dir / "preprocessing.log"
+    if shard is not None:
+        log_file = shard_path(log_file, *shard)
     logging.basicConfig(
         level=logging.INFO,
         format="%(asctime)s - %(levelname)s - %(message)s",
@@ -73,16 +747,52 @@ def main() -> None:
     logger.info("Log file: %s", log_file)
     logger.info("Source data directory: %s", args.source_data_dir)
     logger.info("Output data directory: %s", args.output_data_dir)
+    logger.info("Workers: %d", args.workers)
+
+    if args.profile:
+        instrumentation.enable()
 
+    manifest_path = args.output_data_dir / "manifest.json"
     out_path = (args.output_data_dir / "mask")
-    resolutions = preprocess_dataset(args.source_data_dir, out_path)
+    resolutions_path = args.output_data_dir / "resolutions.json"
+    class_stats_path = args.output_data_dir / CTLogDataset.class_stats_file
 
-    logger.info("Dataset preprocessing completed. Output saved to %s", out_path)
-    logger.info("Saving dataset resolutions metadata...")
+    if args.merge:
+        logger.info("Merging %d shards", args.num_shards)
+        resolutions = merge_shards(args.num_shards, manifest_path, resolutions_path, out_path, class_stats_path)
+        logger.info("Manifest of %d items saved to %s", resolutions.total(), manifest_path)
+        logger.info("Resolutions metadata saved to %s", resolutions_path)
+        logger.info("Class statistics saved to %s", class_stats_path)
+        return
+
+    if shard is not None:
+        logger.info("Shard: %d of %d", *shard)
+        manifest_path, resolutions_path = shard_path(manifest_path, *shard), shard_path(resolutions_path, *shard)
+        # The class statistics cover all items, so they are written by the merge.
+        class_stats_path = None
 
-    save_resolutions(resolutions, resolutions_path := (args.output_data_dir / "resolutions.json"))
+    if args.force:
+        manifest_path.unlink(missing_ok=True)
+
+    resolutions = preprocess_dataset(
+        args.source_data_dir,
+        out_path,
+        args.workers,
+        manifest_path=manifest_path,
+        resolutions_path=resolutions_path,
+        mask_format=args.mask_format,
+        class_stats_path=class_stats_path,
+        shard=shard,
+    )
+
+    logger.info("Dataset preprocessing completed. Output saved to %s", out_path)
+    logger.info("Manifest saved to %s", manifest_path)
+    logger.info("Resolutions metadata for %d items saved to %s", resolutions.total(), resolutions_path)
+    if class_stats_path is not None:
+        logger.info("Class statistics saved to %s", class_stats_path)
+    if args.profile:
+        logger.info("Preprocessing stages:\n%s", instrumentation.format_summary())
 
-    logger.info("Resolutions metadata saved to %s", resolutions_path)
     logger.info("Preprocessing complete.")
 
 
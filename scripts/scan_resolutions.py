@@ -0,0 +1,70 @@
+from argparse import ArgumentParser
+import json
+import logging
+from pathlib import Path
+
+from src.utils.metadata import save_resolutions
+from src.utils.scan import (
+    load_scan_cache,
+    resolution_statistics,
+    resolutions_from_scan,
+    save_scan_cache,
+    scan_resolutions,
+)
+
+
+def main() -> None:
+    parser = ArgumentParser("Scan image resolutions from metadata and PNG headers only")
+    parser.add_argument(
+        "--source_data_dir",
+        type=Path,
+        default="data/raw/set_24",
+        help="Directory containing the dataset.",
+    )
+    parser.add_argument(
+        "--output_data_dir",
+        type=Path,
+        default="data/processed/set_24",
+        help="Directory to save resolutions.json, the scan cache and the statistics.",
+    )
+    parser.add_argument("--workers", type=int, default=16, help="Number of threads reading the files.")
+    args = parser.parse_args()
+
+    logger = logging.getLogger(__name__)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    args.output_data_dir.mkdir(parents=True, exist_ok=True)
+    cache_path = args.output_data_dir / "resolution_scan.json"
+
+    cache = load_scan_cache(cache_path)
+    scan = scan_resolutions(args.source_data_dir, cache, args.workers)
+    save_scan_cache(scan, cache_path)
+
+    num_rescanned = sum(1 for name, entry in scan.items() if cache.get(name) != entry)
+    logger.info("Scanned %d images, %d new or changed.", len(scan), num_rescanned)
+
+    resolutions = resolutions_from_scan(scan)
+    save_resolutions(resolutions, resolutions_path := args.output_data_dir / "resolutions.json")
+    logger.info("Resolutions metadata saved to %s", resolutions_path)
+
+    if not resolutions:
+        logger.warning("No images found in %s", args.source_data_dir)
+        return
+
+    statistics = resolution_statistics(resolutions)
+    for name in ("height", "width", "aspect_ratio"):
+        logger.info(
+            "%-12s %s", name, ", ".join(f"{key}: {value:.2f}" for key, value in statistics[name].items()),
+        )
+
+    histogram = statistics["aspect_ratio_histogram"]
+    for low, high, count in zip(histogram["edges"][:-1], histogram["edges"][1:], histogram["counts"]):
+        logger.info("aspect ratio %.3f - %.3f: %d", low, high, count)
+
+    with (statistics_path := args.output_data_dir / "resolution_statistics.json").open("w") as f:
+        json.dump(statistics, f, indent=2)
+    logger.info("Resolution statistics saved to %s", statistics_path)
+
+
+if __name__ == "__main__":
+    main()
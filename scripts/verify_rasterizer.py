@@ -0,0 +1,61 @@
+from argparse import ArgumentParser
+import logging
+from pathlib import Path
+import sys
+
+import torch
+from tqdm import tqdm
+
+from src.dataset.ct_log_mask_preprocessor import CTLogMaskPreprocessor
+
+
+def verify_rasterizer(src_dir: Path, logger: logging.Logger, limit: int | None = None) -> list[str]:
+    """Compares the single-canvas rasterizer against the legacy per-class mask path.
+
+    Args:
+        src_dir: Path to the source dataset directory in the Supervisely format.
+        logger: Logger instance for logging information.
+        limit: Maximum number of items to compare. If None, the whole dataset is compared.
+
+    Returns:
+        list[str]: Names of the images whose masks differ between the two paths.
+    """
+    dataset = CTLogMaskPreprocessor(data_dir=src_dir)
+    num_items = len(dataset) if limit is None else min(limit, len(dataset))
+
+    mismatches: list[str] = []
+    for idx in tqdm(range(num_items), desc="Verifying rasterizer", unit="item"):
+        data = dataset[idx]
+        legacy_mask = dataset.rasterize_legacy(data["annotation"], tuple(data["mask"].shape))
+
+        if not torch.equal(data["mask"].to(torch.int64), legacy_mask):
+            num_pixels = int((data["mask"].to(torch.int64) != legacy_mask).sum())
+            logger.error("Mask mismatch for %s in %d pixels.", Path(data["path"]).name, num_pixels)
+            mismatches.append(Path(data["path"]).name)
+
+    logger.info("Compared %d items, %d mismatches.", num_items, len(mismatches))
+
+    return mismatches
+
+
+def main() -> None:
+    """Main function to execute the rasterizer regression check."""
+    parser = ArgumentParser("Check that the single-canvas rasterizer matches the legacy mask path")
+    parser.add_argument(
+        "--source_data_dir",
+        type=Path,
+        default="data/raw/set_24",
+        help="Directory containing the dataset.",
+    )
+    parser.add_argument("--limit", type=int, default=None, help="Maximum number of items to compare.")
+    args = parser.parse_args()
+
+    logger = logging.getLogger(__name__)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    mismatches = verify_rasterizer(args.source_data_dir, logger, args.limit)
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
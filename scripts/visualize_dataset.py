@@ -1,73 +1,159 @@
+from argparse import ArgumentParser
+from fnmatch import fnmatch
+from functools import partial
+import logging
+from multiprocessing import Pool
 from pathlib import Path
 
 import numpy as np
-import plotly.express as px
-import torch
+from PIL import Image
+from tqdm import tqdm
 
 from src.dataset.ct_log_dataset import CTLogDataset
+from src.utils.overlay import color_lut, contact_sheet, fit_tile, render_overlay
 
+_worker_dataset: CTLogDataset | None = None
+_worker_lut: tuple[np.ndarray, np.ndarray] | None = None
 
-def render_mask_on_image(image: torch.Tensor, mask: torch.Tensor, alpha: float = 0.5) -> np.ndarray:
-    """Render mask overlay on image with transparency.
+
+def _init_worker(data_dir: Path, mask_format: str, alpha: float) -> None:
+    """Creates the dataset and color lookup tables once per worker process."""
+    global _worker_dataset, _worker_lut
+    _worker_dataset = CTLogDataset(data_dir=data_dir, compact=True, load_annotations=False, mask_format=mask_format)
+    _worker_lut = color_lut(CTLogDataset.class_to_id, alpha)
+
+
+def render_item(idx: int, output_dir: Path | None, tile_size: tuple[int, int] | None) -> np.ndarray | None:
+    """Renders the overlay of an item with the worker dataset, saving it as PNG or returning it as a tile.
 
     Args:
-        image: RGB image tensor of shape (3, H, W)
-        mask: Mask tensor of shape (H, W) with class indices
-        alpha: Transparency level for mask overlay (0.0 to 1.0)
+        idx: Index of the item.
+        output_dir: Directory to save the overlay to. If None, the overlay is returned.
+        tile_size: (height, width) the returned overlay is scaled to fit into. If None, it is returned in full.
 
     Returns:
-        Combined image as numpy array of shape (H, W, 3)
+        np.ndarray | None: [H, W, 3] uint8 overlay if `output_dir` is None, otherwise None.
     """
-    img_np = image.permute(1, 2, 0).numpy()
-    mask_np = mask.numpy()
+    assert _worker_dataset is not None and _worker_lut is not None, "Worker dataset is not initialized."
 
-    mask_colored = np.zeros((*mask_np.shape, 3))
-    unique_classes = np.unique(mask_np)
+    image = _worker_dataset.load_image(idx).permute(1, 2, 0).numpy()
+    mask = _worker_dataset.load_mask(idx).squeeze(0).numpy()
+    overlay = render_overlay(image, mask, *_worker_lut)
 
-    colors = [
-        [1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0], [1.0, 1.0, 0.0],
-        [1.0, 0.0, 1.0], [0.0, 1.0, 1.0], [0.5, 0.5, 0.5], [1.0, 0.5, 0.0],
-        [0.5, 0.0, 1.0], [0.0, 0.5, 0.5]
-    ]
+    if output_dir is None:
+        return fit_tile(overlay, tile_size) if tile_size is not None else overlay
 
-    for i, class_id in enumerate(unique_classes):
-        if class_id == 0:
-            continue
-        color_idx = (i - 1) % len(colors)
-        mask_colored[mask_np == class_id] = colors[color_idx]
+    Image.fromarray(overlay).save(output_dir / f"{_worker_dataset.image_paths[idx].stem}_overlay.png")
+    return None
 
-    combined = img_np * (1 - alpha) + mask_colored * alpha
-    return np.clip(combined, 0, 1)
-
-
-def main() -> None:
-    """Visualize dataset images and masks, displaying and saving them as PNG files."""
-    dataset = CTLogDataset(data_dir="data/processed/set_24", num_classes=10, resolution=(458, 530))
 
-    output_dir = Path("data/processed/visualizations")
-    output_dir.mkdir(exist_ok=True)
+def select_items(dataset: CTLogDataset, pattern: str | None, classes: list[str] | None) -> list[int]:
+    """Selects the items whose image name matches a glob pattern and that contain any of the given classes.
 
-    print(f"Dataset length: {len(dataset)}")
-
-    for i in range(len(dataset)):
-        item = dataset[i]
+    Args:
+        dataset: Dataset to select from.
+        pattern: Glob pattern of the image file names, e.g. "log_12_*". If None, all names match.
+        classes: Class titles of which at least one must be present in the mask. If None, all items match.
+            Uses the class statistics of the dataset.
 
-        base_name = Path(item["path"]).stem
+    Returns:
+        list[int]: Indices of the selected items.
+    """
+    indices = [
+        idx for idx, path in enumerate(dataset.image_paths) if pattern is None or fnmatch(path.name, pattern)
+    ]
 
-        img_fig = px.imshow(item["image"].permute(1, 2, 0), title=str(item["path"]))
-        img_fig.show()
-        img_fig.write_image(output_dir / f"{base_name}_image.png")
+    if classes:
+        counts = dataset.get_class_stats().counts
+        class_ids = [dataset.class_to_id[title] for title in classes]
+        indices = [idx for idx in indices if counts[idx, class_ids].any()]
 
-        mask_fig = px.imshow(item["mask"], title=str(item["path"]))
-        mask_fig.show()
-        mask_fig.write_image(output_dir / f"{base_name}_mask.png")
+    return indices
 
-        combined_image = render_mask_on_image(item["image"], item["mask"])
-        combined_fig = px.imshow(combined_image, title=f"{item['path']} - Overlay")
-        combined_fig.show()
-        combined_fig.write_image(output_dir / f"{base_name}_overlay.png")
 
-        break
+def main() -> None:
+    parser = ArgumentParser("Render class overlays of a processed dataset to PNG files or contact sheets")
+    parser.add_argument(
+        "--data_dir",
+        type=Path,
+        default="data/processed/set_24",
+        help="Directory containing the processed dataset.",
+    )
+    parser.add_argument(
+        "--output_dir",
+        type=Path,
+        default="data/processed/visualizations",
+        help="Directory to save the overlays or contact sheets.",
+    )
+    parser.add_argument(
+        "--mask_format", choices=["png", "rle"], default="png", help="Format of the processed masks.",
+    )
+    parser.add_argument("--workers", type=int, default=8, help="Number of worker processes rendering overlays.")
+    parser.add_argument("--alpha", type=float, default=0.5, help="Opacity of the class colors.")
+    parser.add_argument("--names", type=str, default=None, help="Glob pattern of the image names to render.")
+    parser.add_argument(
+        "--classes",
+        nargs="+",
+        default=None,
+        help="Only render items containing at least one of these classes.",
+    )
+    parser.add_argument("--limit", type=int, default=None, help="Maximum number of items to render.")
+    parser.add_argument(
+        "--contact_sheet",
+        type=int,
+        default=None,
+        metavar="COLUMNS",
+        help="Save contact sheets with this number of columns instead of one PNG per item.",
+    )
+    parser.add_argument(
+        "--tile_size",
+        type=int,
+        nargs=2,
+        default=(256, 256),
+        metavar=("HEIGHT", "WIDTH"),
+        help="Size of a contact sheet cell.",
+    )
+    parser.add_argument("--sheet_rows", type=int, default=8, help="Number of rows of a contact sheet.")
+    args = parser.parse_args()
+
+    logger = logging.getLogger(__name__)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    dataset = CTLogDataset(
+        data_dir=args.data_dir, compact=True, load_annotations=False, mask_format=args.mask_format,
+    )
+    indices = select_items(dataset, args.names, args.classes)[: args.limit]
+    logger.info("Rendering %d of %d items", len(indices), len(dataset))
+
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    sheet_size = None if args.contact_sheet is None else args.contact_sheet * args.sheet_rows
+    output_dir = args.output_dir if sheet_size is None else None
+    tile_size = tuple(args.tile_size) if sheet_size is not None else None
+
+    tiles: list[np.ndarray] = []
+    num_sheets = 0
+
+    def save_sheet() -> None:
+        nonlocal num_sheets
+        sheet_path = args.output_dir / f"contact_sheet_{num_sheets:04d}.png"
+        Image.fromarray(contact_sheet(tiles, args.contact_sheet, tile_size)).save(sheet_path)
+        tiles.clear()
+        num_sheets += 1
+
+    with Pool(
+        processes=args.workers, initializer=_init_worker, initargs=(args.data_dir, args.mask_format, args.alpha),
+    ) as pool:
+        results = pool.imap(partial(render_item, output_dir=output_dir, tile_size=tile_size), indices, chunksize=4)
+        for tile in tqdm(results, total=len(indices), desc="Rendering overlays", unit="item"):
+            if tile is not None:
+                tiles.append(tile)
+                if len(tiles) == sheet_size:
+                    save_sheet()
+
+    if tiles:
+        save_sheet()
+
+    logger.info("Saved %s to %s", f"{num_sheets} contact sheets" if sheet_size else "overlays", args.output_dir)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,104 @@
+from argparse import ArgumentParser
+import logging
+from multiprocessing import Pool
+from pathlib import Path
+
+from tqdm import tqdm
+
+from src.dataset.ct_log_dataset import CTLogDataset
+
+_worker_dataset: CTLogDataset | None = None
+
+
+def _init_worker(data_dir: Path, resolution: tuple[int, int], cache_dir: Path, compact: bool) -> None:
+    """Creates the dataset once per worker process."""
+    global _worker_dataset
+    _worker_dataset = CTLogDataset(
+        data_dir=str(data_dir), resolution=resolution, cache_dir=cache_dir, compact=compact,
+    )
+
+
+def _warm_item(idx: int) -> None:
+    """Resizes a single sample and stores it in the cache unless it is already cached."""
+    assert _worker_dataset is not None, "Worker dataset is not initialized."
+    _worker_dataset.load_resized_sample(idx)
+
+
+def warm_resize_cache(
+    data_dir: Path, resolution: tuple[int, int], cache_dir: Path, workers: int = 1, compact: bool = False,
+) -> int:
+    """Fills the resize cache for every sample of the dataset.
+
+    Args:
+        data_dir: Path to the processed dataset directory containing images and masks.
+        resolution: Target (height, width) of the resized samples.
+        cache_dir: Root directory of the resize cache.
+        workers: Number of worker processes.
+        compact: If True, the uint8 entries read by compact datasets are cached, otherwise the float32 ones.
+
+    Returns:
+        int: Number of samples in the dataset.
+    """
+    _init_worker(data_dir, resolution, cache_dir, compact)
+    assert _worker_dataset is not None
+    num_items = len(_worker_dataset)
+
+    if workers <= 1:
+        for idx in tqdm(range(num_items), desc="Warming resize cache", unit="item"):
+            _warm_item(idx)
+        return num_items
+
+    initargs = (data_dir, resolution, cache_dir, compact)
+    with Pool(processes=workers, initializer=_init_worker, initargs=initargs) as pool:
+        for _ in tqdm(
+            pool.imap_unordered(_warm_item, range(num_items), chunksize=16),
+            total=num_items,
+            desc="Warming resize cache",
+            unit="item",
+        ):
+            pass
+
+    return num_items
+
+
+def main() -> None:
+    parser = ArgumentParser("Pre-resize a processed dataset into the on-disk resize cache")
+    parser.add_argument(
+        "--data_dir",
+        type=Path,
+        default="data/processed/set_24",
+        help="Directory containing the processed dataset.",
+    )
+    parser.add_argument(
+        "--resolution",
+        type=int,
+        nargs=2,
+        default=(458, 530),
+        metavar=("HEIGHT", "WIDTH"),
+        help="Target resolution of the resized samples.",
+    )
+    parser.add_argument(
+        "--cache_dir",
+        type=Path,
+        default=None,
+        help="Root directory of the resize cache. Defaults to <data_dir>/resize_cache.",
+    )
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes.")
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Cache the uint8 samples of datasets created with compact=True instead of the float32 ones.",
+    )
+    args = parser.parse_args()
+
+    logger = logging.getLogger(__name__)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    cache_dir = args.cache_dir if args.cache_dir is not None else args.data_dir / "resize_cache"
+    num_items = warm_resize_cache(args.data_dir, tuple(args.resolution), cache_dir, args.workers, args.compact)
+
+    logger.info("Resize cache for %d samples at %dx%d is ready in %s", num_items, *args.resolution, cache_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+from collections.abc import Iterator
+from contextlib import contextmanager
+import math
+from typing import Any
+
+import torch
+import torch.nn.functional as F
+
+from src.utils.instrumentation import instrumentation
+
+
+class BatchTransform:
+    """Resizes and augments whole batches after collation instead of one sample at a time in the workers.
+
+    Used as the `collate_fn` of a DataLoader over a dataset without a resolution, it stacks the samples of equal
+    shape and resizes every group in one bilinear (image) and one nearest (mask) call, with the same
+    interpolation as the per-sample `CTLogDataset` resize. The stacked batch is then converted to float32 images
+    in [0, 1] and int64 masks like `collate_compact`, and augmented with per-sample random parameters:
+        - flips: horizontal and vertical, as a single `torch.where` over the batch.
+        - rotation: by a uniform angle in [-max_rotation, max_rotation] degrees around the center, as a single
+          `grid_sample` over the batch. The image is interpolated bilinearly, the mask takes the nearest class,
+          and uncovered corners are filled with black and background.
+        - intensity jitter: contrast around the per-sample mean and brightness offset, clamped to [0, 1].
+    Image and mask always undergo the same geometry. `augment` can also be called on batches that are already
+    stacked, e.g. on the GPU in the training loop.
+
+    The operations use the intra-op thread pool of torch, which DataLoader workers limit to a single thread, so
+    `threads` sets the number of threads for the duration of a call. Random parameters come from `generator`,
+    or from the global torch generator, which DataLoader seeds differently in every worker.
+
+    Args:
+        resolution: (height, width) the samples are resized to. If None, the samples must share their shape.
+        horizontal_flip: Probability of flipping a sample horizontally.
+        vertical_flip: Probability of flipping a sample vertically.
+        max_rotation: Maximum rotation angle in degrees.
+        brightness: Maximum brightness offset, in units of the image range.
+        contrast: Maximum relative contrast change, e.g. 0.2 for factors in [0.8, 1.2].
+        threads: Number of intra-op threads used during a call. If None, the current setting is kept.
+        generator: Generator of the random parameters.
+    """
+
+    def __init__(
+        self,
+        resolution: tuple[int, int] | None = None,
+        horizontal_flip: float = 0.0,
+        vertical_flip: float = 0.0,
+        max_rotation: float = 0.0,
+        brightness: float = 0.0,
+        contrast: float = 0.0,
+        threads: int | None = None,
+        generator: torch.Generator | None = None,
+    ) -> None:
+        self.resolution = resolution
+        self.horizontal_flip = horizontal_flip
+        self.vertical_flip = vertical_flip
+        self.max_rotation = max_rotation
+        self.brightness = brightness
+        self.contrast = contrast
+        self.threads = threads
+        self.generator = generator
+
+    @contextmanager
+    def _intra_op_threads(self) -> Iterator[None]:
+        """Sets the number of intra-op threads of torch for the duration of the context."""
+        previous = torch.get_num_threads()
+        if self.threads is not None:
+            torch.set_num_threads(self.threads)
+        try:
+            yield
+        finally:
+            torch.set_num_threads(previous)
+
+    def __call__(self, batch: list[dict[str, Any]]) -> dict[str, Any]:
+        """Collates, resizes and augments samples.
+
+        Args:
+            batch: Samples returned by a dataset, in compact mode or not.
+
+        Returns:
+            dict[str, Any]: keys:
+                - image: [B, C, H, W] float32 tensor with values in [0, 1].
+                - mask: [B, H, W] int64 tensor with class IDs.
+                - any other key: list of the per-sample values.
+        """
+        with self._intra_op_threads():
+            images, masks = self.resize([sample["image"] for sample in batch], [sample["mask"] for sample in batch])
+            collated: dict[str, Any] = {}
+            collated["image"], collated["mask"] = self.augment(images, masks)
+
+        for key in batch[0]:
+            if key not in collated:
+                collated[key] = [sample[key] for sample in batch]
+
+        return collated
+
+    def resize(self, images: list[torch.Tensor], masks: list[torch.Tensor]) -> tuple[torch.Tensor, torch.Tensor]:
+        """Resizes samples to the target resolution, with one call per group of samples of equal shape.
+
+        Args:
+            images: [C, H, W] images, uint8 or float32.
+            masks: [H, W] masks.
+
+        Raises:
+            ValueError: If no resolution is set and the samples differ in shape.
+
+        Returns:
+            tuple[torch.Tensor, torch.Tensor]: [B, C, H, W] images and [B, H, W] masks with the input dtypes.
+        """
+        if self.resolution is None:
+            if len({image.shape for image in images}) > 1:
+                message = "Samples of different shapes cannot be stacked without a target resolution."
+                raise ValueError(message)
+            return torch.stack(images), torch.stack(masks)
+
+        from torchvision.transforms import InterpolationMode
+        from torchvision.transforms import functional as TF
+
+        groups: dict[torch.Size, list[int]] = {}
+        for idx, image in enumerate(images):
+            groups.setdefault(image.shape, []).append(idx)
+
+        resized_images = images[0].new_empty((len(images), images[0].shape[0], *self.resolution))
+        resized_masks = masks[0].new_empty((len(masks), *self.resolution))
+        nbytes = sum(image.nbytes + mask.nbytes for image, mask in zip(images, masks))
+        with instrumentation.stage("batch_resize", nbytes=nbytes):
+            for shape, indices in groups.items():
+                group_images = torch.stack([images[idx] for idx in indices])
+                group_masks = torch.stack([masks[idx] for idx in indices]).unsqueeze(1)
+                if shape[1:] != self.resolution:
+                    group_images = TF.resize(group_images, self.resolution, InterpolationMode.BILINEAR)
+                    group_masks = TF.resize(group_masks, self.resolution, InterpolationMode.NEAREST)
+                resized_images[indices] = group_images
+                resized_masks[indices] = group_masks.squeeze(1)
+
+        return resized_images, resized_masks
+
+    def _uniform(self, size: int, low: float, high: float, device: torch.device) -> torch.Tensor:
+        """Draws uniform random values from the generator of the transform."""
+        values = torch.rand(size, generator=self.generator)
+        return (low + (high - low) * values).to(device)
+
+    def augment(self, images: torch.Tensor, masks: torch.Tensor) -> tuple[torch.Tensor, torch.Tensor]:
+        """Converts a stacked batch to training dtypes and augments it with per-sample random parameters.
+
+        Args:
+            images: [B, C, H, W] images, uint8 or float32 with values in [0, 1].
+            masks: [B, H, W] masks with class IDs.
+
+        Returns:
+            tuple[torch.Tensor, torch.Tensor]: [B, C, H, W] float32 images in [0, 1] and [B, H, W] int64 masks.
+        """
+        images = images.float().div_(255) if images.dtype == torch.uint8 else images.float()
+        masks = masks.long()
+        size, device = images.shape[0], images.device
+
+        with instrumentation.stage("batch_augment", nbytes=images.nbytes + masks.nbytes):
+            for probability, dim in ((self.horizontal_flip, -1), (self.vertical_flip, -2)):
+                if probability > 0:
+                    flip = self._uniform(size, 0, 1, device) < probability
+                    images = torch.where(flip[:, None, None, None], images.flip(dim), images)
+                    masks = torch.where(flip[:, None, None], masks.flip(dim), masks)
+
+            if self.max_rotation > 0:
+                images, masks = self._rotate(images, masks)
+
+            if self.contrast > 0 or self.brightness > 0:
+                contrast = self._uniform(size, 1 - self.contrast, 1 + self.contrast, device)[:, None, None, None]
+                brightness = self._uniform(size, -self.brightness, self.brightness, device)[:, None, None, None]
+                mean = images.mean(dim=(1, 2, 3), keepdim=True)
+                images = ((images - mean) * contrast + mean + brightness).clamp_(0, 1)
+
+        return images, masks
+
+    def _rotate(self, images: torch.Tensor, masks: torch.Tensor) -> tuple[torch.Tensor, torch.Tensor]:
+        """Rotates every sample by its own random angle around the center with one shared sampling grid."""
+        size, device = images.shape[0], images.device
+        height, width = images.shape[-2:]
+        angles = self._uniform(size, -self.max_rotation, self.max_rotation, device) * (math.pi / 180)
+        cos, sin = torch.cos(angles), torch.sin(angles)
+
+        # Rotation in pixel space, expressed in the normalized coordinates of affine_grid, which scale x and y
+        # by the width and height.
+        theta = torch.zeros((size, 2, 3), device=device)
+        theta[:, 0, 0], theta[:, 0, 1] = cos, -sin * (height / width)
+        theta[:, 1, 0], theta[:, 1, 1] = sin * (width / height), cos
+        grid = F.affine_grid(theta, list(images.shape), align_corners=False)
+
+        images = F.grid_sample(images, grid, mode="bilinear", padding_mode="zeros", align_corners=False)
+        masks = F.grid_sample(
+            masks.unsqueeze(1).float(), grid, mode="nearest", padding_mode="zeros", align_corners=False,
+        )
+        return images, masks.squeeze(1).long()
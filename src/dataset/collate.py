@@ -0,0 +1,28 @@
+from typing import Any
+
+import torch
+
+
+def collate_compact(batch: list[dict[str, Any]]) -> dict[str, Any]:
+    """Collates compact uint8 samples and converts them to training dtypes once per batch.
+
+    Samples must share the same resolution, e.g. by setting `resolution` on the dataset.
+
+    Args:
+        batch: Samples returned by a dataset in compact mode.
+
+    Returns:
+        dict[str, Any]: keys:
+            - image: [B, C, H, W] float32 tensor with values in [0, 1].
+            - mask: [B, H, W] int64 tensor with class IDs, if the samples contain masks.
+            - any other key: list of the per-sample values.
+    """
+    collated: dict[str, Any] = {"image": torch.stack([sample["image"] for sample in batch]).float().div_(255)}
+    if "mask" in batch[0]:
+        collated["mask"] = torch.stack([sample["mask"] for sample in batch]).long()
+
+    for key in batch[0]:
+        if key not in collated:
+            collated[key] = [sample[key] for sample in batch]
+
+    return collated
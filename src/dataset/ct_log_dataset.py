@@ -1,34 +1,74 @@
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
+import numpy as np
 from PIL import Image
 import torch
-from torchvision import transforms
 
 from src.dataset.ct_log_dataset_base import CTLogDatasetBase
+from src.dataset.sampler import BucketedIndex
+from src.utils.class_stats import ClassStats, mask_class_stats, save_class_stats
+from src.utils.instrumentation import instrumentation
+from src.utils.mask_codec import RLE_SUFFIX, load_rle, load_rle_region
+from src.utils.resize_cache import ResizeCache
+from src.utils.shared_cache import SharedSampleCache
+
+if TYPE_CHECKING:
+    from torchvision import transforms
 
 
 class CTLogDataset(CTLogDatasetBase):
     masks_dir: str = "mask"
+    class_stats_file: str = "class_stats.npz"
 
-    def __init__(self, data_dir: str, num_classes: int = 10, resolution: tuple[int, int] | None = None) -> None:
+    def __init__(
+        self,
+        data_dir: str,
+        num_classes: int = 10,
+        resolution: tuple[int, int] | None = None,
+        cache_dir: str | Path | None = None,
+        compact: bool = False,
+        sample_cache: SharedSampleCache | None = None,
+        load_annotations: bool = True,
+        mask_format: str = "png",
+    ) -> None:
         """Initializes the CTLogDataset.
 
         Args:
             data_dir: Path to the dataset directory containing directories for images, annotations, and masks.
             num_classes: Number of classes in the dataset.
-            resolution: Target resolution for the images and masks. If None, no resizing is applied.
+            resolution: Target resolution for the images and masks. If None, no resizing is applied. Items indexed
+                by an `(index, resolution)` pair, e.g. by `AspectRatioBatchSampler`, are resized to that resolution.
+            cache_dir: Directory of the on-disk cache with already resized images and masks. If None, samples are
+                resized on every access. Samples that are not resized are never cached.
+            compact: If True, images and masks are returned as uint8 tensors. Use `collate_compact` to convert them
+                to float32 and int64 once per batch.
+            sample_cache: Shared memory cache of loaded samples, keyed by index. It must not be shared with
+                another dataset.
+            load_annotations: If False, items are returned without the "annotation" key and no json is parsed.
+            mask_format: Format of the masks written by the preprocessing, "png" or "rle".
+
+        Raises:
+            ValueError: If the mask format is unknown.
         """
-        super().__init__(data_dir)
+        super().__init__(data_dir, compact=compact, sample_cache=sample_cache, load_annotations=load_annotations)
         self.num_classes = num_classes
         self.resolution = resolution
-        self.mask_paths = [self.data_dir / self.masks_dir / f"{path.stem}.png" for path in self.image_paths]
 
-        self.resize_transform = self._create_resize_transform(resolution, transforms.InterpolationMode.BILINEAR)
-        self.resize_mask_transform = self._create_resize_transform(resolution, transforms.InterpolationMode.NEAREST)
+        if mask_format not in ("png", "rle"):
+            message = f"Unsupported mask format: {mask_format}"
+            raise ValueError(message)
+
+        self.mask_format = mask_format
+        suffix = ".png" if mask_format == "png" else RLE_SUFFIX
+        self.mask_paths = self.names.with_location(self.data_dir / self.masks_dir, suffix)
+
+        self.cache_dir = cache_dir
+        self._resizes: dict[tuple[int, int] | None, tuple[torch.nn.Module, torch.nn.Module, ResizeCache | None]] = {}
+        self.resize_transform, self.resize_mask_transform, self.resize_cache = self._get_resize(resolution)
 
     def _create_resize_transform(
-        self, resolution: tuple[int, int] | None, interpolation: transforms.InterpolationMode,
+        self, resolution: tuple[int, int] | None, interpolation: "transforms.InterpolationMode",
     ) -> torch.nn.Module:
         """Creates a resize transform or identity transform based on resolution.
 
@@ -39,32 +79,201 @@ class CTLogDataset(CTLogDatasetBase):
         Returns:
             torch.nn.Module: Transform module.
         """
+        from torchvision import transforms
+
         return (
             transforms.Resize(resolution, interpolation=interpolation)
             if resolution is not None
             else torch.nn.Identity()
         )
 
-    def __getitem__(self, idx: int) -> dict[str, dict[str, Any] | Path | torch.Tensor]:
+    def _get_resize(
+        self, resolution: tuple[int, int] | None,
+    ) -> tuple[torch.nn.Module, torch.nn.Module, ResizeCache | None]:
+        """Returns the image and mask resize transforms and the resize cache for a resolution.
+
+        Args:
+            resolution: Target resolution or None for no resizing.
+
+        Returns:
+            tuple[torch.nn.Module, torch.nn.Module, ResizeCache | None]: Image transform, mask transform and the
+                resize cache, which is None if caching is disabled or no resizing is applied.
+        """
+        if resolution not in self._resizes:
+            from torchvision import transforms
+
+            resize_cache = (
+                ResizeCache(
+                    self.cache_dir,
+                    resolution,
+                    transforms.InterpolationMode.BILINEAR.value,
+                    transforms.InterpolationMode.NEAREST.value,
+                    "uint8" if self.compact else "float32",
+                )
+                if self.cache_dir is not None and resolution is not None
+                else None
+            )
+            self._resizes[resolution] = (
+                self._create_resize_transform(resolution, transforms.InterpolationMode.BILINEAR),
+                self._create_resize_transform(resolution, transforms.InterpolationMode.NEAREST),
+                resize_cache,
+            )
+
+        return self._resizes[resolution]
+
+    def load_mask(self, idx: int) -> torch.Tensor:
+        """Loads a mask of the dataset.
+
+        Args:
+            idx: Index of the mask to load.
+
+        Returns:
+            torch.Tensor: [1, H, W] uint8 tensor representation of the mask.
+        """
+        with instrumentation.stage("mask_decode") as stage:
+            if self.mask_format == "rle":
+                mask = torch.from_numpy(load_rle(self.mask_paths[idx])).unsqueeze(0)
+            else:
+                with Image.open(self.mask_paths[idx]) as image:
+                    mask = self.pil_to_tensor(image.convert("L"))
+            stage.nbytes = mask.nbytes
+
+        return mask
+
+    def load_region(
+        self, idx: int, top: int, left: int, height: int, width: int,
+    ) -> tuple[torch.Tensor, torch.Tensor]:
+        """Loads a region of the image and mask of a sample.
+
+        PNG images and masks are decoded in full and cropped, RLE masks decode only the rows of the region.
+
+        Args:
+            idx: Index of the sample.
+            top: First row of the region.
+            left: First column of the region.
+            height: Number of rows of the region, which must lie within the sample.
+            width: Number of columns of the region, which must lie within the sample.
+
+        Returns:
+            tuple[torch.Tensor, torch.Tensor]: [C, height, width] uint8 image and [height, width] uint8 mask.
+        """
+        box = (left, top, left + width, top + height)
+        with instrumentation.stage("region_decode", pixels=height * width):
+            with self.open_file(self.image_paths[idx]) as f, Image.open(f) as source:
+                image = self.pil_to_tensor(source.convert("RGB").crop(box))
+            if self.mask_format == "rle":
+                mask = torch.from_numpy(load_rle_region(self.mask_paths[idx], top, left, height, width))
+            else:
+                with Image.open(self.mask_paths[idx]) as source:
+                    mask = self.pil_to_tensor(source.convert("L").crop(box)).squeeze(0)
+
+        return image, mask
+
+    def get_class_stats(self) -> ClassStats:
+        """Returns the per-image class statistics, computing them from the masks if they are missing or outdated.
+
+        The statistics hold the shape, the pixel count and bounding box of every class, and the pith point of every
+        sample.
+
+        Returns:
+            ClassStats: Statistics with one entry per item of the dataset.
+        """
+        stats_path = self.derived_file_path(self.class_stats_file)
+        stats = ClassStats(stats_path)
+        if stats.is_current(self.mask_paths):
+            return stats
+
+        num_classes = len(self.class_to_id)
+        shapes = np.zeros((len(self), 2), dtype=np.int64)
+        counts = np.zeros((len(self), num_classes), dtype=np.int64)
+        bboxes = np.zeros((len(self), num_classes, 4), dtype=np.int32)
+        for idx in range(len(self)):
+            mask = self.load_mask(idx).squeeze(0).numpy()
+            shapes[idx] = mask.shape
+            counts[idx], bboxes[idx] = mask_class_stats(mask, num_classes)
+
+        annotation_index = self.get_annotation_index()
+        piths = np.array(
+            [annotation_index.pith(idx) or (np.nan, np.nan) for idx in range(len(self))], dtype=np.float64,
+        )
+
+        save_class_stats(
+            stats_path,
+            [path.name for path in self.image_paths],
+            list(self.class_to_id),
+            shapes,
+            counts,
+            bboxes,
+            piths,
+            self.mask_paths,
+        )
+        return ClassStats(stats_path)
+
+    def load_resized_sample(
+        self, idx: int, resolution: tuple[int, int] | None = None,
+    ) -> tuple[torch.Tensor, torch.Tensor, torch.Size]:
+        """Loads the image and mask resized to the target resolution, going through the resize cache if enabled.
+
+        Args:
+            idx: Index of the sample to load.
+            resolution: Target resolution overriding the one of the dataset. If None, the dataset resolution is used.
+
+        Returns:
+            tuple[torch.Tensor, torch.Tensor, torch.Size]: [C, H, W] image, [H, W] mask and the original (H, W)
+                of the sample. In compact mode both tensors are uint8, otherwise float32 and int64.
+        """
+        mask_dtype = torch.uint8 if self.compact else torch.int64
+        resize_transform, resize_mask_transform, resize_cache = self._get_resize(
+            resolution if resolution is not None else self.resolution,
+        )
+        name, sources = self.image_paths[idx].name, [self.image_paths[idx], self.mask_paths[idx]]
+        with instrumentation.stage("resize_cache_load"):
+            cached = resize_cache.load(name, sources) if resize_cache is not None else None
+
+        if cached is not None:
+            return (
+                torch.from_numpy(cached["image"]),
+                torch.from_numpy(cached["mask"]).to(mask_dtype),
+                torch.Size(cached["original_shape"].tolist()),
+            )
+
+        image, mask = self.load_image(idx), self.load_mask(idx)
+        original_shape = mask.shape[1:]
+        with instrumentation.stage("resize", nbytes=image.nbytes + mask.nbytes):
+            image = resize_transform(image)
+            mask = resize_mask_transform(mask).squeeze(0)
+
+        if resize_cache is not None:
+            resize_cache.save(
+                name,
+                sources,
+                image=image.numpy(),
+                mask=mask.numpy(),
+                original_shape=np.array(original_shape, dtype=np.int64),
+            )
+
+        return image, mask.to(mask_dtype), original_shape
+
+    def load_item(self, idx: int | BucketedIndex) -> dict[str, dict[str, Any] | Path | torch.Tensor]:
         """Loads an item from the dataset.
 
         Args:
-            idx: Index of the item to retrieve.
+            idx: Index of the item to retrieve, or an `(index, resolution)` pair to resize the item to.
 
         Returns:
             dict[str, Path | torch.Tensor]: keys:
-                - image: [C, H, W] float32 tensor representation of the image.
-                - annotations: Supervisely json annotations for the image.
-                - mask: [H, W] int64 tensor representation of the mask.
+                - image: [C, H, W] float32 (uint8 in compact mode) tensor representation of the image.
+                - annotation: Supervisely json annotations for the image, unless `load_annotations` is False.
+                - mask: [H, W] int64 (uint8 in compact mode) tensor representation of the mask.
                 - path: Path to the image file.
         """
-        data = super().__getitem__(idx)
+        idx, resolution = idx if isinstance(idx, tuple) else (idx, None)
+        image, mask, original_shape = self.load_resized_sample(idx, resolution)
 
-        data["image"] = self.resize_transform(data["image"])
+        data: dict[str, Any] = {"image": image, "path": str(self.image_paths[idx])}
+        if self.load_annotations:
+            data["annotation"] = self.load_annotation(idx)
 
-        mask = (self.to_tensor(Image.open(self.mask_paths[idx]).convert("L")) * 255).to(torch.int64)
-        original_shape = mask.shape
-        mask = self.resize_mask_transform(mask).squeeze(0)
-        data.update({"mask": mask, "original_shape": original_shape[1:]})
+        data.update({"mask": mask, "original_shape": original_shape})
 
         return data
@@ -1,10 +1,30 @@
+from collections.abc import Sequence
+import io
 import json
 from pathlib import Path
-from typing import Any, ClassVar
+from typing import Any, BinaryIO, ClassVar
 
+import numpy as np
 from PIL import Image
+import torch
 from torch.utils.data import Dataset
-import torchvision
+
+from src.utils.annotation_index import AnnotationIndex, build_annotation_index
+from src.utils.archive import ArchiveReader, is_archive
+from src.utils.file_index import (
+    IMAGE_SUFFIX,
+    format_unpaired,
+    is_file_index_current,
+    load_file_index,
+    save_file_index,
+    scan_file_index,
+)
+from src.utils.instrumentation import instrumentation
+from src.utils.manifest import fingerprint_file, hash_bytes
+from src.utils.path_store import PathStore
+from src.utils.resize_cache import source_stamp
+from src.utils.shared_cache import SharedSampleCache
+from src.utils.supervisely import ANNOTATIONS_DIR, CLASS_TO_ID, IMAGE_DIR, IMAGE_INFO_DIR
 
 
 class CTLogDatasetBase(Dataset):
@@ -14,55 +34,244 @@ class CTLogDatasetBase(Dataset):
         annotations_dir: Directory containing annotation files.
         image_dir: Directory containing image files.
         image_info_dir: Directory containing image info files.
+        annotation_index_file: File name of the compact annotation index in the data directory, or next to the
+            archive with the archive name as a prefix, e.g. "set_24.zip.annotation_index.npz".
+        file_index_file: File name of the index of paired annotation, image and image info files in the data
+            directory.
 
     Args:
-        data_dir: _description_
+        data_dir: Dataset directory, or a zip or uncompressed tar archive of it whose members are read without
+            extraction.
+        compact: If True, images are returned as uint8 tensors instead of float32 tensors.
+        sample_cache: Shared memory cache of loaded samples, keyed by index. It must not be shared with another
+            dataset.
+        load_annotations: If False, items are returned without the "annotation" key and no json is parsed.
+        scan_workers: Number of threads listing and stating the files when the file index is rebuilt.
 
     Raises:
         FileNotFoundError: _description_
-        ValueError: If the number of annotations, images, and image info files do not match.
+        ValueError: If an annotation, image or image info file has no counterpart in the other directories.
     """
 
-    annotations_dir: str = "ann"
-    image_dir: str = "img"
-    image_info_dir: str = "img_info"
-    class_to_id: ClassVar[dict[str, int]] = {
-        "background": 0,
-        "compression_wood": 1,
-        "crack": 2,
-        "insects": 3,
-        "knot_sound": 4,
-        "moisture": 5,
-        "moisture_real": 6,
-        "pith": 7,
-        "resign_pocket": 8,
-        "rot": 9,
-        "wood": 10,
-    }
-
-    def __init__(self, data_dir: str | Path) -> None:
+    annotations_dir: str = ANNOTATIONS_DIR
+    image_dir: str = IMAGE_DIR
+    image_info_dir: str = IMAGE_INFO_DIR
+    annotation_index_file: str = "annotation_index.npz"
+    file_index_file: str = "file_index.json"
+    class_to_id: ClassVar[dict[str, int]] = CLASS_TO_ID
+
+    def __init__(
+        self,
+        data_dir: str | Path,
+        compact: bool = False,
+        sample_cache: SharedSampleCache | None = None,
+        load_annotations: bool = True,
+        scan_workers: int = 16,
+    ) -> None:
         self.data_dir = Path(data_dir)
         if not self.data_dir.exists():
             message = f"Data directory {data_dir} does not exist."
             raise FileNotFoundError(message)
 
-        self.annotation_paths = sorted(self.data_dir.glob(f"{self.annotations_dir}/*.json"))
-        self.image_paths = sorted(self.data_dir.glob(f"{self.image_dir}/*.png"))
-        self.image_info_paths = sorted(self.data_dir.glob(f"{self.image_info_dir}/*.json"))
+        # Members of an archive are addressed by paths below the archive path, e.g. "set_24.zip/set_24/img/0001.png".
+        self.archive = ArchiveReader(self.data_dir) if is_archive(self.data_dir) else None
+        file_index = self._load_file_index(scan_workers)
+        root = self.data_dir / file_index.get("prefix", "")
+
+        # Paths are kept in array-backed stores rather than lists of Path objects, so forked DataLoader workers
+        # do not copy them on access.
+        self.names = PathStore(root, [stem.removesuffix(IMAGE_SUFFIX) for stem in file_index["stems"]])
+        self.annotation_paths = self.names.with_location(root / self.annotations_dir, f"{IMAGE_SUFFIX}.json")
+        self.image_paths = self.names.with_location(root / self.image_dir, IMAGE_SUFFIX)
+        self.image_info_paths = self.names.with_location(root / self.image_info_dir, f"{IMAGE_SUFFIX}.json")
+
+        self.compact = compact
+        self.sample_cache = sample_cache
+        self.load_annotations = load_annotations
+        self._annotation_index: AnnotationIndex | None = None
+        # torchvision is only imported when a dataset is created, not when this module is imported.
+        from torchvision import transforms
+
+        self.to_tensor = transforms.ToTensor()
+        self.pil_to_tensor = transforms.PILToTensor()
 
-        if not len(self.annotation_paths) == len(self.image_paths) == len(self.image_info_paths):
-            message = (
-                f"Mismatch in number of annotations, images, and image info files: "
-                f"{len(self.annotation_paths)}, {len(self.image_paths)}, {len(self.image_info_paths)}"
-            )
+    def _load_file_index(self, scan_workers: int) -> dict[str, Any]:
+        """Loads the index of paired files, rescanning the directories if files were added, removed or renamed.
+
+        Args:
+            scan_workers: Number of threads listing and stating the files on a rescan.
+
+        Raises:
+            ValueError: If some stems are missing from some of the directories.
+
+        Returns:
+            dict[str, Any]: File index as returned by `scan_file_index`.
+        """
+        layout = {self.annotations_dir: ".json", self.image_dir: "", self.image_info_dir: ".json"}
+        if self.archive is not None:
+            index = self.archive.index(layout)
+        else:
+            index_path = self.data_dir / self.file_index_file
+            index = load_file_index(index_path)
+            if index is None or not is_file_index_current(index, self.data_dir, layout):
+                index = scan_file_index(self.data_dir, layout, scan_workers)
+                if not any(index["unpaired"].values()):
+                    try:
+                        save_file_index(index, index_path)
+                    except OSError:
+                        # The index is only a cache, a dataset on a read-only mount is rescanned on every start.
+                        pass
+
+        if any(index["unpaired"].values()):
+            missing = format_unpaired(index["unpaired"])
+            message = f"Unpaired annotation, image and image info files in {self.data_dir}: {missing}"
             raise ValueError(message)
 
-        self.to_tensor = torchvision.transforms.ToTensor()
+        return index
+
+    def member_name(self, path: Path) -> str:
+        """Returns the name of the archive member of a dataset path."""
+        return path.relative_to(self.data_dir).as_posix()
+
+    def open_file(self, path: Path) -> BinaryIO:
+        """Opens a file of the dataset for binary reading, from the archive if the dataset is one.
+
+        Args:
+            path: Path to the file, e.g. from `image_paths`.
+
+        Returns:
+            BinaryIO: File object, to be closed by the caller.
+        """
+        if self.archive is None:
+            return path.open("rb")
+
+        return io.BytesIO(self.archive.read(self.member_name(path)))
+
+    def fingerprint(self, path: Path, previous: dict[str, Any] | None = None) -> dict[str, Any]:
+        """Creates the fingerprint of a file of the dataset as `fingerprint_file` does, also for archive members.
+
+        Args:
+            path: Path to the file.
+            previous: Previously recorded fingerprint of the file, if any.
+
+        Returns:
+            dict[str, Any]: keys size, mtime_ns and hash.
+        """
+        if self.archive is None:
+            return fingerprint_file(path, previous)
+
+        size, mtime_ns, _ = self.archive.members[self.member_name(path)]
+        if previous is not None and previous["size"] == size and previous["mtime_ns"] == mtime_ns:
+            return previous
+
+        return {"size": size, "mtime_ns": mtime_ns, "hash": hash_bytes(self.archive.read(self.member_name(path)))}
+
+    def source_stamp(self, paths: Sequence[Path]) -> np.ndarray:
+        """Creates the stamp of files of the dataset as `source_stamp` does, also for archive members.
+
+        Args:
+            paths: Paths to the files, e.g. from `annotation_paths`.
+
+        Returns:
+            np.ndarray: [2 * len(paths)] int64 array with the size and mtime of every file.
+        """
+        if self.archive is None:
+            return source_stamp(list(paths))
+
+        members = [self.archive.members[self.member_name(path)] for path in paths]
+        return np.array([value for size, mtime_ns, _ in members for value in (size, mtime_ns)], dtype=np.int64)
+
+    def derived_file_path(self, file_name: str) -> Path:
+        """Returns the path of a file derived from the dataset, e.g. an index.
+
+        Derived files of a dataset directory are saved in it. Archives are never written to, so their derived files
+        are saved next to them with the archive name as a prefix.
+
+        Args:
+            file_name: File name of the derived file, e.g. `annotation_index_file`.
+
+        Returns:
+            Path: Path of the derived file.
+        """
+        if self.archive is None:
+            return self.data_dir / file_name
+
+        return self.data_dir.with_name(f"{self.data_dir.name}.{file_name}")
 
     def __len__(self) -> int:
         return len(self.annotation_paths)
 
-    def __getitem__(self, idx: int) -> dict[str, Any]:
+    def load_image(self, idx: int) -> torch.Tensor:
+        """Loads an image of the dataset.
+
+        Args:
+            idx: Index of the image to load.
+
+        Returns:
+            torch.Tensor: [C, H, W] tensor representation of the image, uint8 in compact mode, float32 otherwise.
+        """
+        with instrumentation.stage("image_decode") as stage:
+            with self.open_file(self.image_paths[idx]) as f:
+                image = Image.open(f).convert("RGB")
+            tensor = self.pil_to_tensor(image).contiguous() if self.compact else self.to_tensor(image)
+            stage.nbytes = tensor.nbytes
+
+        return tensor
+
+    def load_annotation(self, idx: int) -> dict[str, Any]:
+        """Loads a Supervisely json annotation of the dataset.
+
+        Args:
+            idx: Index of the annotation to load.
+
+        Returns:
+            dict[str, Any]: Supervisely json annotation.
+        """
+        with instrumentation.stage("json_load") as stage, self.open_file(self.annotation_paths[idx]) as f:
+            annotation = json.load(f)
+            stage.nbytes = f.tell()
+
+        return annotation
+
+    def get_annotation_index(self) -> AnnotationIndex:
+        """Returns the compact annotation index, building it first if it is missing or outdated.
+
+        The index holds class titles, geometry types, bounding boxes and the pith point of every annotation, so
+        metadata can be read without parsing the full json annotations.
+
+        Returns:
+            AnnotationIndex: Index with one entry per item of the dataset.
+        """
+        if self._annotation_index is None:
+            index_path = self.derived_file_path(self.annotation_index_file)
+            stamp = self.source_stamp(self.annotation_paths)
+            if not AnnotationIndex(index_path).is_current(self.annotation_paths, stamp):
+                build_annotation_index(self.annotation_paths, index_path, self.open_file, stamp)
+
+            self._annotation_index = AnnotationIndex(index_path)
+
+        return self._annotation_index
+
+    def __getitem__(self, idx: Any) -> dict[str, Any]:
+        """Returns the item from the sample cache if enabled, loading and caching it on a miss.
+
+        Args:
+            idx: Index of the item to retrieve, or a tuple whose first element is the index.
+
+        Returns:
+            dict[str, Any]: Item as returned by `load_item`.
+        """
+        if self.sample_cache is None:
+            return self.load_item(idx)
+
+        key = idx[0] if isinstance(idx, tuple) else idx
+        if (data := self.sample_cache.get(key)) is None:
+            data = self.load_item(idx)
+            self.sample_cache.put(key, data)
+
+        return data
+
+    def load_item(self, idx: int) -> dict[str, Any]:
         """Returns a dictionary containing the image and its corresponding annotation.
 
         Args:
@@ -71,10 +280,8 @@ class CTLogDatasetBase(Dataset):
         Returns:
             dict[str, Any]:
         """
-        image_path = self.image_paths[idx]
-        image = self.to_tensor(Image.open(image_path).convert("RGB"))
-
-        with self.annotation_paths[idx].open("r") as f:
-            annotation = json.load(f)
+        data: dict[str, Any] = {"image": self.load_image(idx), "path": str(self.image_paths[idx])}
+        if self.load_annotations:
+            data["annotation"] = self.load_annotation(idx)
 
-        return {"image": image, "annotation": annotation, "path": str(image_path)}
+        return data
@@ -5,7 +5,9 @@ from PIL import Image, ImageDraw
 import torch
 
 from src.dataset.ct_log_dataset_base import CTLogDatasetBase
+from src.utils.instrumentation import instrumentation
 from src.utils.mask import base64_to_mask
+from src.utils.rasterizer import rasterize_objects
 
 
 class CTLogMaskPreprocessor(CTLogDatasetBase):
@@ -25,23 +27,61 @@ class CTLogMaskPreprocessor(CTLogDatasetBase):
     ]
 
     def __getitem__(self, idx: int) -> dict[str, Path | torch.Tensor | None]:
-        """Returns a dictionary containing the image and its corresponding annotation.
+        """Returns a dictionary containing the image, its annotation and the composite mask.
 
         Args:
             idx: Index of the item to retrieve.
 
         Returns:
-            dict[str, Path | torch.Tensor]:
+            dict[str, Path | torch.Tensor]: keys (in addition to the base dataset keys):
+                - mask: [H, W] uint8 tensor with class IDs, prioritized by `class_priority`.
+                - pith: [2] tensor with the pith point or None if the annotation has no point.
         """
         data = super().__getitem__(idx)
 
+        height, width = data["image"].shape[1:]
+        with instrumentation.stage("rasterize", pixels=height * width):
+            mask = rasterize_objects(
+                data["annotation"]["objects"], (height, width), self.class_to_id, self.class_priority,
+            )
+        data.update({"mask": torch.from_numpy(mask), "pith": self.find_pith(data["annotation"])})
+
+        return data
+
+    @staticmethod
+    def find_pith(annotation: dict[str, Any]) -> torch.Tensor | None:
+        """Returns the pith location, i.e. the first point of the last point object in the annotation.
+
+        Args:
+            annotation: Supervisely json annotation.
+
+        Returns:
+            torch.Tensor | None: [2] tensor with the (x, y) pith point or None if there is no point object.
+        """
         pith = None
-        mask = torch.zeros(len(self.class_to_id), *data["image"].shape[1:], dtype=torch.int64)
-        for obj in data["annotation"]["objects"]:
+        for obj in annotation["objects"]:
             if obj["geometryType"] == "point":
-                mask = self.draw_point_into_mask(mask, obj)
                 pith = torch.tensor(obj["points"]["exterior"][0])
 
+        return pith
+
+    def rasterize_legacy(self, annotation: dict[str, Any], shape: tuple[int, int]) -> torch.Tensor:
+        """Builds the composite mask through the per-class [C, H, W] mask and `merge_overlapping_masks`.
+
+        This is the original rasterization path, kept as the reference for `rasterize_objects`.
+
+        Args:
+            annotation: Supervisely json annotation.
+            shape: (height, width) of the mask.
+
+        Returns:
+            torch.Tensor: [H, W] int64 mask with class IDs, prioritized by importance.
+        """
+        mask = torch.zeros(len(self.class_to_id), *shape, dtype=torch.int64)
+        for obj in annotation["objects"]:
+            if obj["geometryType"] == "point":
+                mask = self.draw_point_into_mask(mask, obj)
+
             elif obj["geometryType"] == "polygon":
                 mask = self.draw_polygon_into_mask(mask, obj)
 
@@ -52,9 +92,8 @@ class CTLogMaskPreprocessor(CTLogDatasetBase):
                 message = f"Unsupported geometry type: {obj['geometryType']}"
                 raise ValueError(message)
 
-        data.update({"mask": self.merge_overlapping_masks(mask), "pith": pith})
-
-        return data
+        with instrumentation.stage("merge_overlapping_masks", nbytes=mask.nbytes):
+            return self.merge_overlapping_masks(mask)
 
     def draw_point_into_mask(self, mask: torch.Tensor, obj: dict[str, Any], blob_radius: int = 3) -> torch.Tensor:
         """Draws a point into the provided multi-class mask tensor.
@@ -0,0 +1,145 @@
+from typing import Any
+
+import numpy as np
+import torch
+from torch.utils.data import Dataset
+
+from src.dataset.ct_log_dataset import CTLogDataset
+from src.dataset.ct_log_shard_dataset import CTLogShardDataset
+from src.utils.class_stats import ClassStats
+
+
+class CTLogPatchDataset(Dataset):
+    """Serves fixed-size crops of CT log samples, biased toward rare classes and the pith.
+
+    Every crop is placed by one of three strategies:
+        - pith: centered on the pith point of a random sample with a pith, jittered by up to a quarter of the
+          patch size, with probability `pith_probability`.
+        - random: uniformly within a random sample, with probability `random_probability`.
+        - class: otherwise, a class is drawn according to `class_weights`, then a random sample containing it,
+          and the crop is centered on a random point of the class bounding box.
+
+    Only the region of a crop is read from the source: shards read the covered pages only, RLE masks decode the
+    covered rows only. Crops of samples smaller than the patch are padded with background. The crops of an epoch
+    only depend on `seed`, the epoch set by `set_epoch` and the index, so they do not depend on the workers.
+
+    Args:
+        source: Dataset the crops are read from, with processed masks.
+        class_stats: Per-image class statistics of the source, e.g. from `CTLogDataset.get_class_stats`.
+        patch_size: (height, width) of the crops.
+        num_patches: Number of crops per epoch. If None, one crop per sample of the source.
+        class_weights: Relative sampling weights of class titles for class-centered crops. If None, every class
+            except the background is equally likely. Classes absent from all samples are never drawn.
+        pith_probability: Probability of a crop around the pith.
+        random_probability: Probability of a uniformly placed crop.
+        seed: Seed of the crop placement.
+
+    Raises:
+        ValueError: If the class statistics do not match the source or the probabilities exceed 1.
+    """
+
+    def __init__(
+        self,
+        source: CTLogDataset | CTLogShardDataset,
+        class_stats: ClassStats,
+        patch_size: tuple[int, int] = (256, 256),
+        num_patches: int | None = None,
+        class_weights: dict[str, float] | None = None,
+        pith_probability: float = 0.1,
+        random_probability: float = 0.2,
+        seed: int = 0,
+    ) -> None:
+        if len(class_stats) != len(source):
+            message = f"Class statistics of {len(class_stats)} samples do not match the {len(source)} source samples."
+            raise ValueError(message)
+
+        if pith_probability + random_probability > 1:
+            message = "The pith and random crop probabilities must not exceed 1 in total."
+            raise ValueError(message)
+
+        self.source = source
+        self.class_stats = class_stats
+        self.patch_size = patch_size
+        self.num_patches = num_patches if num_patches is not None else len(source)
+        self.pith_probability = pith_probability
+        self.random_probability = random_probability
+        self.seed = seed
+        self.epoch = 0
+
+        self.shapes = class_stats.shapes
+        self.pith_indices = np.flatnonzero(~np.isnan(class_stats.piths[:, 0]))
+
+        classes = [str(title) for title in class_stats.classes]
+        if class_weights is None:
+            class_weights = {title: 1.0 for title in classes if title != "background"}
+
+        present = class_stats.counts > 0
+        class_ids = [classes.index(title) for title in class_weights if title in classes]
+        self.class_ids = np.array([class_id for class_id in class_ids if present[:, class_id].any()], dtype=np.int64)
+        weights = np.array([class_weights[classes[class_id]] for class_id in self.class_ids], dtype=np.float64)
+        self.class_probabilities = weights / weights.sum() if weights.sum() > 0 else weights
+        self.class_indices = [np.flatnonzero(present[:, class_id]) for class_id in self.class_ids]
+
+    def set_epoch(self, epoch: int) -> None:
+        """Sets the epoch, which changes the placement of all crops."""
+        self.epoch = epoch
+
+    def __len__(self) -> int:
+        return self.num_patches
+
+    def _place(self, rng: np.random.Generator) -> tuple[int, float, float]:
+        """Draws a sample and the (y, x) center of a crop."""
+        strategy = rng.random()
+        if strategy < self.pith_probability and len(self.pith_indices):
+            sample = int(rng.choice(self.pith_indices))
+            x, y = self.class_stats.piths[sample]
+            jitter = rng.uniform(-0.25, 0.25, size=2) * self.patch_size
+            return sample, y + jitter[0], x + jitter[1]
+
+        if strategy < self.pith_probability + self.random_probability or not len(self.class_ids):
+            sample = int(rng.integers(len(self.shapes)))
+            height, width = self.shapes[sample]
+            return sample, rng.uniform(0, height), rng.uniform(0, width)
+
+        choice = rng.choice(len(self.class_ids), p=self.class_probabilities)
+        sample = int(rng.choice(self.class_indices[choice]))
+        x_min, y_min, x_max, y_max = self.class_stats.bboxes[sample, self.class_ids[choice]]
+        return sample, rng.uniform(y_min, y_max + 1), rng.uniform(x_min, x_max + 1)
+
+    def __getitem__(self, idx: int) -> dict[str, Any]:
+        """Loads a crop.
+
+        Args:
+            idx: Index of the crop within the epoch.
+
+        Returns:
+            dict[str, Any]: keys:
+                - image: [C, H, W] uint8 tensor of the crop.
+                - mask: [H, W] uint8 tensor of the crop.
+                - path: Name of the sample's image file.
+                - origin: (top, left) of the crop in the sample.
+                - original_shape: (H, W) of the sample.
+        """
+        rng = np.random.default_rng([self.seed, self.epoch, idx])
+        sample, center_y, center_x = self._place(rng)
+
+        (patch_height, patch_width), (height, width) = self.patch_size, self.shapes[sample]
+        region_height, region_width = min(patch_height, int(height)), min(patch_width, int(width))
+        top = int(np.clip(round(center_y - patch_height / 2), 0, height - region_height))
+        left = int(np.clip(round(center_x - patch_width / 2), 0, width - region_width))
+
+        image, mask = self.source.load_region(sample, top, left, region_height, region_width)
+        if (region_height, region_width) != (patch_height, patch_width):
+            padded_image = image.new_zeros((image.shape[0], patch_height, patch_width))
+            padded_image[:, :region_height, :region_width] = image
+            padded_mask = mask.new_zeros((patch_height, patch_width))
+            padded_mask[:region_height, :region_width] = mask
+            image, mask = padded_image, padded_mask
+
+        return {
+            "image": image,
+            "mask": mask,
+            "path": str(self.class_stats.names[sample]),
+            "origin": (top, left),
+            "original_shape": torch.Size((int(height), int(width))),
+        }
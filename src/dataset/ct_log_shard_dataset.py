@@ -0,0 +1,103 @@
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import torch
+from torch.utils.data import Dataset
+
+from src.utils.shards import load_shard_index, shard_file_name
+
+
+class CTLogShardDataset(Dataset):
+    """Serves CT log samples from packed shard files written by `scripts/export_shards.py`.
+
+    Shards are read through `numpy.memmap`, so samples are zero-copy views into the page cache that is shared
+    by all DataLoader workers. No PNG decoding happens at access time.
+
+    Args:
+        shards_dir: Directory containing the shard files and the index.
+
+    Raises:
+        FileNotFoundError: If the shards directory does not exist.
+    """
+
+    def __init__(self, shards_dir: str | Path) -> None:
+        self.shards_dir = Path(shards_dir)
+        if not self.shards_dir.exists():
+            message = f"Shards directory {shards_dir} does not exist."
+            raise FileNotFoundError(message)
+
+        self.index, self.names = load_shard_index(self.shards_dir)
+        self._shards: dict[int, np.memmap] = {}
+
+    def __getstate__(self) -> dict[str, Any]:
+        # Memory maps are reopened lazily in every process instead of being pickled as full arrays.
+        state = self.__dict__.copy()
+        state["_shards"] = {}
+        return state
+
+    def _get_shard(self, shard: int) -> np.memmap:
+        """Returns the memory map of the shard, opening it on first access."""
+        if shard not in self._shards:
+            # Copy-on-write mode keeps the pages shared while yielding writable arrays for torch.from_numpy.
+            self._shards[shard] = np.memmap(self.shards_dir / shard_file_name(shard), dtype=np.uint8, mode="c")
+
+        return self._shards[shard]
+
+    def _get_arrays(self, idx: int) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the [C, H, W] image and [H, W] mask views of a sample."""
+        record = self.index[idx]
+        shard = self._get_shard(int(record["shard"]))
+        channels, height, width = int(record["channels"]), int(record["height"]), int(record["width"])
+
+        image_offset, mask_offset = int(record["image_offset"]), int(record["mask_offset"])
+        image = shard[image_offset : image_offset + channels * height * width].reshape(channels, height, width)
+        mask = shard[mask_offset : mask_offset + height * width].reshape(height, width)
+
+        return image, mask
+
+    def load_region(
+        self, idx: int, top: int, left: int, height: int, width: int,
+    ) -> tuple[torch.Tensor, torch.Tensor]:
+        """Loads a region of the image and mask of a sample, reading only the pages the region covers.
+
+        Args:
+            idx: Index of the sample.
+            top: First row of the region.
+            left: First column of the region.
+            height: Number of rows of the region, which must lie within the sample.
+            width: Number of columns of the region, which must lie within the sample.
+
+        Returns:
+            tuple[torch.Tensor, torch.Tensor]: [C, height, width] uint8 image and [height, width] uint8 mask.
+        """
+        image, mask = self._get_arrays(idx)
+        return (
+            torch.from_numpy(np.ascontiguousarray(image[:, top : top + height, left : left + width])),
+            torch.from_numpy(np.ascontiguousarray(mask[top : top + height, left : left + width])),
+        )
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __getitem__(self, idx: int) -> dict[str, Any]:
+        """Loads an item from the shards.
+
+        Args:
+            idx: Index of the item to retrieve.
+
+        Returns:
+            dict[str, Any]: keys:
+                - image: [C, H, W] uint8 tensor view of the image.
+                - mask: [H, W] uint8 tensor view of the mask.
+                - path: Name of the image file.
+                - original_shape: (H, W) of the sample.
+        """
+        image, mask = self._get_arrays(idx)
+
+        return {
+            "image": torch.from_numpy(image),
+            "mask": torch.from_numpy(mask),
+            "path": self.names[idx],
+            "original_shape": torch.Size(mask.shape),
+        }
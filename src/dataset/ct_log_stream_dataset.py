@@ -0,0 +1,103 @@
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+import random
+from typing import Any
+
+from torch.utils.data import IterableDataset, get_worker_info
+
+from src.dataset.ct_log_dataset import CTLogDataset
+
+
+class CTLogStreamDataset(IterableDataset):
+    """Streams the items of a `CTLogDataset`, loading the next ones in a thread pool of every DataLoader worker.
+
+    File reads and PNG decoding release the GIL, so a few threads per process overlap I/O and decoding that
+    would otherwise need more DataLoader processes, each with its own copy of the dataset. At most `prefetch`
+    items are loaded or waiting at any time. The items are split between the DataLoader workers, with
+    `num_workers=0` the main process streams all of them.
+
+    Args:
+        dataset: Dataset to load the items from.
+        threads: Number of threads loading items in every process.
+        prefetch: Maximum number of items loaded ahead in every process.
+        ordered: If True, items are delivered in index order, otherwise as soon as they are loaded.
+        shuffle: If True, the order of the items is shuffled every epoch.
+        seed: Seed of the shuffling.
+
+    Raises:
+        ValueError: If `threads` or `prefetch` is smaller than 1.
+    """
+
+    def __init__(
+        self,
+        dataset: CTLogDataset,
+        threads: int = 4,
+        prefetch: int = 16,
+        ordered: bool = True,
+        shuffle: bool = False,
+        seed: int = 0,
+    ) -> None:
+        if threads < 1 or prefetch < 1:
+            message = f"threads and prefetch must be at least 1, got {threads} and {prefetch}."
+            raise ValueError(message)
+
+        self.dataset = dataset
+        self.threads = threads
+        self.prefetch = prefetch
+        self.ordered = ordered
+        self.shuffle = shuffle
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch: int) -> None:
+        """Sets the epoch, which changes the shuffling order."""
+        self.epoch = epoch
+
+    def __len__(self) -> int:
+        return len(self.dataset)
+
+    def _indices(self) -> list[int]:
+        """Returns the indices of the items streamed by the current process, in the order of the epoch."""
+        indices = list(range(len(self.dataset)))
+        if self.shuffle:
+            random.Random(self.seed + self.epoch).shuffle(indices)
+
+        worker_info = get_worker_info()
+        if worker_info is not None:
+            indices = indices[worker_info.id :: worker_info.num_workers]
+
+        return indices
+
+    def __iter__(self) -> Iterator[dict[str, Any]]:
+        indices = iter(self._indices())
+        executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="ct-log-prefetch")
+        try:
+            yield from (self._iter_ordered if self.ordered else self._iter_unordered)(executor, indices)
+        finally:
+            # Stops loading ahead when the consumer stops early, e.g. at the end of a limited number of steps.
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _iter_ordered(self, executor: ThreadPoolExecutor, indices: Iterator[int]) -> Iterator[dict[str, Any]]:
+        """Yields the items in index order, keeping up to `prefetch` of them in flight."""
+        pending: deque[Future] = deque()
+        for idx in indices:
+            pending.append(executor.submit(self.dataset.__getitem__, idx))
+            if len(pending) >= self.prefetch:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+    def _iter_unordered(self, executor: ThreadPoolExecutor, indices: Iterator[int]) -> Iterator[dict[str, Any]]:
+        """Yields the items as soon as they are loaded, keeping up to `prefetch` of them in flight."""
+        pending: set[Future] = set()
+        for idx in indices:
+            pending.add(executor.submit(self.dataset.__getitem__, idx))
+            if len(pending) >= self.prefetch:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                yield from (future.result() for future in done)
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            yield from (future.result() for future in done)
@@ -0,0 +1,151 @@
+from collections.abc import Iterator, Sequence
+import math
+from pathlib import Path
+import random
+
+import numpy as np
+from torch.utils.data import Sampler
+
+from src.utils.scan import load_scan_cache, scan_resolutions
+
+BucketedIndex = tuple[int, tuple[int, int]]
+
+
+def load_item_sizes(
+    image_paths: Sequence[Path], data_dir: Path, scan_path: Path | None = None,
+) -> list[tuple[int, int]]:
+    """Returns the (height, width) of every image from existing metadata, without decoding any pixels.
+
+    Sizes come from the result of `scripts/scan_resolutions.py` if it is given and up to date, otherwise the
+    image info files or PNG headers are scanned.
+
+    Args:
+        image_paths: Paths to the images, in the order of the dataset.
+        data_dir: Path to the dataset directory with the "img" and "img_info" directories.
+        scan_path: Path to a previous scan result (resolution_scan.json), if any.
+
+    Returns:
+        list[tuple[int, int]]: (height, width) of every image.
+    """
+    cache = load_scan_cache(scan_path) if scan_path is not None else {}
+    scan = scan_resolutions(data_dir, cache)
+
+    return [(scan[path.name][0], scan[path.name][1]) for path in image_paths]
+
+
+class AspectRatioBatchSampler(Sampler[list[BucketedIndex]]):
+    """Groups items of similar aspect ratio into batches that share a bucket-specific target size.
+
+    Items are split into `num_buckets` equal-frequency aspect-ratio buckets. Every bucket gets the median
+    height and width of its items as the target size, scaled down to at most `max_pixels` and rounded to a
+    multiple of `size_divisor`, so batches need no padding and little resizing. Batches contain
+    `(index, target_size)` pairs that `CTLogDataset` resizes accordingly.
+
+    With multiple ranks, every global batch of `batch_size * num_replicas` items comes from a single bucket and
+    is split between the ranks, so all ranks see the same number of batches and the same target size at every
+    step. The order only depends on `seed` and the epoch set by `set_epoch`.
+
+    Args:
+        sizes: (height, width) of every item of the dataset.
+        batch_size: Number of items per batch and rank.
+        num_buckets: Number of aspect-ratio buckets.
+        max_pixels: Maximum number of pixels of a target size. If None, the median sizes are not scaled.
+        size_divisor: Target heights and widths are rounded to a multiple of this value.
+        shuffle: If True, items within buckets and the order of batches are shuffled every epoch.
+        seed: Seed of the shuffling, must be the same on all ranks.
+        drop_last: If True, incomplete global batches are dropped, otherwise they are filled with repeated items.
+        num_replicas: Number of ranks taking part in the training.
+        rank: Rank of the current process.
+    """
+
+    def __init__(
+        self,
+        sizes: list[tuple[int, int]],
+        batch_size: int,
+        num_buckets: int = 8,
+        max_pixels: int | None = None,
+        size_divisor: int = 32,
+        shuffle: bool = True,
+        seed: int = 0,
+        drop_last: bool = False,
+        num_replicas: int = 1,
+        rank: int = 0,
+    ) -> None:
+        if not 0 <= rank < num_replicas:
+            message = f"Invalid rank {rank} for {num_replicas} replicas."
+            raise ValueError(message)
+
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.seed = seed
+        self.drop_last = drop_last
+        self.num_replicas = num_replicas
+        self.rank = rank
+        self.epoch = 0
+
+        heights, widths = np.array(sizes, dtype=np.float64).reshape(-1, 2).T
+        aspect_ratios = widths / heights
+        edges = np.quantile(aspect_ratios, np.linspace(0, 1, num_buckets + 1)[1:-1]) if len(sizes) else []
+        assignment = np.searchsorted(edges, aspect_ratios, side="right")
+
+        self.buckets: list[list[int]] = []
+        self.target_sizes: list[tuple[int, int]] = []
+        for bucket in np.unique(assignment):
+            indices = np.flatnonzero(assignment == bucket)
+            self.buckets.append(indices.tolist())
+            self.target_sizes.append(
+                self._target_size(
+                    float(np.median(heights[indices])), float(np.median(widths[indices])), max_pixels, size_divisor,
+                ),
+            )
+
+    @staticmethod
+    def _target_size(height: float, width: float, max_pixels: int | None, size_divisor: int) -> tuple[int, int]:
+        """Scales a size down to at most `max_pixels` and rounds it to a multiple of `size_divisor`."""
+        if max_pixels is not None and height * width > max_pixels:
+            scale = math.sqrt(max_pixels / (height * width))
+            height, width = height * scale, width * scale
+
+        return (
+            max(size_divisor, round(height / size_divisor) * size_divisor),
+            max(size_divisor, round(width / size_divisor) * size_divisor),
+        )
+
+    def set_epoch(self, epoch: int) -> None:
+        """Sets the epoch, which changes the shuffling order. Must be called on all ranks."""
+        self.epoch = epoch
+
+    def _global_batches(self) -> list[tuple[list[int], tuple[int, int]]]:
+        """Returns the global batches of all ranks with their target size, in the order of the epoch."""
+        rng = random.Random(self.seed + self.epoch)
+        global_batch_size = self.batch_size * self.num_replicas
+
+        batches = []
+        for indices, target_size in zip(self.buckets, self.target_sizes):
+            indices = list(indices)
+            if self.shuffle:
+                rng.shuffle(indices)
+
+            if self.drop_last:
+                indices = indices[: len(indices) - len(indices) % global_batch_size]
+            elif remainder := len(indices) % global_batch_size:
+                padding = global_batch_size - remainder
+                indices += (indices * math.ceil(padding / len(indices)))[:padding]
+
+            for start in range(0, len(indices), global_batch_size):
+                batches.append((indices[start : start + global_batch_size], target_size))
+
+        if self.shuffle:
+            rng.shuffle(batches)
+
+        return batches
+
+    def __iter__(self) -> Iterator[list[BucketedIndex]]:
+        for indices, target_size in self._global_batches():
+            local = indices[self.rank * self.batch_size : (self.rank + 1) * self.batch_size]
+            yield [(idx, target_size) for idx in local]
+
+    def __len__(self) -> int:
+        global_batch_size = self.batch_size * self.num_replicas
+        rounding = math.floor if self.drop_last else math.ceil
+        return sum(rounding(len(indices) / global_batch_size) for indices in self.buckets)
@@ -0,0 +1,186 @@
+from collections.abc import Callable, Sequence
+import json
+import os
+from pathlib import Path
+from typing import Any, BinaryIO
+
+import numpy as np
+
+from src.utils.mask import base64_to_mask_shape
+from src.utils.rasterizer import normalize_class_title
+from src.utils.resize_cache import source_stamp
+
+GEOMETRY_TYPES = ("point", "polygon", "bitmap")
+
+OBJECT_DTYPE = np.dtype(
+    [
+        ("title", "<i2"),
+        ("geometry", "<i1"),
+        ("x_min", "<i4"),
+        ("y_min", "<i4"),
+        ("x_max", "<i4"),
+        ("y_max", "<i4"),
+    ],
+)
+
+
+def object_bbox(obj: dict[str, Any]) -> tuple[int, int, int, int]:
+    """Computes the bounding box of a Supervisely object without rasterizing it.
+
+    Args:
+        obj: Object of the "point", "polygon" or "bitmap" geometry type.
+
+    Returns:
+        tuple[int, int, int, int]: Inclusive (x_min, y_min, x_max, y_max) bounding box.
+    """
+    if obj["geometryType"] == "bitmap":
+        x, y = obj["bitmap"]["origin"]
+        height, width = base64_to_mask_shape(obj["bitmap"]["data"])
+        return x, y, x + width - 1, y + height - 1
+
+    points = np.asarray(obj["points"]["exterior"], dtype=np.float64).reshape(-1, 2)
+    x_min, y_min = np.floor(points.min(axis=0)).astype(int)
+    x_max, y_max = np.ceil(points.max(axis=0)).astype(int)
+
+    return int(x_min), int(y_min), int(x_max), int(y_max)
+
+
+def build_annotation_index(
+    annotation_paths: Sequence[Path],
+    output_path: Path,
+    open_file: Callable[[Path], BinaryIO] | None = None,
+    stamp: np.ndarray | None = None,
+) -> None:
+    """Parses all annotations once and saves their compact index.
+
+    The index holds the class title, geometry type and bounding box of every object and the pith point of
+    every annotation, i.e. the first point of its last point object.
+
+    Args:
+        annotation_paths: Paths to the Supervisely json annotations.
+        output_path: Path where the index (.npz) will be saved.
+        open_file: Opens an annotation for binary reading, e.g. `CTLogDatasetBase.open_file` for the members of
+            an archive. If None, the annotations are opened from the file system.
+        stamp: Sizes and modification times of the annotations as created by `source_stamp`. If None, the
+            annotations are stated on the file system.
+
+    Raises:
+        ValueError: If an object has an unsupported geometry type.
+    """
+    titles: dict[str, int] = {}
+    objects: list[tuple[int, int, int, int, int, int]] = []
+    offsets = [0]
+    piths = np.full((len(annotation_paths), 2), np.nan, dtype=np.float64)
+
+    for idx, path in enumerate(annotation_paths):
+        with open_file(path) if open_file is not None else path.open("rb") as f:
+            annotation = json.load(f)
+
+        for obj in annotation["objects"]:
+            if obj["geometryType"] not in GEOMETRY_TYPES:
+                message = f"Unsupported geometry type: {obj['geometryType']}"
+                raise ValueError(message)
+
+            if obj["geometryType"] == "point":
+                piths[idx] = obj["points"]["exterior"][0]
+
+            title = titles.setdefault(normalize_class_title(obj["classTitle"]), len(titles))
+            objects.append((title, GEOMETRY_TYPES.index(obj["geometryType"]), *object_bbox(obj)))
+
+        offsets.append(len(objects))
+
+    tmp_path = output_path.with_name(f"{output_path.stem}.{os.getpid()}.tmp.npz")
+    np.savez(
+        tmp_path,
+        objects=np.array(objects, dtype=OBJECT_DTYPE),
+        offsets=np.array(offsets, dtype=np.int64),
+        piths=piths,
+        titles=np.array(list(titles), dtype=np.str_),
+        names=np.array([path.name for path in annotation_paths], dtype=np.str_),
+        source_stamp=stamp if stamp is not None else source_stamp(list(annotation_paths)),
+    )
+    os.replace(tmp_path, output_path)
+
+
+class AnnotationIndex:
+    """Read access to a compact annotation index built by `build_annotation_index`.
+
+    Arrays are loaded lazily on first access, so opening the index is cheap.
+
+    Args:
+        index_path: Path to the index (.npz).
+    """
+
+    def __init__(self, index_path: str | Path) -> None:
+        self.index_path = Path(index_path)
+        self._arrays: dict[str, np.ndarray] = {}
+
+    def _get(self, key: str) -> np.ndarray:
+        """Returns an array of the index, loading it on first access."""
+        if key not in self._arrays:
+            with np.load(self.index_path) as index:
+                self._arrays[key] = index[key]
+
+        return self._arrays[key]
+
+    def is_current(self, annotation_paths: Sequence[Path], stamp: np.ndarray | None = None) -> bool:
+        """Checks whether the index was built from the given annotations in their current state.
+
+        Args:
+            annotation_paths: Paths to the Supervisely json annotations.
+            stamp: Current sizes and modification times of the annotations as created by `source_stamp`. If None,
+                the annotations are stated on the file system.
+
+        Returns:
+            bool: True if the annotation names, sizes and modification times match the index.
+        """
+        if not self.index_path.exists():
+            return False
+
+        names = self._get("names")
+        return (
+            len(names) == len(annotation_paths)
+            and all(name == path.name for name, path in zip(names, annotation_paths))
+            and np.array_equal(
+                self._get("source_stamp"), stamp if stamp is not None else source_stamp(list(annotation_paths)),
+            )
+        )
+
+    def __len__(self) -> int:
+        return len(self._get("offsets")) - 1
+
+    def objects(self, idx: int) -> list[dict[str, Any]]:
+        """Returns the metadata of all objects of an annotation.
+
+        Args:
+            idx: Index of the annotation.
+
+        Returns:
+            list[dict[str, Any]]: For every object, keys:
+                - classTitle: Normalized class title.
+                - geometryType: "point", "polygon" or "bitmap".
+                - bbox: Inclusive (x_min, y_min, x_max, y_max) bounding box.
+        """
+        offsets, titles = self._get("offsets"), self._get("titles")
+        records = self._get("objects")[offsets[idx] : offsets[idx + 1]]
+
+        return [
+            {
+                "classTitle": str(titles[record["title"]]),
+                "geometryType": GEOMETRY_TYPES[record["geometry"]],
+                "bbox": (int(record["x_min"]), int(record["y_min"]), int(record["x_max"]), int(record["y_max"])),
+            }
+            for record in records
+        ]
+
+    def pith(self, idx: int) -> tuple[float, float] | None:
+        """Returns the pith point of an annotation.
+
+        Args:
+            idx: Index of the annotation.
+
+        Returns:
+            tuple[float, float] | None: (x, y) pith point or None if the annotation has no point object.
+        """
+        x, y = self._get("piths")[idx]
+        return None if np.isnan(x) else (float(x), float(y))
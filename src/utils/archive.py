@@ -0,0 +1,263 @@
+from collections.abc import Iterator
+import json
+import os
+from pathlib import Path, PurePosixPath
+import tarfile
+import threading
+import time
+from typing import Any
+import zipfile
+
+from src.utils.file_index import IMAGE_SUFFIX, pair_stems
+
+ARCHIVE_INDEX_VERSION = 1
+
+# Size, modification time in nanoseconds and content of an archive member.
+Member = tuple[int, int, bytes]
+
+
+def is_archive(path: Path) -> bool:
+    """Checks whether a path is a zip or tar archive (possibly compressed) rather than a directory."""
+    return path.is_file() and (zipfile.is_zipfile(path) or tarfile.is_tarfile(path))
+
+
+def zip_mtime_ns(info: zipfile.ZipInfo) -> int:
+    """Returns the modification time of a zip member in nanoseconds since the epoch (local time, 2 s resolution)."""
+    return int(time.mktime((*info.date_time, 0, 0, -1)) * 1e9)
+
+
+def split_member_name(name: str, layout: dict[str, str]) -> tuple[str, str, str] | None:
+    """Splits the name of an archive member into its dataset prefix, directory and stem.
+
+    Args:
+        name: Name of the member, e.g. "set_24/ann/0001.png.json".
+        layout: For every directory name the suffix of its files after the image file name.
+
+    Returns:
+        tuple[str, str, str] | None: Prefix (e.g. "set_24"), directory (e.g. "ann") and stem (e.g. "0001.png"),
+            or None if the member does not belong to a directory of the layout.
+    """
+    path = PurePosixPath(name)
+    directory = path.parent.name
+    if directory not in layout or not path.name.endswith(IMAGE_SUFFIX + layout[directory]):
+        return None
+
+    prefix = path.parent.parent.as_posix()
+    return "" if prefix == "." else prefix, directory, path.name[: len(path.name) - len(layout[directory])]
+
+
+def iter_archive_members(path: Path) -> Iterator[tuple[str, Member]]:
+    """Reads all file members of a zip or tar archive in a single sequential pass, without extracting them.
+
+    Compressed tar archives (gzip, bzip2, xz) are decompressed on the fly.
+
+    Args:
+        path: Path to the archive.
+
+    Yields:
+        tuple[str, Member]: Name of the member and its size, modification time and content.
+    """
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if not info.is_dir():
+                    yield info.filename, (info.file_size, zip_mtime_ns(info), archive.read(info))
+        return
+
+    with tarfile.open(path, "r|*") as archive:
+        for member in archive:
+            file = archive.extractfile(member) if member.isfile() else None
+            if file is not None:
+                yield member.name, (member.size, int(member.mtime * 1e9), file.read())
+
+
+def iter_archive_items(
+    path: Path, layout: dict[str, str], unpaired: dict[str, list[str]] | None = None,
+) -> Iterator[tuple[str, dict[str, Member]]]:
+    """Streams the items of a Supervisely archive in one sequential pass, pairing their members by stem.
+
+    Members are held in memory until all members of their item were read, so memory use stays small when the
+    archive stores the members of an item close to each other, and grows with the distance between them
+    otherwise, e.g. to all annotations when they precede all images.
+
+    Args:
+        path: Path to the archive.
+        layout: For every directory name the suffix of its files after the image file name.
+        unpaired: If given, it is filled with the stems missing from every directory at the end of the archive.
+
+    Raises:
+        ValueError: If the archive contains more than one dataset, i.e. directories of the layout under
+            different prefixes.
+
+    Yields:
+        tuple[str, dict[str, Member]]: Stem of the item and its member of every directory of the layout.
+    """
+    prefix = None
+    pending: dict[str, dict[str, Member]] = {}
+    listed: dict[str, set[str]] = {directory: set() for directory in layout}
+
+    for name, member in iter_archive_members(path):
+        split = split_member_name(name, layout)
+        if split is None:
+            continue
+
+        member_prefix, directory, stem = split
+        if prefix is None:
+            prefix = member_prefix
+        elif member_prefix != prefix:
+            message = f"{path} contains several datasets ({prefix!r} and {member_prefix!r}), which is not supported."
+            raise ValueError(message)
+
+        listed[directory].add(stem)
+        members = pending.setdefault(stem, {})
+        members[directory] = member
+        if len(members) == len(layout):
+            yield stem, pending.pop(stem)
+
+    if unpaired is not None:
+        unpaired.update(pair_stems(listed)[1])
+
+
+class ArchiveReader:
+    """Random access to the members of a zip or uncompressed tar archive, without extracting them.
+
+    Zip archives are read through their central directory. Tar archives have no directory, so their member
+    offsets are scanned once and saved next to the archive, keyed by the archive size and modification time,
+    unless the archive lies on a read-only file system. Reads are safe from multiple threads. Every process opens
+    its own handle on its first read, so DataLoader workers neither share the file offset of a handle inherited
+    by fork nor receive one by pickling.
+
+    Args:
+        path: Path to the archive.
+
+    Raises:
+        ValueError: If the archive is a compressed tar archive, whose members cannot be read at random.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.is_zip = zipfile.is_zipfile(self.path)
+        self._file: Any = None
+        self._pid: int | None = None
+        self._lock = threading.Lock()
+
+        if self.is_zip:
+            with zipfile.ZipFile(self.path) as archive:
+                self.members = {
+                    info.filename: (info.file_size, zip_mtime_ns(info), -1)
+                    for info in archive.infolist()
+                    if not info.is_dir()
+                }
+        else:
+            self.members = self._load_tar_members()
+
+    def __getstate__(self) -> dict[str, Any]:
+        # Open file handles are not pickled, every process reopens the archive on its first read.
+        state = self.__dict__.copy()
+        state.update(_file=None, _pid=None)
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _handle(self) -> Any:
+        """Returns the open archive of the current process, opening it on the first read of the process."""
+        pid = os.getpid()
+        if self._file is None or self._pid != pid:
+            with self._lock:
+                if self._file is None or self._pid != pid:
+                    # A handle inherited by fork shares its file offset with the parent, so it is never reused.
+                    self._file = zipfile.ZipFile(self.path) if self.is_zip else self.path.open("rb")
+                    self._pid = pid
+
+        return self._file
+
+    @property
+    def index_path(self) -> Path:
+        """Path of the saved member offsets of a tar archive."""
+        return self.path.with_name(f"{self.path.name}.index.json")
+
+    def _load_tar_members(self) -> dict[str, tuple[int, int, int]]:
+        """Returns the size, modification time and data offset of every file member of an uncompressed tar."""
+        stat = self.path.stat()
+        stamp = [ARCHIVE_INDEX_VERSION, stat.st_size, stat.st_mtime_ns]
+        if self.index_path.exists():
+            with self.index_path.open("r") as f:
+                index = json.load(f)
+            if index["stamp"] == stamp:
+                return {name: tuple(member) for name, member in index["members"].items()}
+
+        try:
+            with tarfile.open(self.path, "r:") as archive:
+                # Names are normalized, e.g. "./set_24/ann/..." to "set_24/ann/...", to match dataset paths.
+                members = {
+                    PurePosixPath(member.name).as_posix(): (member.size, int(member.mtime * 1e9), member.offset_data)
+                    for member in archive
+                    if member.isfile()
+                }
+        except tarfile.ReadError as error:
+            message = (
+                f"{self.path} is not a zip or an uncompressed tar archive, so its members cannot be read at random. "
+                "Compressed tar archives can only be preprocessed in one pass by scripts/preprocess_dataset.py."
+            )
+            raise ValueError(message) from error
+
+        tmp_path = self.index_path.with_name(f"{self.index_path.name}.{os.getpid()}.tmp")
+        try:
+            with tmp_path.open("w") as f:
+                json.dump({"stamp": stamp, "members": members}, f)
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            # The offsets are only a cache, an archive on a read-only file system is scanned on every open.
+            tmp_path.unlink(missing_ok=True)
+
+        return members
+
+    def read(self, name: str) -> bytes:
+        """Reads the content of a member.
+
+        Args:
+            name: Name of the member.
+
+        Returns:
+            bytes: Content of the member.
+        """
+        handle = self._handle()
+        if self.is_zip:
+            return handle.read(name)
+
+        size, _, offset = self.members[name]
+        return os.pread(handle.fileno(), size, offset)
+
+    def index(self, layout: dict[str, str]) -> dict[str, Any]:
+        """Pairs the members of the directories of a layout by stem.
+
+        Args:
+            layout: For every directory name the suffix of its files after the image file name.
+
+        Raises:
+            ValueError: If the archive contains more than one dataset.
+
+        Returns:
+            dict[str, Any]: keys:
+                - prefix: Path of the dataset inside the archive, e.g. "set_24".
+                - stems: Sorted stems present in all directories.
+                - unpaired: For every directory the stems present in another directory but missing from it.
+        """
+        prefixes = set()
+        listed: dict[str, set[str]] = {directory: set() for directory in layout}
+        for name in self.members:
+            split = split_member_name(name, layout)
+            if split is not None:
+                prefixes.add(split[0])
+                listed[split[1]].add(split[2])
+
+        if len(prefixes) > 1:
+            datasets = ", ".join(sorted(prefixes))
+            message = f"{self.path} contains several datasets ({datasets}), which is not supported."
+            raise ValueError(message)
+
+        stems, unpaired = pair_stems(listed)
+        return {"prefix": prefixes.pop() if prefixes else "", "stems": stems, "unpaired": unpaired}
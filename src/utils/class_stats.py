@@ -0,0 +1,191 @@
+from collections.abc import Sequence
+import os
+from pathlib import Path
+
+import numpy as np
+
+from src.utils.resize_cache import source_stamp
+
+
+def mask_class_stats(mask: np.ndarray, num_classes: int) -> tuple[np.ndarray, np.ndarray]:
+    """Computes the pixel count and bounding box of every class of a class-ID mask.
+
+    Args:
+        mask: [H, W] uint8 mask with class IDs.
+        num_classes: Number of class IDs, including the background.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: [num_classes] int64 pixel counts and [num_classes, 4] int32 inclusive
+            (x_min, y_min, x_max, y_max) bounding boxes, -1 for classes not present in the mask.
+    """
+    counts = np.bincount(mask.ravel(), minlength=num_classes)[:num_classes].astype(np.int64)
+    bboxes = np.full((num_classes, 4), -1, dtype=np.int32)
+
+    for class_id in np.flatnonzero(counts):
+        present = mask == class_id
+        rows = np.flatnonzero(present.any(axis=1))
+        columns = np.flatnonzero(present.any(axis=0))
+        bboxes[class_id] = (columns[0], rows[0], columns[-1], rows[-1])
+
+    return counts, bboxes
+
+
+def save_class_stats(
+    output_path: Path,
+    names: Sequence[str],
+    classes: Sequence[str],
+    shapes: np.ndarray,
+    counts: np.ndarray,
+    bboxes: np.ndarray,
+    piths: np.ndarray,
+    mask_paths: Sequence[Path],
+) -> None:
+    """Saves per-image class statistics atomically.
+
+    Args:
+        output_path: Path where the statistics (.npz) will be saved.
+        names: Image file names.
+        classes: Class titles ordered by class ID.
+        shapes: [N, 2] int64 (height, width) of every image.
+        counts: [N, C] int64 pixel counts of every class.
+        bboxes: [N, C, 4] int32 bounding boxes as returned by `mask_class_stats`.
+        piths: [N, 2] float64 (x, y) pith points, NaN for images without one.
+        mask_paths: Paths to the masks the statistics were computed from, to detect outdated statistics.
+    """
+    tmp_path = output_path.with_name(f"{output_path.stem}.{os.getpid()}.tmp.npz")
+    np.savez(
+        tmp_path,
+        names=np.array(list(names), dtype=np.str_),
+        classes=np.array(list(classes), dtype=np.str_),
+        shapes=np.asarray(shapes, dtype=np.int64).reshape(-1, 2),
+        counts=np.asarray(counts, dtype=np.int64).reshape(-1, len(classes)),
+        bboxes=np.asarray(bboxes, dtype=np.int32).reshape(-1, len(classes), 4),
+        piths=np.asarray(piths, dtype=np.float64).reshape(-1, 2),
+        source_stamp=source_stamp(list(mask_paths)),
+    )
+    os.replace(tmp_path, output_path)
+
+
+class ClassStats:
+    """Read access to per-image class statistics saved by `save_class_stats`.
+
+    Arrays are loaded lazily on first access, so opening the statistics is cheap.
+
+    Args:
+        stats_path: Path to the statistics (.npz).
+    """
+
+    def __init__(self, stats_path: str | Path) -> None:
+        self.stats_path = Path(stats_path)
+        self._arrays: dict[str, np.ndarray] = {}
+
+    def _get(self, key: str) -> np.ndarray:
+        """Returns an array of the statistics, loading it on first access."""
+        if key not in self._arrays:
+            with np.load(self.stats_path) as stats:
+                self._arrays[key] = stats[key]
+
+        return self._arrays[key]
+
+    def is_current(self, mask_paths: Sequence[Path]) -> bool:
+        """Checks whether the statistics were computed from the given masks in their current state.
+
+        Args:
+            mask_paths: Paths to the masks.
+
+        Returns:
+            bool: True if the mask sizes and modification times match the statistics.
+        """
+        if not self.stats_path.exists() or len(self) != len(mask_paths):
+            return False
+
+        try:
+            return np.array_equal(self._get("source_stamp"), source_stamp(list(mask_paths)))
+        except FileNotFoundError:
+            return False
+
+    def __len__(self) -> int:
+        return len(self._get("names"))
+
+    @property
+    def names(self) -> np.ndarray:
+        """[N] image file names."""
+        return self._get("names")
+
+    @property
+    def classes(self) -> np.ndarray:
+        """[C] class titles ordered by class ID."""
+        return self._get("classes")
+
+    @property
+    def shapes(self) -> np.ndarray:
+        """[N, 2] (height, width) of every image."""
+        return self._get("shapes")
+
+    @property
+    def counts(self) -> np.ndarray:
+        """[N, C] pixel counts of every class."""
+        return self._get("counts")
+
+    @property
+    def bboxes(self) -> np.ndarray:
+        """[N, C, 4] inclusive (x_min, y_min, x_max, y_max) bounding boxes, -1 for absent classes."""
+        return self._get("bboxes")
+
+    @property
+    def piths(self) -> np.ndarray:
+        """[N, 2] (x, y) pith points, NaN for images without one."""
+        return self._get("piths")
+
+    def pith(self, idx: int) -> tuple[float, float] | None:
+        """Returns the pith point of an image.
+
+        Args:
+            idx: Index of the image.
+
+        Returns:
+            tuple[float, float] | None: (x, y) pith point or None if the annotation has no point object.
+        """
+        x, y = self._get("piths")[idx]
+        return None if np.isnan(x) else (float(x), float(y))
+
+    def class_frequencies(self) -> np.ndarray:
+        """Returns the [C] fraction of all pixels of the dataset belonging to every class."""
+        totals = self.counts.sum(axis=0)
+        return totals / max(int(totals.sum()), 1)
+
+    def image_frequencies(self) -> np.ndarray:
+        """Returns the [C] fraction of images containing every class."""
+        return (self.counts > 0).mean(axis=0) if len(self) else np.zeros(len(self.classes))
+
+    def class_weights(self, power: float = 0.5, ignore: Sequence[str] = ()) -> np.ndarray:
+        """Computes loss weights inversely proportional to a power of the pixel frequency of every class.
+
+        Args:
+            power: Exponent of the inverse frequency, 1 for inverse frequency, 0.5 for inverse square root.
+            ignore: Class titles that get a weight of 0, e.g. ("background",).
+
+        Returns:
+            np.ndarray: [C] float32 weights, normalized to a mean of 1 over the weighted classes. Classes absent
+                from the dataset get a weight of 0.
+        """
+        frequencies = self.class_frequencies()
+        weighted = (frequencies > 0) & ~np.isin(self.classes, list(ignore))
+
+        weights = np.zeros(len(frequencies), dtype=np.float64)
+        weights[weighted] = frequencies[weighted] ** -power
+        if weighted.any():
+            weights[weighted] /= weights[weighted].mean()
+
+        return weights.astype(np.float32)
+
+    def sample_weights(self, class_weights: np.ndarray) -> np.ndarray:
+        """Computes per-image sampling weights for a class-balanced `WeightedRandomSampler`.
+
+        Args:
+            class_weights: [C] weights of the classes, e.g. from `class_weights`.
+
+        Returns:
+            np.ndarray: [N] float64 weights, the largest weight of the classes present in every image.
+        """
+        return np.where(self.counts > 0, class_weights, 0).max(axis=1, initial=0).astype(np.float64)
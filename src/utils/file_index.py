@@ -0,0 +1,152 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+FILE_INDEX_VERSION = 1
+IMAGE_SUFFIX = ".png"
+
+
+def list_stems(directory: Path, suffix: str) -> list[str]:
+    """Lists the stems of the files of a directory, i.e. their image file names without the suffix.
+
+    Args:
+        directory: Directory to list.
+        suffix: Suffix following the image file name, e.g. ".json" for "<name>.png.json" annotations.
+
+    Returns:
+        list[str]: Sorted stems, empty if the directory does not exist.
+    """
+    if not directory.is_dir():
+        return []
+
+    pattern = IMAGE_SUFFIX + suffix
+    with os.scandir(directory) as entries:
+        names = [entry.name for entry in entries if entry.name.endswith(pattern)]
+
+    return sorted(name[: len(name) - len(suffix)] for name in names)
+
+
+def pair_stems(listed: dict[str, set[str]]) -> tuple[list[str], dict[str, list[str]]]:
+    """Pairs the stems listed in several directories.
+
+    Args:
+        listed: For every directory the stems of its files.
+
+    Returns:
+        tuple[list[str], dict[str, list[str]]]: Sorted stems present in all directories and for every directory
+            the sorted stems present in another directory but missing from it.
+    """
+    all_stems = set().union(*listed.values())
+    stems = sorted(all_stems.intersection(*listed.values()))
+    unpaired = {directory: sorted(all_stems - present) for directory, present in listed.items()}
+
+    return stems, unpaired
+
+
+def format_unpaired(unpaired: dict[str, list[str]], limit: int = 5) -> str:
+    """Formats unpaired stems for an error message, listing at most `limit` stems per directory."""
+    return "; ".join(
+        f"{len(stems)} missing from {directory}/: {', '.join(stems[:limit])}{', ...' if len(stems) > limit else ''}"
+        for directory, stems in unpaired.items()
+        if stems
+    )
+
+
+def directory_mtimes(data_dir: Path, layout: dict[str, str]) -> dict[str, int]:
+    """Returns the modification times of the directories of a layout, -1 for missing ones."""
+    mtimes = {}
+    for directory in layout:
+        try:
+            mtimes[directory] = (data_dir / directory).stat().st_mtime_ns
+        except FileNotFoundError:
+            mtimes[directory] = -1
+
+    return mtimes
+
+
+def scan_file_index(data_dir: Path, layout: dict[str, str], workers: int = 16) -> dict[str, Any]:
+    """Pairs the files of several directories by stem and records their sizes and modification times.
+
+    Args:
+        data_dir: Path to the dataset directory.
+        layout: For every directory name the suffix of its files after the image file name, e.g.
+            {"ann": ".json", "img": "", "img_info": ".json"}.
+        workers: Number of threads listing and stating the files.
+
+    Returns:
+        dict[str, Any]: keys:
+            - version: Version of the index format.
+            - layout: The given layout.
+            - directories: Modification times of the directories at the time of the scan.
+            - stems: Sorted stems present in all directories.
+            - stats: For every directory the [size, mtime_ns] of the file of every stem.
+            - unpaired: For every directory the stems present in another directory but missing from it.
+    """
+    directories = directory_mtimes(data_dir, layout)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        listings = executor.map(lambda item: set(list_stems(data_dir / item[0], item[1])), layout.items())
+        stems, unpaired = pair_stems(dict(zip(layout, listings)))
+
+        stats = {}
+        for directory, suffix in layout.items():
+            results = executor.map(os.stat, [data_dir / directory / f"{stem}{suffix}" for stem in stems])
+            stats[directory] = [[result.st_size, result.st_mtime_ns] for result in results]
+
+    return {
+        "version": FILE_INDEX_VERSION,
+        "layout": layout,
+        "directories": directories,
+        "stems": stems,
+        "stats": stats,
+        "unpaired": unpaired,
+    }
+
+
+def is_file_index_current(index: dict[str, Any], data_dir: Path, layout: dict[str, str]) -> bool:
+    """Checks whether the pairing of a file index is still valid with one stat per directory.
+
+    Adding, removing or renaming a file changes the modification time of its directory, so unchanged directory
+    modification times mean the same files are present. Files modified in place keep their paths, so they do not
+    invalidate the pairing.
+
+    Args:
+        index: File index as returned by `scan_file_index`.
+        data_dir: Path to the dataset directory.
+        layout: Layout the index is expected to have.
+
+    Returns:
+        bool: True if the index can be used without a rescan.
+    """
+    return (
+        index.get("version") == FILE_INDEX_VERSION
+        and index.get("layout") == layout
+        and index.get("directories") == directory_mtimes(data_dir, layout)
+    )
+
+
+def load_file_index(input_path: Path) -> dict[str, Any] | None:
+    """Loads a file index, or None if the file does not exist or cannot be parsed."""
+    try:
+        with input_path.open("r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def save_file_index(index: dict[str, Any], output_path: Path) -> None:
+    """Saves a file index atomically. The temporary file is unique per process, so concurrent writers are safe.
+
+    Raises:
+        OSError: If the index cannot be written, e.g. to a read-only directory. No temporary file is left behind.
+    """
+    tmp_path = output_path.with_name(f"{output_path.name}.{os.getpid()}.tmp")
+    try:
+        with tmp_path.open("w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, output_path)
+    except OSError:
+        tmp_path.unlink(missing_ok=True)
+        raise
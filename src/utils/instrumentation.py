@@ -0,0 +1,280 @@
+import math
+import multiprocessing
+from multiprocessing import util
+import os
+import queue
+import random
+import time
+from types import TracebackType
+from typing import Any, Self
+
+RESERVOIR_SIZE = 4096
+
+
+class StageStats:
+    """Running aggregates of a stage and a bounded uniform sample of its wall times for the percentiles.
+
+    The totals are exact. The wall times are kept in a reservoir of at most `reservoir_size` values, so memory
+    stays constant however long recording runs, and percentiles are estimated from the reservoir once it is full.
+
+    Args:
+        reservoir_size: Maximum number of wall times kept.
+    """
+
+    def __init__(self, reservoir_size: int = RESERVOIR_SIZE) -> None:
+        self.count = 0
+        self.total_s = 0.0
+        self.nbytes = 0
+        self.pixels = 0
+        self.samples: list[float] = []
+        self.reservoir_size = reservoir_size
+
+    def add(self, seconds: float, nbytes: int, pixels: int, rng: random.Random) -> None:
+        """Adds a single execution, replacing a random sample once the reservoir is full."""
+        self.count += 1
+        self.total_s += seconds
+        self.nbytes += nbytes
+        self.pixels += pixels
+
+        if len(self.samples) < self.reservoir_size:
+            self.samples.append(seconds)
+        elif (slot := rng.randrange(self.count)) < self.reservoir_size:
+            self.samples[slot] = seconds
+
+    def merge(self, other: "StageStats", rng: random.Random) -> None:
+        """Merges the executions of another instance, e.g. recorded in a worker process.
+
+        If both reservoirs do not fit into one, each contributes random samples in proportion to its number of
+        executions, so the merged reservoir stays a uniform sample of all executions.
+        """
+        samples = self.samples + other.samples
+        if len(samples) > self.reservoir_size:
+            num_other = round(self.reservoir_size * other.count / (self.count + other.count))
+            samples = rng.sample(self.samples, self.reservoir_size - num_other) + rng.sample(other.samples, num_other)
+
+        self.samples = samples
+        self.count += other.count
+        self.total_s += other.total_s
+        self.nbytes += other.nbytes
+        self.pixels += other.pixels
+
+
+StageRecords = dict[str, StageStats]
+
+
+class Stage:
+    """Times a single stage. `nbytes` and `pixels` may be set inside the `with` block once they are known."""
+
+    def __init__(self, instrumentation: "Instrumentation", name: str, nbytes: int = 0, pixels: int = 0) -> None:
+        self.instrumentation = instrumentation
+        self.name = name
+        self.nbytes = nbytes
+        self.pixels = pixels
+
+    def __enter__(self) -> Self:
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.instrumentation.record(self.name, time.perf_counter() - self.start, self.nbytes, self.pixels)
+
+
+class NullStage:
+    """Stage used while instrumentation is disabled. Entering it and setting its attributes does nothing."""
+
+    nbytes: int = 0
+    pixels: int = 0
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        return None
+
+
+NULL_STAGE = NullStage()
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """Returns the nearest-rank percentile of sorted values.
+
+    Args:
+        sorted_values: Non-empty list of values in ascending order.
+        q: Percentile in the range [0, 100].
+
+    Returns:
+        float: Percentile of the values.
+    """
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Instrumentation:
+    """Opt-in recorder of wall time, bytes and pixel counts per named stage.
+
+    While disabled, `stage` returns a shared no-op context manager, so instrumented code pays only for one
+    attribute check. Every process records into its own instance, which keeps running totals and a bounded
+    sample of wall times per stage. Processes started by `multiprocessing` with the fork method, e.g. DataLoader
+    workers, start with no records. With `share_across_processes`, they periodically send their records to the
+    process that enabled it, where `poll` merges them, and send the rest when they exit.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.records: StageRecords = {}
+        self.flush_interval = 1.0
+        self._queue: Any = None
+        self._owner_pid = os.getpid()
+        self._last_flush = time.monotonic()
+        self._rng = random.Random()
+        util.register_after_fork(self, Instrumentation._after_fork)
+
+    def _after_fork(self) -> None:
+        """Drops the records inherited from the parent and schedules the final send of a sharing child."""
+        self.records = {}
+        self._rng.seed()
+        self._last_flush = time.monotonic()
+        if self._queue is not None:
+            # Runs before the finalizer of the queue (priority 10), which stops its feeder thread.
+            util.Finalize(self, Instrumentation._flush, args=(self,), exitpriority=100)
+
+    def _flush(self) -> None:
+        """Sends the records of a forked process to the process that enabled sharing."""
+        if self.records:
+            self._queue.put(self.drain())
+        self._last_flush = time.monotonic()
+
+    def enable(self, share_across_processes: bool = False, flush_interval: float = 1.0) -> None:
+        """Enables recording in this process and in processes forked from it afterwards.
+
+        Args:
+            share_across_processes: If True, forked processes send their records to this one.
+            flush_interval: Minimum number of seconds between two sends of a forked process.
+        """
+        self.enabled = True
+        self.flush_interval = flush_interval
+        self._owner_pid = os.getpid()
+        self._queue = multiprocessing.get_context("fork").Queue() if share_across_processes else None
+
+    def disable(self) -> None:
+        """Disables recording, recorded stages are kept."""
+        self.enabled = False
+
+    def stage(self, name: str, nbytes: int = 0, pixels: int = 0) -> Stage | NullStage:
+        """Returns a context manager that records the wall time of the enclosed block.
+
+        Args:
+            name: Name of the stage.
+            nbytes: Number of bytes processed by the stage.
+            pixels: Number of pixels processed by the stage.
+
+        Returns:
+            Stage | NullStage: Context manager recording the stage, a no-op one while disabled.
+        """
+        if not self.enabled:
+            return NULL_STAGE
+
+        return Stage(self, name, nbytes, pixels)
+
+    def record(self, name: str, seconds: float, nbytes: int = 0, pixels: int = 0) -> None:
+        """Records a single execution of a stage.
+
+        Args:
+            name: Name of the stage.
+            seconds: Wall time of the execution.
+            nbytes: Number of bytes processed.
+            pixels: Number of pixels processed.
+        """
+        if name not in self.records:
+            self.records[name] = StageStats()
+        self.records[name].add(seconds, nbytes, pixels, self._rng)
+
+        if (
+            self._queue is not None
+            and os.getpid() != self._owner_pid
+            and time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self._flush()
+
+    def drain(self) -> StageRecords:
+        """Returns the recorded stages and clears them."""
+        records, self.records = self.records, {}
+        return records
+
+    def merge(self, records: StageRecords) -> None:
+        """Merges stages recorded elsewhere, e.g. returned by a worker process."""
+        for name, stats in records.items():
+            if name not in self.records:
+                self.records[name] = StageStats()
+            self.records[name].merge(stats, self._rng)
+
+    def poll(self) -> dict[str, dict[str, float]]:
+        """Merges the records sent by forked processes and returns the current summary.
+
+        Intended to be called periodically, e.g. every few hundred steps of a training loop.
+
+        Returns:
+            dict[str, dict[str, float]]: Summary as returned by `summary`.
+        """
+        if self._queue is not None and os.getpid() == self._owner_pid:
+            while True:
+                try:
+                    self.merge(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+        return self.summary()
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """Summarizes the recorded stages.
+
+        Returns:
+            dict[str, dict[str, float]]: For every stage, keys:
+                - count: Number of executions.
+                - total_s: Total wall time in seconds.
+                - p50_ms, p95_ms, p99_ms: Percentiles of the wall time in milliseconds, estimated from a sample of
+                  at most `RESERVOIR_SIZE` executions.
+                - bytes: Total number of processed bytes.
+                - pixels: Total number of processed pixels.
+        """
+        summary = {}
+        for name, stats in sorted(self.records.items()):
+            seconds = sorted(stats.samples)
+            summary[name] = {
+                "count": stats.count,
+                "total_s": stats.total_s,
+                "p50_ms": percentile(seconds, 50) * 1e3,
+                "p95_ms": percentile(seconds, 95) * 1e3,
+                "p99_ms": percentile(seconds, 99) * 1e3,
+                "bytes": stats.nbytes,
+                "pixels": stats.pixels,
+            }
+
+        return summary
+
+    def format_summary(self) -> str:
+        """Formats the summary as a table sorted by the total wall time."""
+        summary = self.summary()
+        lines = [
+            f"{'stage':<24} {'count':>8} {'total s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'MB':>10} {'MP':>10}",
+        ]
+        for name, stats in sorted(summary.items(), key=lambda item: -item[1]["total_s"]):
+            lines.append(
+                f"{name:<24} {stats['count']:>8d} {stats['total_s']:>9.2f} {stats['p50_ms']:>9.3f} "
+                f"{stats['p95_ms']:>9.3f} {stats['p99_ms']:>9.3f} {stats['bytes'] / 1e6:>10.1f} "
+                f"{stats['pixels'] / 1e6:>10.1f}",
+            )
+
+        return "\n".join(lines)
+
+    def reset(self) -> None:
+        """Clears all recorded stages."""
+        self.records = {}
+
+
+instrumentation = Instrumentation()
@@ -0,0 +1,230 @@
+from collections import Counter
+from collections.abc import Iterator
+from functools import partial
+import json
+from multiprocessing import Pool
+import os
+from pathlib import Path
+import struct
+from typing import Any
+import zlib
+
+from src.utils.file_index import list_stems, pair_stems
+from src.utils.mask import base64_to_mask_shape
+from src.utils.mask_codec import RLE_SUFFIX, rle_size
+from src.utils.rasterizer import normalize_class_title
+from src.utils.scan import png_size
+
+INTEGRITY_REPORT_VERSION = 1
+SUPPORTED_GEOMETRIES = ("point", "polygon", "bitmap")
+
+# Item (image file name), check name and a human-readable description of a problem.
+Issue = dict[str, str]
+
+
+def _issue(item: str, check: str, message: str) -> Issue:
+    return {"item": item, "check": check, "message": message}
+
+
+def check_item(
+    data_dir: Path,
+    stem: str,
+    layout: dict[str, str],
+    class_titles: frozenset[str],
+    mask_path: Path | None = None,
+) -> list[Issue]:
+    """Checks a single item using only the PNG headers and the annotation json, without decoding any pixels.
+
+    Checks:
+        - invalid_annotation: The annotation is not valid json, has no size or its objects are not a list.
+        - invalid_object: An object is not a json object.
+        - invalid_image: The image is not a PNG image.
+        - annotation_size_mismatch: The size in the annotation differs from the image size.
+        - invalid_class_title: An object has no class title or one that is not a string.
+        - unknown_class: The normalized class title of an object is missing from `class_titles`.
+        - unsupported_geometry: An object has a geometry type the rasterizer does not support.
+        - invalid_bitmap: A bitmap object has no origin of two integers or undecodable data.
+        - bitmap_out_of_frame: A bitmap does not fit into the image at its origin.
+        - invalid_mask: The mask is not a PNG or RLE mask.
+        - mask_size_mismatch: The mask size differs from the image size.
+
+    Args:
+        data_dir: Path to the dataset directory.
+        stem: Image file name of the item, e.g. "0001.png".
+        layout: Annotation and image directory names and their suffixes after the image file name, in this order.
+        class_titles: Known normalized class titles, i.e. the keys of `class_to_id`.
+        mask_path: Path to the processed mask of the item, if masks are checked.
+
+    Returns:
+        list[Issue]: Problems found in the item, empty if it is valid.
+    """
+    (annotations_dir, annotation_suffix), (image_dir, image_suffix) = list(layout.items())[:2]
+    issues: list[Issue] = []
+
+    try:
+        image_size = png_size(data_dir / image_dir / f"{stem}{image_suffix}")
+    except ValueError as error:
+        image_size = None
+        issues.append(_issue(stem, "invalid_image", str(error)))
+
+    try:
+        with (data_dir / annotations_dir / f"{stem}{annotation_suffix}").open("r") as f:
+            annotation = json.load(f)
+        annotation_size = (int(annotation["size"]["height"]), int(annotation["size"]["width"]))
+    except (json.JSONDecodeError, KeyError, TypeError, ValueError) as error:
+        issues.append(_issue(stem, "invalid_annotation", f"{type(error).__name__}: {error}"))
+        annotation, annotation_size = {}, None
+
+    if image_size is not None and annotation_size is not None and annotation_size != image_size:
+        message = f"Annotation size {annotation_size} differs from image size {image_size}."
+        issues.append(_issue(stem, "annotation_size_mismatch", message))
+
+    objects = annotation.get("objects", [])
+    if not isinstance(objects, list):
+        issues.append(_issue(stem, "invalid_annotation", f"Objects must be a list, got {objects!r}."))
+        objects = []
+
+    height, width = image_size or annotation_size or (None, None)
+    for idx, obj in enumerate(objects):
+        if not isinstance(obj, dict):
+            issues.append(_issue(stem, "invalid_object", f"Object {idx} is not a json object: {obj!r}."))
+            continue
+
+        title, geometry = obj.get("classTitle"), obj.get("geometryType")
+        if not isinstance(title, str):
+            issues.append(_issue(stem, "invalid_class_title", f"Object {idx} has class title {title!r}."))
+        elif normalize_class_title(title) not in class_titles:
+            issues.append(_issue(stem, "unknown_class", f"Object {idx} has unknown class title {title!r}."))
+        if geometry not in SUPPORTED_GEOMETRIES:
+            issues.append(_issue(stem, "unsupported_geometry", f"Object {idx} has geometry type {geometry!r}."))
+        if geometry != "bitmap":
+            continue
+
+        try:
+            x, y = obj["bitmap"]["origin"]
+            if not all(isinstance(value, int) and not isinstance(value, bool) for value in (x, y)):
+                message = f"Origin must be two integers, got {obj['bitmap']['origin']!r}."
+                raise TypeError(message)
+            bitmap_height, bitmap_width = base64_to_mask_shape(obj["bitmap"]["data"])
+        except (KeyError, TypeError, ValueError, struct.error, zlib.error) as error:
+            issues.append(_issue(stem, "invalid_bitmap", f"Object {idx}: {type(error).__name__}: {error}"))
+            continue
+
+        if height is not None and (x < 0 or y < 0 or x + bitmap_width > width or y + bitmap_height > height):
+            message = (
+                f"Object {idx}: bitmap of size {bitmap_width}x{bitmap_height} at origin ({x}, {y}) "
+                f"exceeds the {width}x{height} frame."
+            )
+            issues.append(_issue(stem, "bitmap_out_of_frame", message))
+
+    if mask_path is not None:
+        try:
+            mask_size = rle_size(mask_path) if mask_path.suffix == RLE_SUFFIX else png_size(mask_path)
+        except ValueError as error:
+            issues.append(_issue(stem, "invalid_mask", str(error)))
+        else:
+            if image_size is not None and mask_size != image_size:
+                message = f"Mask size {mask_size} differs from image size {image_size}."
+                issues.append(_issue(stem, "mask_size_mismatch", message))
+
+    return issues
+
+
+def check_chunk(
+    items: list[tuple[str, Path | None]], data_dir: Path, layout: dict[str, str], class_titles: frozenset[str],
+) -> list[Issue]:
+    """Checks a chunk of (stem, mask path) items with `check_item`."""
+    return [
+        issue for stem, mask_path in items for issue in check_item(data_dir, stem, layout, class_titles, mask_path)
+    ]
+
+
+def _iterate_chunks(
+    chunks: list[list[tuple[str, Path | None]]],
+    data_dir: Path,
+    layout: dict[str, str],
+    class_titles: frozenset[str],
+    workers: int,
+) -> Iterator[list[Issue]]:
+    """Yields the issues of every chunk, checking them in a process pool if workers > 1."""
+    check = partial(check_chunk, data_dir=data_dir, layout=layout, class_titles=class_titles)
+    if workers <= 1:
+        yield from map(check, chunks)
+        return
+
+    with Pool(processes=workers) as pool:
+        yield from pool.imap_unordered(check, chunks)
+
+
+def check_dataset(
+    data_dir: Path,
+    layout: dict[str, str],
+    class_titles: frozenset[str],
+    mask_dir: Path | None = None,
+    mask_format: str = "png",
+    workers: int = 8,
+    chunk_size: int = 256,
+) -> dict[str, Any]:
+    """Checks the integrity of a dataset in the Supervisely format in parallel, without decoding any pixels.
+
+    Besides the checks of `check_item`, the file names of all directories are paired:
+        - unpaired: An annotation, image or image info file has no counterpart in another directory.
+        - missing_mask: An item has no mask in `mask_dir`.
+        - orphan_mask: A mask in `mask_dir` belongs to no item.
+
+    Args:
+        data_dir: Path to the dataset directory.
+        layout: For every directory name the suffix of its files after the image file name, starting with the
+            annotation and image directories, e.g. {"ann": ".json", "img": "", "img_info": ".json"}.
+        class_titles: Known normalized class titles, i.e. the keys of `class_to_id`.
+        mask_dir: Directory with the processed masks. If None, masks are not checked.
+        mask_format: Format of the processed masks, "png" or "rle".
+        workers: Number of worker processes. With 1, items are checked in the main process.
+        chunk_size: Number of items sent to a worker process at once.
+
+    Returns:
+        dict[str, Any]: Machine-readable report, keys:
+            - version: Version of the report format.
+            - data_dir: Checked dataset directory.
+            - mask_dir: Checked mask directory, or None.
+            - items: Number of paired items.
+            - passed: True if no issue was found.
+            - counts: Number of issues per check.
+            - issues: Issues sorted by item and check, each with the item, check and message.
+    """
+    listed = {directory: set(list_stems(data_dir / directory, suffix)) for directory, suffix in layout.items()}
+    stems, unpaired = pair_stems(listed)
+    issues = [
+        _issue(stem, "unpaired", f"Missing from {directory}/.")
+        for directory, missing in unpaired.items()
+        for stem in missing
+    ]
+
+    mask_paths: list[Path | None] = [None] * len(stems)
+    if mask_dir is not None:
+        mask_names = {entry.name for entry in os.scandir(mask_dir) if entry.is_file()} if mask_dir.is_dir() else set()
+        expected = [stem if mask_format == "png" else f"{Path(stem).stem}{RLE_SUFFIX}" for stem in stems]
+        for idx, (stem, mask_name) in enumerate(zip(stems, expected)):
+            if mask_name in mask_names:
+                mask_paths[idx] = mask_dir / mask_name
+            else:
+                issues.append(_issue(stem, "missing_mask", f"{mask_dir / mask_name} does not exist."))
+
+        orphans = mask_names - set(expected)
+        issues.extend(_issue(name, "orphan_mask", f"{mask_dir / name} belongs to no item.") for name in orphans)
+
+    items = list(zip(stems, mask_paths))
+    chunks = [items[start : start + chunk_size] for start in range(0, len(items), chunk_size)]
+    for chunk_issues in _iterate_chunks(chunks, data_dir, layout, class_titles, workers):
+        issues.extend(chunk_issues)
+
+    issues.sort(key=lambda issue: (issue["item"], issue["check"]))
+    return {
+        "version": INTEGRITY_REPORT_VERSION,
+        "data_dir": str(data_dir),
+        "mask_dir": str(mask_dir) if mask_dir is not None else None,
+        "items": len(stems),
+        "passed": not issues,
+        "counts": dict(sorted(Counter(issue["check"] for issue in issues).items())),
+        "issues": issues,
+    }
@@ -0,0 +1,137 @@
+from collections import Counter
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+MANIFEST_VERSION = 1
+
+
+def hash_bytes(data: bytes) -> str:
+    """Computes the content hash used in the preprocessing manifest.
+
+    Args:
+        data: Bytes to hash.
+
+    Returns:
+        str: Hex digest of the data.
+    """
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def hash_file(path: Path) -> str:
+    """Computes the content hash of a file without loading it into memory at once.
+
+    Args:
+        path: Path to the file.
+
+    Returns:
+        str: Hex digest of the file content.
+    """
+    with path.open("rb") as f:
+        return hashlib.file_digest(f, lambda: hashlib.blake2b(digest_size=16)).hexdigest()
+
+
+def fingerprint_file(path: Path, previous: dict[str, Any] | None = None) -> dict[str, Any]:
+    """Creates a fingerprint of a file, i.e. its size, modification time and content hash.
+
+    The file is only hashed if its size or modification time differ from the previous fingerprint.
+
+    Args:
+        path: Path to the file.
+        previous: Previously recorded fingerprint of the file, if any.
+
+    Returns:
+        dict[str, Any]: keys:
+            - size: File size in bytes.
+            - mtime_ns: Modification time in nanoseconds.
+            - hash: Content hash of the file.
+    """
+    stat = path.stat()
+    if previous is not None and previous["size"] == stat.st_size and previous["mtime_ns"] == stat.st_mtime_ns:
+        return previous
+
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": hash_file(path)}
+
+
+def fingerprint_data(data: bytes, mtime_ns: int, previous: dict[str, Any] | None = None) -> dict[str, Any]:
+    """Creates the fingerprint of file content already in memory, e.g. of an archive member.
+
+    The content is only hashed if its size or modification time differ from the previous fingerprint.
+
+    Args:
+        data: Content of the file.
+        mtime_ns: Modification time of the file in nanoseconds.
+        previous: Previously recorded fingerprint of the file, if any.
+
+    Returns:
+        dict[str, Any]: Fingerprint as returned by `fingerprint_file`.
+    """
+    if previous is not None and previous["size"] == len(data) and previous["mtime_ns"] == mtime_ns:
+        return previous
+
+    return {"size": len(data), "mtime_ns": mtime_ns, "hash": hash_bytes(data)}
+
+
+def is_file_unchanged(path: Path, recorded: dict[str, Any]) -> bool:
+    """Checks whether a file still has the recorded content.
+
+    Args:
+        path: Path to the file.
+        recorded: Previously recorded fingerprint of the file.
+
+    Returns:
+        bool: True if the file exists and its content hash matches the recorded one.
+    """
+    if not path.exists():
+        return False
+
+    return fingerprint_file(path, recorded)["hash"] == recorded["hash"]
+
+
+def load_manifest(input_path: Path) -> dict[str, dict[str, Any]]:
+    """Load the preprocessing manifest from a JSON file.
+
+    Args:
+        input_path: Path to the JSON file containing the manifest.
+
+    Returns:
+        dict[str, dict[str, Any]]: Manifest entries keyed by the image file name. Empty if the file does not exist.
+    """
+    if not input_path.exists():
+        return {}
+
+    with input_path.open("r") as f:
+        manifest = json.load(f)
+
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {}
+
+    return manifest["items"]
+
+
+def save_manifest(manifest: dict[str, dict[str, Any]], output_path: Path) -> None:
+    """Save the preprocessing manifest to a JSON file atomically, so a killed run never leaves it truncated.
+
+    Args:
+        manifest: Manifest entries keyed by the image file name.
+        output_path: Path where the JSON file will be saved.
+    """
+    tmp_path = output_path.with_name(f"{output_path.name}.tmp")
+    with tmp_path.open("w") as f:
+        json.dump({"version": MANIFEST_VERSION, "items": manifest}, f)
+
+    os.replace(tmp_path, output_path)
+
+
+def resolutions_from_manifest(manifest: dict[str, dict[str, Any]]) -> Counter[tuple[int, int]]:
+    """Counts the mask resolutions recorded in the manifest.
+
+    Args:
+        manifest: Manifest entries keyed by the image file name.
+
+    Returns:
+        Counter containing resolution tuples (height, width) and their counts.
+    """
+    return Counter((height, width) for height, width in (entry["resolution"] for entry in manifest.values()))
@@ -1,14 +1,20 @@
 import base64
 import io
+import struct
+from typing import TYPE_CHECKING, Any
 import zlib
 
-import cv2
 import numpy as np
-from PIL import Image
-import torch
 
+from src.utils.class_stats import mask_class_stats
 
-def base64_to_mask(string: str) -> torch.Tensor:
+# cv2, PIL and torch take seconds to import, so they are imported by the functions using them. Header and
+# metadata helpers such as `base64_to_mask_shape` stay fast to import, e.g. for the integrity checker.
+if TYPE_CHECKING:
+    import torch
+
+
+def base64_to_mask(string: str) -> "torch.Tensor":
     """Converts a base64 encoded string to a boolean mask tensor. Taken from the supervisely:
     https://docs.supervisely.com/customization-and-integration/00_ann_format_navi/04_supervisely_format_objects
 
@@ -18,6 +24,9 @@ def base64_to_mask(string: str) -> torch.Tensor:
     Returns:
         torch.Tensor: [H, W] dtype: bool, True indicates the presence of a pixel in the mask.
     """
+    import cv2
+    import torch
+
     z = zlib.decompress(base64.b64decode(string))
     n = np.frombuffer(z, np.uint8)
     mask = cv2.imdecode(n, cv2.IMREAD_UNCHANGED)[:, :, 3].astype(bool)
@@ -25,22 +34,89 @@ def base64_to_mask(string: str) -> torch.Tensor:
     return torch.from_numpy(mask)
 
 
-def mask_to_base64(mask: torch.Tensor) -> str:
+def base64_to_mask_shape(string: str) -> tuple[int, int]:
+    """Reads the shape of a base64 encoded Supervisely bitmap from its PNG header, without decoding the pixels.
+
+    Args:
+        string: A string containing base64 encoded mask data.
+
+    Returns:
+        tuple[int, int]: (height, width) of the mask.
+    """
+    z = zlib.decompress(base64.b64decode(string))
+    width, height = struct.unpack(">II", z[16:24])
+
+    return height, width
+
+
+def mask_to_base64(mask: "torch.Tensor | np.ndarray") -> str:
     """Converts a boolean mask tensor to a base64 encoded string. Taken from the supervisely:
     https://docs.supervisely.com/customization-and-integration/00_ann_format_navi/04_supervisely_format_objects
 
     Args:
-        mask: A boolean tensor of shape [H, W] representing the mask.
+        mask: A boolean tensor or array of shape [H, W] representing the mask.
 
     Returns:
         str: Base64 encoded string containing compressed PNG mask data.
     """
+    from PIL import Image
+
     img_pil = Image.fromarray(np.array(mask, dtype=np.uint8))
     img_pil.putpalette([0, 0, 0, 255, 255, 255])
 
     bytes_io = io.BytesIO()
-    bytes_data = bytes_io.getvalue()
-
     img_pil.save(bytes_io, format="PNG", transparency=0, optimize=0)
 
+    bytes_data = bytes_io.getvalue()
+
     return base64.b64encode(zlib.compress(bytes_data)).decode("utf-8")
+
+
+def mask_to_bitmap_objects(
+    mask: np.ndarray, id_to_class: dict[int, str], min_area: int = 1, connectivity: int = 8,
+) -> list[dict[str, Any]]:
+    """Splits a class-ID mask into Supervisely bitmap objects, one per connected component of every class.
+
+    Every component is cropped to its bounding box, encoded by `mask_to_base64` and placed by its origin, so
+    `base64_to_mask` and `paste_bitmap` restore the component at its position. Connected components are only
+    searched within the bounding box of their class.
+
+    Args:
+        mask: [H, W] uint8 mask with class IDs.
+        id_to_class: Class title of every class ID. The background (ID 0) and IDs missing from it are skipped.
+        min_area: Minimum number of pixels of a component, smaller ones are dropped.
+        connectivity: Pixel connectivity of the components, 4 or 8.
+
+    Returns:
+        list[dict[str, Any]]: Bitmap objects ordered by class ID and component position.
+    """
+    import cv2
+
+    counts, bboxes = mask_class_stats(mask, max(id_to_class) + 1)
+
+    objects = []
+    for class_id, title in sorted(id_to_class.items()):
+        if class_id == 0 or counts[class_id] < min_area:
+            continue
+
+        x_min, y_min, x_max, y_max = bboxes[class_id]
+        region = (mask[y_min : y_max + 1, x_min : x_max + 1] == class_id).astype(np.uint8)
+        num_labels, labels, stats, _ = cv2.connectedComponentsWithStats(region, connectivity=connectivity)
+
+        for label in range(1, num_labels):
+            x, y, width, height, area = stats[label]
+            if area < min_area:
+                continue
+
+            bitmap = labels[y : y + height, x : x + width] == label
+            objects.append(
+                {
+                    "classTitle": title,
+                    "geometryType": "bitmap",
+                    "tags": [],
+                    "description": "",
+                    "bitmap": {"data": mask_to_base64(bitmap), "origin": [int(x_min + x), int(y_min + y)]},
+                },
+            )
+
+    return objects
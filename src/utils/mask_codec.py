@@ -0,0 +1,197 @@
+from pathlib import Path
+import struct
+
+import numpy as np
+
+RLE_MAGIC = b"CTRL"
+RLE_VERSION = 1
+RLE_HEADER = struct.Struct("<4sBIII")
+RLE_SUFFIX = ".rle"
+
+
+def _runs(flat: np.ndarray, boundaries: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """Splits a flat array into runs of equal values.
+
+    Args:
+        flat: 1D uint8 array.
+        boundaries: Sorted positions where a new run must start even if the value does not change.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Run start positions (int64) and run lengths (uint32).
+    """
+    starts = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    starts = np.concatenate(([0], starts)) if len(flat) else starts
+    if boundaries is not None and len(boundaries):
+        starts = np.union1d(starts, boundaries[boundaries < len(flat)])
+
+    lengths = np.diff(np.concatenate((starts, [len(flat)]))).astype(np.uint32)
+
+    return starts, lengths
+
+
+def _pack(shape: tuple[int, int], values: np.ndarray, lengths: np.ndarray) -> bytes:
+    """Packs the runs of a single mask into the RLE byte format."""
+    height, width = shape
+    header = RLE_HEADER.pack(RLE_MAGIC, RLE_VERSION, height, width, len(values))
+    return header + values.astype(np.uint8).tobytes() + lengths.astype("<u4").tobytes()
+
+
+def _unpack(data: bytes) -> tuple[tuple[int, int], np.ndarray, np.ndarray]:
+    """Unpacks the shape and runs of a single mask from the RLE byte format.
+
+    Raises:
+        ValueError: If the data is not an RLE encoded mask.
+    """
+    magic, version, height, width, num_runs = RLE_HEADER.unpack_from(data)
+    if magic != RLE_MAGIC or version != RLE_VERSION:
+        message = f"Not an RLE mask of version {RLE_VERSION}."
+        raise ValueError(message)
+
+    values = np.frombuffer(data, dtype=np.uint8, count=num_runs, offset=RLE_HEADER.size)
+    lengths = np.frombuffer(data, dtype="<u4", count=num_runs, offset=RLE_HEADER.size + num_runs)
+
+    return (height, width), values, lengths
+
+
+def encode_rle(mask: np.ndarray) -> bytes:
+    """Encodes a class-ID mask as run-length encoded bytes.
+
+    The format is a header (magic, version, height, width, number of runs) followed by the uint8 run values and
+    the uint32 run lengths in row-major order.
+
+    Args:
+        mask: [H, W] uint8 mask with class IDs.
+
+    Returns:
+        bytes: RLE encoded mask.
+    """
+    flat = np.ascontiguousarray(mask, dtype=np.uint8).ravel()
+    starts, lengths = _runs(flat)
+
+    return _pack(mask.shape, flat[starts], lengths)
+
+
+def decode_rle(data: bytes) -> np.ndarray:
+    """Decodes run-length encoded bytes into a class-ID mask.
+
+    Args:
+        data: RLE encoded mask.
+
+    Returns:
+        np.ndarray: [H, W] uint8 mask with class IDs.
+    """
+    shape, values, lengths = _unpack(data)
+    return np.repeat(values, lengths).reshape(shape)
+
+
+def decode_rle_region(data: bytes, top: int, left: int, height: int, width: int) -> np.ndarray:
+    """Decodes only the runs covering a region of an RLE encoded mask.
+
+    The decoding cost scales with the rows covered by the region instead of the full mask.
+
+    Args:
+        data: RLE encoded mask.
+        top: First row of the region.
+        left: First column of the region.
+        height: Number of rows of the region, which must lie within the mask.
+        width: Number of columns of the region, which must lie within the mask.
+
+    Returns:
+        np.ndarray: [height, width] uint8 mask with class IDs.
+    """
+    (_, mask_width), values, lengths = _unpack(data)
+    ends = np.cumsum(lengths, dtype=np.int64)
+    start, stop = top * mask_width, (top + height) * mask_width
+
+    first, last = np.searchsorted(ends, start, side="right"), np.searchsorted(ends, stop, side="left") + 1
+    run_ends = ends[first:last]
+    run_lengths = np.minimum(run_ends, stop) - np.maximum(run_ends - lengths[first:last], start)
+    rows = np.repeat(values[first:last], run_lengths).reshape(height, mask_width)
+
+    return rows[:, left : left + width].copy()
+
+
+def encode_rle_many(masks: list[np.ndarray]) -> list[bytes]:
+    """Encodes many masks with a single vectorized pass over their concatenated pixels.
+
+    Args:
+        masks: [H, W] uint8 masks with class IDs, possibly of different shapes.
+
+    Returns:
+        list[bytes]: RLE encoded masks.
+    """
+    if not masks:
+        return []
+
+    sizes = np.array([mask.size for mask in masks], dtype=np.int64)
+    mask_starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    flat = np.concatenate([np.ascontiguousarray(mask, dtype=np.uint8).ravel() for mask in masks])
+    starts, lengths = _runs(flat, mask_starts)
+
+    # Every mask starts a run, so its runs are the ones between its own first run and the next mask's one.
+    run_bounds = np.searchsorted(starts, np.concatenate((mask_starts, [len(flat)])))
+    return [
+        _pack(mask.shape, flat[starts[begin:end]], lengths[begin:end])
+        for mask, begin, end in zip(masks, run_bounds[:-1], run_bounds[1:])
+    ]
+
+
+def decode_rle_many(blobs: list[bytes]) -> list[np.ndarray]:
+    """Decodes many masks with a single vectorized expansion of their concatenated runs.
+
+    Args:
+        blobs: RLE encoded masks.
+
+    Returns:
+        list[np.ndarray]: [H, W] uint8 masks with class IDs.
+    """
+    if not blobs:
+        return []
+
+    unpacked = [_unpack(data) for data in blobs]
+    flat = np.repeat(
+        np.concatenate([values for _, values, _ in unpacked]),
+        np.concatenate([lengths for _, _, lengths in unpacked]),
+    )
+
+    sizes = [height * width for (height, width), _, _ in unpacked]
+    return [
+        part.reshape(shape)
+        for part, (shape, _, _) in zip(np.split(flat, np.cumsum(sizes)[:-1]), unpacked)
+    ]
+
+
+def save_rle(mask: np.ndarray, path: Path) -> None:
+    """Saves a class-ID mask as an RLE file."""
+    path.write_bytes(encode_rle(mask))
+
+
+def load_rle(path: Path) -> np.ndarray:
+    """Loads a class-ID mask from an RLE file."""
+    return decode_rle(path.read_bytes())
+
+
+def load_rle_region(path: Path, top: int, left: int, height: int, width: int) -> np.ndarray:
+    """Loads a region of a class-ID mask from an RLE file, see `decode_rle_region`."""
+    return decode_rle_region(path.read_bytes(), top, left, height, width)
+
+
+def rle_size(path: Path) -> tuple[int, int]:
+    """Reads the (height, width) of a mask from the header of an RLE file, without decoding any runs.
+
+    Raises:
+        ValueError: If the file is not an RLE encoded mask.
+    """
+    with path.open("rb") as f:
+        header = f.read(RLE_HEADER.size)
+
+    if len(header) < RLE_HEADER.size:
+        message = f"{path} is not an RLE mask of version {RLE_VERSION}."
+        raise ValueError(message)
+
+    magic, version, height, width, _ = RLE_HEADER.unpack(header)
+    if magic != RLE_MAGIC or version != RLE_VERSION:
+        message = f"{path} is not an RLE mask of version {RLE_VERSION}."
+        raise ValueError(message)
+
+    return height, width
@@ -1,23 +1,28 @@
 from collections import Counter
 import json
+import os
 from pathlib import Path
-from typing import Dict
 
 
 def save_resolutions(resolutions: Counter[tuple[int, int]], output_path: Path) -> None:
-    """Save resolution metadata to a JSON file.
+    """Save resolution metadata to a JSON file. The file is replaced atomically, so it is never left truncated.
+
+    Resolutions are sorted, so the file only depends on the counts and not on the order the items were processed.
 
     Args:
         resolutions: Counter containing resolution tuples (height, width) and their counts.
         output_path: Path where the JSON file will be saved.
     """
-    with output_path.open("w") as f:
+    tmp_path = output_path.with_name(f"{output_path.name}.tmp")
+    with tmp_path.open("w") as f:
         json.dump(
-            {f"{height}x{width}": count for (height, width), count in resolutions.items()},
+            {f"{height}x{width}": count for (height, width), count in sorted(resolutions.items())},
             f,
             indent=4,
         )
 
+    os.replace(tmp_path, output_path)
+
 
 def load_resolutions(input_path: Path) -> Counter[tuple[int, int]]:
     """Load resolution metadata from a JSON file.
@@ -29,7 +34,7 @@ def load_resolutions(input_path: Path) -> Counter[tuple[int, int]]:
         Counter containing resolution tuples (height, width) and their counts.
     """
     with input_path.open("r") as f:
-        resolutions_data: Dict[str, int] = json.load(f)
+        resolutions_data: dict[str, int] = json.load(f)
 
     loaded_resolutions: Counter[tuple[int, int]] = Counter()
     for resolution_str, count in resolutions_data.items():
@@ -0,0 +1,84 @@
+import numpy as np
+from PIL import Image
+
+# Fixed color of every class, so a class has the same color in every overlay regardless of the other classes.
+CLASS_COLORS: dict[str, tuple[int, int, int]] = {
+    "background": (0, 0, 0),
+    "compression_wood": (255, 127, 14),
+    "crack": (255, 0, 0),
+    "insects": (148, 0, 211),
+    "knot_sound": (0, 0, 255),
+    "moisture": (0, 191, 255),
+    "moisture_real": (0, 128, 128),
+    "pith": (255, 255, 0),
+    "resign_pocket": (255, 0, 255),
+    "rot": (139, 69, 19),
+    "wood": (0, 200, 0),
+}
+FALLBACK_COLOR = (128, 128, 128)
+
+
+def color_lut(class_to_id: dict[str, int], alpha: float = 0.5) -> tuple[np.ndarray, np.ndarray]:
+    """Builds the color and blending weight lookup tables indexed by class ID.
+
+    Args:
+        class_to_id: Mapping from class titles to class IDs. The background (ID 0) is left transparent.
+        alpha: Opacity of the class colors, from 0 to 1.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: [256, 3] uint8 colors and [256] uint16 blending weights in 1/256 steps.
+    """
+    colors = np.zeros((256, 3), dtype=np.uint8)
+    weights = np.zeros(256, dtype=np.uint16)
+    for title, class_id in class_to_id.items():
+        colors[class_id] = CLASS_COLORS.get(title, FALLBACK_COLOR)
+        weights[class_id] = 0 if class_id == 0 else round(alpha * 256)
+
+    return colors, weights
+
+
+def render_overlay(image: np.ndarray, mask: np.ndarray, colors: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """Blends the class colors of a mask into an image with integer arithmetic.
+
+    Args:
+        image: [H, W, 3] uint8 RGB image.
+        mask: [H, W] uint8 mask with class IDs.
+        colors: [256, 3] uint8 colors from `color_lut`.
+        weights: [256] uint16 blending weights from `color_lut`.
+
+    Returns:
+        np.ndarray: [H, W, 3] uint8 RGB overlay.
+    """
+    weight = weights[mask][..., None]
+    blended = image.astype(np.uint16) * (256 - weight) + colors[mask].astype(np.uint16) * weight + 128
+    return (blended >> 8).astype(np.uint8)
+
+
+def contact_sheet(tiles: list[np.ndarray], columns: int, tile_size: tuple[int, int]) -> np.ndarray:
+    """Arranges images in a grid, each scaled to fit its cell while keeping its aspect ratio.
+
+    Args:
+        tiles: [H, W, 3] uint8 RGB images.
+        columns: Number of cells per row.
+        tile_size: (height, width) of a cell.
+
+    Returns:
+        np.ndarray: [rows * height, columns * width, 3] uint8 RGB mosaic with a black background.
+    """
+    height, width = tile_size
+    rows = -(-len(tiles) // columns)
+    sheet = np.zeros((rows * height, columns * width, 3), dtype=np.uint8)
+
+    for idx, tile in enumerate(tiles):
+        thumbnail = fit_tile(tile, tile_size)
+        top, left = (idx // columns) * height, (idx % columns) * width
+        sheet[top : top + thumbnail.shape[0], left : left + thumbnail.shape[1]] = thumbnail
+
+    return sheet
+
+
+def fit_tile(image: np.ndarray, tile_size: tuple[int, int]) -> np.ndarray:
+    """Scales an image down to fit into a tile of the given (height, width), keeping its aspect ratio."""
+    thumbnail = Image.fromarray(image)
+    thumbnail.thumbnail((tile_size[1], tile_size[0]), Image.Resampling.BILINEAR)
+    return np.asarray(thumbnail)
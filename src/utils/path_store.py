@@ -0,0 +1,70 @@
+from collections.abc import Iterable, Iterator, Sequence
+import copy
+from pathlib import Path
+from typing import overload
+
+import numpy as np
+
+
+class PathStore(Sequence[Path]):
+    """Read-only sequence of the paths `directory / f"{name}{suffix}"`, backed by one contiguous buffer of names.
+
+    A list of `Path` objects holds one Python object per item, whose reference counts and garbage collector
+    headers are written to whenever it is touched, so every forked DataLoader worker ends up with private
+    copies of the pages holding them. The store keeps all names in two numpy arrays instead and builds the
+    `Path` of an item on access, so its memory stays shared between forked workers.
+
+    Args:
+        directory: Directory of the files.
+        names: Names of the files without the suffix.
+        suffix: Suffix appended to every name.
+    """
+
+    def __init__(self, directory: str | Path, names: Iterable[str], suffix: str = "") -> None:
+        encoded = [name.encode() for name in names]
+        self._buffer = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        self._offsets = np.cumsum([0, *map(len, encoded)], dtype=np.int64)
+        self.directory = Path(directory)
+        self.suffix = suffix
+
+    def with_location(self, directory: str | Path, suffix: str = "") -> "PathStore":
+        """Returns a store of the same names in another directory or with another suffix, sharing the buffers."""
+        store = copy.copy(self)
+        store.directory = Path(directory)
+        store.suffix = suffix
+        return store
+
+    def name(self, idx: int) -> str:
+        """Returns the name of an item without the directory and suffix."""
+        if idx < 0:
+            idx += len(self)
+
+        return self._buffer[self._offsets[idx] : self._offsets[idx + 1]].tobytes().decode()
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    @overload
+    def __getitem__(self, idx: int) -> Path: ...
+
+    @overload
+    def __getitem__(self, idx: slice) -> list[Path]: ...
+
+    def __getitem__(self, idx: int | slice) -> Path | list[Path]:
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+
+        if not -len(self) <= idx < len(self):
+            message = f"Index {idx} is out of range for {len(self)} paths."
+            raise IndexError(message)
+
+        return self.directory / f"{self.name(idx)}{self.suffix}"
+
+    def __iter__(self) -> Iterator[Path]:
+        for idx in range(len(self)):
+            yield self[idx]
+
+    @property
+    def nbytes(self) -> int:
+        """Number of bytes of the name buffer and offsets."""
+        return self._buffer.nbytes + self._offsets.nbytes
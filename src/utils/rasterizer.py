@@ -0,0 +1,118 @@
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+from src.utils.instrumentation import instrumentation
+from src.utils.mask import base64_to_mask
+
+# PIL is imported by the rasterizing functions, so `normalize_class_title` is fast to import.
+if TYPE_CHECKING:
+    from PIL import Image
+
+
+def normalize_class_title(title: str) -> str:
+    """Normalizes a Supervisely class title to the key used in `class_to_id`.
+
+    Args:
+        title: Class title as stored in the annotation, e.g. "Knot sound".
+
+    Returns:
+        str: Normalized class title, e.g. "knot_sound".
+    """
+    return title.lower().replace(" ", "_")
+
+
+def rasterize_objects(
+    objects: list[dict[str, Any]],
+    shape: tuple[int, int],
+    class_to_id: dict[str, int],
+    class_priority: list[str],
+    blob_radius: int = 3,
+) -> np.ndarray:
+    """Rasterizes Supervisely objects into a single class-ID canvas.
+
+    Objects are drawn from the lowest to the highest priority class, so a higher priority class
+    overwrites a lower one wherever they overlap. Each object only touches the pixels inside its own
+    bounding box. Background objects are skipped, as drawing class 0 into the canvas is a no-op.
+
+    Args:
+        objects: Supervisely objects of the "point", "polygon" or "bitmap" geometry type.
+        shape: (height, width) of the canvas.
+        class_to_id: Mapping from normalized class titles to class IDs.
+        class_priority: Class titles ordered from the highest to the lowest priority.
+        blob_radius: Radius of the blob drawn for every point.
+
+    Raises:
+        ValueError: If an object has an unsupported geometry type or a bitmap exceeds the canvas.
+
+    Returns:
+        np.ndarray: [H, W] uint8 canvas with class IDs.
+    """
+    height, width = shape
+    priority_map = {class_to_id[cls]: idx for idx, cls in enumerate(class_priority)}
+
+    ranked_objects: list[tuple[int, int, dict[str, Any]]] = []
+    for obj in objects:
+        if obj["geometryType"] not in ("point", "polygon", "bitmap"):
+            message = f"Unsupported geometry type: {obj['geometryType']}"
+            raise ValueError(message)
+
+        class_id = class_to_id[normalize_class_title(obj["classTitle"])]
+        if class_id != 0:
+            ranked_objects.append((priority_map.get(class_id, len(class_priority)), class_id, obj))
+
+    from PIL import Image, ImageDraw
+
+    canvas = Image.new("L", (width, height), 0)
+    draw = ImageDraw.Draw(canvas)
+
+    # Ties in priority are resolved in favour of the lower class ID, hence the sort by both keys.
+    for _, class_id, obj in sorted(ranked_objects, key=lambda item: (item[0], item[1]), reverse=True):
+        if obj["geometryType"] == "point":
+            with instrumentation.stage("draw_point") as stage:
+                for x, y in obj["points"]["exterior"]:
+                    draw.ellipse([x - blob_radius, y - blob_radius, x + blob_radius, y + blob_radius], fill=class_id)
+                stage.pixels = len(obj["points"]["exterior"]) * (2 * blob_radius + 1) ** 2
+
+        elif obj["geometryType"] == "polygon":
+            with instrumentation.stage("draw_polygon") as stage:
+                flat_points = [coord for point in obj["points"]["exterior"] for coord in point]
+                draw.polygon(flat_points, fill=class_id)
+                if instrumentation.enabled:
+                    xs, ys = flat_points[0::2], flat_points[1::2]
+                    stage.pixels = int((max(xs) - min(xs) + 1) * (max(ys) - min(ys) + 1))
+
+        else:
+            paste_bitmap(canvas, obj, class_id)
+
+    return np.array(canvas, dtype=np.uint8)
+
+
+def paste_bitmap(canvas: "Image.Image", obj: dict[str, Any], class_id: int) -> None:
+    """Pastes a Supervisely bitmap object into the canvas, touching only its bounding box.
+
+    Args:
+        canvas: "L" mode canvas with class IDs.
+        obj: Object containing bitmap data and its origin.
+        class_id: Class ID written wherever the bitmap is set.
+
+    Raises:
+        ValueError: If the bitmap does not fit into the canvas.
+    """
+    from PIL import Image
+
+    x, y = obj["bitmap"]["origin"]
+    with instrumentation.stage("base64_to_mask", nbytes=len(obj["bitmap"]["data"])):
+        bitmap = base64_to_mask(obj["bitmap"]["data"]).numpy()
+    bitmap_height, bitmap_width = bitmap.shape
+
+    if x < 0 or y < 0 or x + bitmap_width > canvas.width or y + bitmap_height > canvas.height:
+        message = (
+            f"Bitmap of size {bitmap_width}x{bitmap_height} at origin ({x}, {y}) "
+            f"does not fit into the {canvas.width}x{canvas.height} canvas."
+        )
+        raise ValueError(message)
+
+    with instrumentation.stage("paste_bitmap", pixels=bitmap.size):
+        stencil = Image.fromarray(bitmap.astype(np.uint8) * 255)
+        canvas.paste(class_id, (x, y, x + bitmap_width, y + bitmap_height), stencil)
@@ -0,0 +1,89 @@
+import os
+from pathlib import Path
+
+import numpy as np
+
+SOURCE_STAMP_KEY = "source_stamp"
+
+
+def source_stamp(paths: list[Path]) -> np.ndarray:
+    """Creates a stamp of the source files, i.e. their sizes and modification times.
+
+    Args:
+        paths: Paths to the source files of a cache entry.
+
+    Returns:
+        np.ndarray: [2 * len(paths)] int64 array with the size and mtime of every file.
+    """
+    stats = [path.stat() for path in paths]
+    return np.array([value for stat in stats for value in (stat.st_size, stat.st_mtime_ns)], dtype=np.int64)
+
+
+class ResizeCache:
+    """On-disk cache of samples that were already resized to the target resolution.
+
+    Entries are grouped in a directory keyed by the resolution, interpolation modes and image dtype, so
+    caches for different settings coexist. Every entry stores the stamp of its source files and is treated
+    as a miss once they change. Entries are written atomically, so concurrent DataLoader workers may share it.
+
+    Args:
+        cache_dir: Root directory of the cache.
+        resolution: Target (height, width) of the resized samples.
+        interpolation: Name of the image interpolation mode.
+        mask_interpolation: Name of the mask interpolation mode.
+        image_dtype: Name of the dtype of the cached images, resizing uint8 images rounds the result.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str | Path,
+        resolution: tuple[int, int],
+        interpolation: str,
+        mask_interpolation: str,
+        image_dtype: str = "float32",
+    ) -> None:
+        height, width = resolution
+        self.cache_dir = Path(cache_dir) / f"{height}x{width}-{interpolation}-{mask_interpolation}-{image_dtype}"
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def entry_path(self, name: str) -> Path:
+        """Returns the path of the cache entry for the sample with the given name."""
+        return self.cache_dir / f"{Path(name).stem}.npz"
+
+    def load(self, name: str, sources: list[Path]) -> dict[str, np.ndarray] | None:
+        """Loads a cache entry if it exists and its source files did not change.
+
+        Args:
+            name: Name of the sample, i.e. the image file name.
+            sources: Paths to the source files of the sample.
+
+        Returns:
+            dict[str, np.ndarray] | None: Cached arrays or None on a cache miss.
+        """
+        entry_path = self.entry_path(name)
+        if not entry_path.exists():
+            return None
+
+        try:
+            with np.load(entry_path) as entry:
+                arrays = {key: entry[key] for key in entry.files}
+        except (OSError, ValueError):
+            return None
+
+        if not np.array_equal(arrays.pop(SOURCE_STAMP_KEY), source_stamp(sources)):
+            return None
+
+        return arrays
+
+    def save(self, name: str, sources: list[Path], **arrays: np.ndarray) -> None:
+        """Saves a cache entry together with the stamp of its source files.
+
+        Args:
+            name: Name of the sample, i.e. the image file name.
+            sources: Paths to the source files of the sample.
+            **arrays: Arrays to cache.
+        """
+        entry_path = self.entry_path(name)
+        tmp_path = entry_path.with_name(f"{entry_path.stem}.{os.getpid()}.tmp.npz")
+        np.savez(tmp_path, **arrays, **{SOURCE_STAMP_KEY: source_stamp(sources)})
+        os.replace(tmp_path, entry_path)
@@ -0,0 +1,164 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+from pathlib import Path
+import struct
+from typing import Any
+
+import numpy as np
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def png_size(path: Path) -> tuple[int, int]:
+    """Reads the size of a PNG image from its IHDR chunk, without decoding any pixels.
+
+    Args:
+        path: Path to the PNG image.
+
+    Raises:
+        ValueError: If the file is not a PNG image.
+
+    Returns:
+        tuple[int, int]: (height, width) of the image.
+    """
+    with path.open("rb") as f:
+        header = f.read(24)
+
+    if len(header) < 24 or header[:8] != PNG_SIGNATURE or header[12:16] != b"IHDR":
+        message = f"{path} is not a PNG image."
+        raise ValueError(message)
+
+    width, height = struct.unpack(">II", header[16:24])
+    return height, width
+
+
+def image_info_size(path: Path) -> tuple[int, int] | None:
+    """Reads the size of an image from its Supervisely image info file.
+
+    Args:
+        path: Path to the image info json.
+
+    Returns:
+        tuple[int, int] | None: (height, width) of the image or None if the file does not contain it.
+    """
+    with path.open("r") as f:
+        info = json.load(f)
+
+    if "height" not in info or "width" not in info:
+        return None
+
+    return int(info["height"]), int(info["width"])
+
+
+def scan_resolution(image_path: Path, image_info_path: Path | None = None) -> tuple[int, int]:
+    """Reads the resolution of an image from its image info file, falling back to the PNG header.
+
+    Args:
+        image_path: Path to the PNG image.
+        image_info_path: Path to the Supervisely image info json, if any.
+
+    Returns:
+        tuple[int, int]: (height, width) of the image.
+    """
+    if image_info_path is not None and image_info_path.exists():
+        size = image_info_size(image_info_path)
+        if size is not None:
+            return size
+
+    return png_size(image_path)
+
+
+def scan_resolutions(
+    data_dir: Path,
+    cache: dict[str, list[int]] | None = None,
+    workers: int = 16,
+    image_dir: str = "img",
+    image_info_dir: str = "img_info",
+) -> dict[str, list[int]]:
+    """Scans the resolutions of all images of a dataset in parallel, reading only headers and metadata.
+
+    Args:
+        data_dir: Path to the dataset directory in the Supervisely format.
+        cache: Previous scan result. Images whose size and modification time did not change are not read again.
+        workers: Number of threads reading the files.
+        image_dir: Name of the directory with the images.
+        image_info_dir: Name of the directory with the image info files.
+
+    Returns:
+        dict[str, list[int]]: For every image name its [height, width, file size, mtime_ns].
+    """
+    cache = cache or {}
+    image_paths = sorted((data_dir / image_dir).glob("*.png"))
+
+    def scan(image_path: Path) -> tuple[str, list[int]]:
+        stat = image_path.stat()
+        cached = cache.get(image_path.name)
+        if cached is not None and cached[2:] == [stat.st_size, stat.st_mtime_ns]:
+            return image_path.name, cached
+
+        height, width = scan_resolution(image_path, data_dir / image_info_dir / f"{image_path.name}.json")
+        return image_path.name, [height, width, stat.st_size, stat.st_mtime_ns]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return dict(executor.map(scan, image_paths))
+
+
+def load_scan_cache(input_path: Path) -> dict[str, list[int]]:
+    """Loads a previous scan result, or an empty one if the file does not exist."""
+    if not input_path.exists():
+        return {}
+
+    with input_path.open("r") as f:
+        return json.load(f)
+
+
+def save_scan_cache(scan: dict[str, list[int]], output_path: Path) -> None:
+    """Saves a scan result atomically."""
+    tmp_path = output_path.with_name(f"{output_path.name}.tmp")
+    with tmp_path.open("w") as f:
+        json.dump(scan, f)
+
+    os.replace(tmp_path, output_path)
+
+
+def resolutions_from_scan(scan: dict[str, list[int]]) -> Counter[tuple[int, int]]:
+    """Counts the resolutions (height, width) of a scan result."""
+    return Counter((height, width) for height, width, *_ in scan.values())
+
+
+def resolution_statistics(
+    resolutions: Counter[tuple[int, int]],
+    percentiles: tuple[float, ...] = (5, 25, 50, 75, 95),
+    aspect_ratio_bins: int = 10,
+) -> dict[str, Any]:
+    """Computes the distribution of heights, widths and aspect ratios.
+
+    Args:
+        resolutions: Counter containing resolution tuples (height, width) and their counts.
+        percentiles: Percentiles reported for the height, width and aspect ratio.
+        aspect_ratio_bins: Number of bins of the aspect ratio (width / height) histogram.
+
+    Returns:
+        dict[str, Any]: keys:
+            - count: Number of images.
+            - height, width, aspect_ratio: Mean and percentiles.
+            - aspect_ratio_histogram: Bin edges and counts.
+    """
+    sizes = np.array(list(resolutions), dtype=np.float64).reshape(-1, 2)
+    counts = np.array(list(resolutions.values()), dtype=np.int64)
+    values = {"height": sizes[:, 0], "width": sizes[:, 1], "aspect_ratio": sizes[:, 1] / sizes[:, 0]}
+
+    statistics: dict[str, Any] = {"count": int(counts.sum())}
+    for name, value in values.items():
+        expanded = np.repeat(value, counts)
+        statistics[name] = {
+            "mean": float(expanded.mean()),
+            **{f"p{q:g}": float(np.percentile(expanded, q)) for q in percentiles},
+        }
+
+    histogram, edges = np.histogram(values["aspect_ratio"], bins=aspect_ratio_bins, weights=counts)
+    statistics["aspect_ratio_histogram"] = {"edges": edges.tolist(), "counts": histogram.astype(int).tolist()}
+
+    return statistics
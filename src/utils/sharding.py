@@ -0,0 +1,43 @@
+import hashlib
+from pathlib import Path
+
+
+def shard_of(name: str, num_shards: int) -> int:
+    """Assigns an item to a shard by a stable hash of its file stem.
+
+    Unlike the built-in `hash`, the assignment is identical on every machine and in every Python process.
+
+    Args:
+        name: File name of the item, e.g. "0001.png".
+        num_shards: Total number of shards.
+
+    Returns:
+        int: Index of the shard the item belongs to, from 0 to `num_shards - 1`.
+    """
+    digest = hashlib.blake2b(Path(name).stem.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % num_shards
+
+
+def validate_shard(shard_index: int, num_shards: int) -> None:
+    """Checks that a shard index lies within the number of shards.
+
+    Raises:
+        ValueError: If `num_shards` is smaller than 1 or `shard_index` is not in [0, num_shards).
+    """
+    if num_shards < 1 or not 0 <= shard_index < num_shards:
+        message = f"Shard index must be in [0, num_shards) with num_shards >= 1, got {shard_index} of {num_shards}."
+        raise ValueError(message)
+
+
+def shard_path(path: Path, shard_index: int, num_shards: int) -> Path:
+    """Returns the path of the partial output of a shard, e.g. "resolutions.shard-00001-of-00004.json".
+
+    Args:
+        path: Path of the output of a single-node run, e.g. "resolutions.json".
+        shard_index: Index of the shard.
+        num_shards: Total number of shards.
+
+    Returns:
+        Path: Path of the partial output next to `path`.
+    """
+    return path.with_name(f"{path.stem}.shard-{shard_index:05d}-of-{num_shards:05d}{path.suffix}")
@@ -0,0 +1,124 @@
+import json
+from pathlib import Path
+from types import TracebackType
+from typing import Self
+
+import numpy as np
+
+INDEX_FILE = "index.npy"
+NAMES_FILE = "names.json"
+RECORD_ALIGNMENT = 64
+
+SHARD_INDEX_DTYPE = np.dtype(
+    [
+        ("shard", "<i4"),
+        ("image_offset", "<i8"),
+        ("mask_offset", "<i8"),
+        ("channels", "<i4"),
+        ("height", "<i4"),
+        ("width", "<i4"),
+    ],
+)
+
+
+def shard_file_name(shard: int) -> str:
+    """Returns the file name of the shard with the given number."""
+    return f"shard_{shard:05d}.bin"
+
+
+class ShardWriter:
+    """Packs uint8 images and masks into shard files with an offset index.
+
+    Each record is a [C, H, W] image followed by a [H, W] mask, both stored as raw contiguous uint8 bytes
+    aligned to `RECORD_ALIGNMENT` bytes. A new shard is started once the current one exceeds `shard_size`.
+
+    Args:
+        output_dir: Directory where the shard files and the index are written.
+        shard_size: Approximate maximum size of a single shard file in bytes.
+    """
+
+    def __init__(self, output_dir: str | Path, shard_size: int = 1 << 30) -> None:
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.shard_size = shard_size
+
+        self.records: list[tuple[int, int, int, int, int, int]] = []
+        self.names: list[str] = []
+        self.shard = 0
+        self.offset = 0
+        self.file = (self.output_dir / shard_file_name(self.shard)).open("wb")
+
+    def _write_aligned(self, data: np.ndarray) -> int:
+        """Writes the array at the next aligned offset and returns that offset."""
+        padding = -self.offset % RECORD_ALIGNMENT
+        self.file.write(b"\0" * padding)
+        self.offset += padding
+
+        offset = self.offset
+        self.file.write(np.ascontiguousarray(data, dtype=np.uint8).tobytes())
+        self.offset += data.nbytes
+
+        return offset
+
+    def add(self, name: str, image: np.ndarray, mask: np.ndarray) -> None:
+        """Appends a sample to the current shard.
+
+        Args:
+            name: Name of the sample, i.e. the image file name.
+            image: [C, H, W] uint8 image.
+            mask: [H, W] uint8 mask with class IDs.
+
+        Raises:
+            ValueError: If the image and mask shapes do not match.
+        """
+        if image.ndim != 3 or image.shape[1:] != mask.shape:
+            message = f"Image of shape {image.shape} does not match mask of shape {mask.shape} for {name}."
+            raise ValueError(message)
+
+        if self.offset > 0 and self.offset + image.nbytes + mask.nbytes > self.shard_size:
+            self.file.close()
+            self.shard += 1
+            self.offset = 0
+            self.file = (self.output_dir / shard_file_name(self.shard)).open("wb")
+
+        image_offset = self._write_aligned(image)
+        mask_offset = self._write_aligned(mask)
+        channels, height, width = image.shape
+
+        self.records.append((self.shard, image_offset, mask_offset, channels, height, width))
+        self.names.append(name)
+
+    def close(self) -> None:
+        """Closes the current shard and writes the index."""
+        self.file.close()
+        np.save(self.output_dir / INDEX_FILE, np.array(self.records, dtype=SHARD_INDEX_DTYPE))
+        with (self.output_dir / NAMES_FILE).open("w") as f:
+            json.dump(self.names, f)
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+
+def load_shard_index(shards_dir: str | Path) -> tuple[np.ndarray, list[str]]:
+    """Loads the offset index of packed shards.
+
+    Args:
+        shards_dir: Directory containing the shard files and the index.
+
+    Returns:
+        tuple[np.ndarray, list[str]]: Structured index array with `SHARD_INDEX_DTYPE` and the sample names.
+    """
+    shards_dir = Path(shards_dir)
+    index = np.load(shards_dir / INDEX_FILE)
+    with (shards_dir / NAMES_FILE).open("r") as f:
+        names: list[str] = json.load(f)
+
+    return index, names
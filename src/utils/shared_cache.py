@@ -0,0 +1,187 @@
+import multiprocessing
+from multiprocessing.shared_memory import SharedMemory
+import os
+import pickle
+from typing import Any
+
+import numpy as np
+
+SLOT_DTYPE = np.dtype([("key", "<i8"), ("offset", "<i8"), ("size", "<i8"), ("last_access", "<i8")])
+HEADER_FIELDS = ("clock", "hits", "misses", "evictions")
+CLOCK, HITS, MISSES, EVICTIONS = range(len(HEADER_FIELDS))
+EMPTY_KEY = -1
+
+
+class SharedSampleCache:
+    """LRU cache of pickled samples in shared memory, shared by all DataLoader workers.
+
+    Sample bytes live in a single shared memory arena of `capacity_bytes`. A fixed table of slots in a second
+    shared memory block records the key, location, size and last access of every entry. All operations hold a
+    process-shared lock, and the least recently used entries are evicted until a new entry fits.
+
+    The cache must be created in the main process before the DataLoader starts its workers. Forked workers
+    inherit it, spawned workers attach to the same shared memory when the dataset is unpickled. Only the creating
+    process unlinks the shared memory on `close`, forked and spawned workers merely detach from it.
+
+    Args:
+        capacity_bytes: Size of the arena for the sample bytes.
+        max_entries: Maximum number of entries in the cache.
+    """
+
+    def __init__(self, capacity_bytes: int, max_entries: int = 65536) -> None:
+        self.capacity_bytes = capacity_bytes
+        self.max_entries = max_entries
+        # A lock of the fork context cannot be pickled for spawned workers, one of the spawn context works for both.
+        self.lock = multiprocessing.get_context("spawn").Lock()
+
+        self._data_memory = SharedMemory(create=True, size=capacity_bytes)
+        self._meta_memory = SharedMemory(
+            create=True, size=len(HEADER_FIELDS) * 8 + max_entries * SLOT_DTYPE.itemsize,
+        )
+        self._owner_pid: int | None = os.getpid()
+        self._attach_views()
+
+        self._header[:] = 0
+        self._slots["key"] = EMPTY_KEY
+
+    def _attach_views(self) -> None:
+        """Creates numpy views of the header and slot table in the metadata shared memory."""
+        self._header = np.ndarray((len(HEADER_FIELDS),), dtype=np.int64, buffer=self._meta_memory.buf)
+        self._slots = np.ndarray(
+            (self.max_entries,), dtype=SLOT_DTYPE, buffer=self._meta_memory.buf, offset=len(HEADER_FIELDS) * 8,
+        )
+
+    def __getstate__(self) -> dict[str, Any]:
+        return {
+            "capacity_bytes": self.capacity_bytes,
+            "max_entries": self.max_entries,
+            "lock": self.lock,
+            "data_name": self._data_memory.name,
+            "meta_name": self._meta_memory.name,
+        }
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.capacity_bytes = state["capacity_bytes"]
+        self.max_entries = state["max_entries"]
+        self.lock = state["lock"]
+
+        self._data_memory = SharedMemory(name=state["data_name"])
+        self._meta_memory = SharedMemory(name=state["meta_name"])
+        # Attaching registers the memory with the resource tracker again. Workers share the tracker of the creating
+        # process, where the memory is already registered, so it is not unregistered here: that would drop the
+        # registration of the creating process, whose `close` then fails to unregister it.
+        self._owner_pid = None
+        self._attach_views()
+
+    def _tick(self) -> int:
+        """Advances the logical clock used for the LRU order. Must be called with the lock held."""
+        self._header[CLOCK] += 1
+        return int(self._header[CLOCK])
+
+    def _find(self, key: int) -> int | None:
+        """Returns the slot index of the key or None. Must be called with the lock held."""
+        matches = np.flatnonzero(self._slots["key"] == key)
+        return int(matches[0]) if len(matches) else None
+
+    def _evict_lru(self) -> None:
+        """Evicts the least recently used entry. Must be called with the lock held."""
+        valid = np.flatnonzero(self._slots["key"] != EMPTY_KEY)
+        slot = valid[np.argmin(self._slots["last_access"][valid])]
+        self._slots["key"][slot] = EMPTY_KEY
+        self._header[EVICTIONS] += 1
+
+    def _allocate(self, size: int) -> int:
+        """Finds a free range of the arena, evicting entries until one fits. Must be called with the lock held.
+
+        Args:
+            size: Number of bytes to allocate.
+
+        Returns:
+            int: Offset of the allocated range in the arena.
+        """
+        while True:
+            valid = self._slots[self._slots["key"] != EMPTY_KEY]
+            order = np.argsort(valid["offset"])
+            starts, ends = valid["offset"][order], valid["offset"][order] + valid["size"][order]
+
+            gap_starts = np.concatenate(([0], ends))
+            gap_ends = np.concatenate((starts, [self.capacity_bytes]))
+            fitting = np.flatnonzero(gap_ends - gap_starts >= size)
+            if len(fitting) and (len(valid) < self.max_entries):
+                return int(gap_starts[fitting[0]])
+
+            self._evict_lru()
+
+    def get(self, key: int) -> Any | None:
+        """Returns the cached sample for the key or None on a miss.
+
+        Args:
+            key: Non-negative key of the sample, e.g. its dataset index.
+
+        Returns:
+            Any | None: Unpickled sample or None.
+        """
+        with self.lock:
+            slot = self._find(key)
+            if slot is None:
+                self._header[MISSES] += 1
+                return None
+
+            self._slots["last_access"][slot] = self._tick()
+            self._header[HITS] += 1
+            offset, size = int(self._slots["offset"][slot]), int(self._slots["size"][slot])
+            payload = bytes(self._data_memory.buf[offset : offset + size])
+
+        return pickle.loads(payload)
+
+    def put(self, key: int, value: Any) -> None:
+        """Stores a sample in the cache. Samples larger than the whole arena are not cached.
+
+        Args:
+            key: Non-negative key of the sample, e.g. its dataset index.
+            value: Picklable sample.
+        """
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(payload) > self.capacity_bytes:
+            return
+
+        with self.lock:
+            if (slot := self._find(key)) is not None:
+                self._slots["last_access"][slot] = self._tick()
+                return
+
+            offset = self._allocate(len(payload))
+            self._data_memory.buf[offset : offset + len(payload)] = payload
+
+            slot = int(np.flatnonzero(self._slots["key"] == EMPTY_KEY)[0])
+            self._slots[slot] = (key, offset, len(payload), self._tick())
+
+    def stats(self) -> dict[str, int]:
+        """Returns the cache counters.
+
+        Returns:
+            dict[str, int]: keys:
+                - hits, misses, evictions: Counters accumulated over all processes.
+                - entries: Number of cached samples.
+                - used_bytes: Number of bytes used by the cached samples.
+                - capacity_bytes: Size of the arena.
+        """
+        with self.lock:
+            valid = self._slots[self._slots["key"] != EMPTY_KEY]
+            return {
+                "hits": int(self._header[HITS]),
+                "misses": int(self._header[MISSES]),
+                "evictions": int(self._header[EVICTIONS]),
+                "entries": len(valid),
+                "used_bytes": int(valid["size"].sum()),
+                "capacity_bytes": self.capacity_bytes,
+            }
+
+    def close(self) -> None:
+        """Releases the shared memory. The creating process also unlinks it, forked processes inherit its pid."""
+        del self._header, self._slots
+        self._data_memory.close()
+        self._meta_memory.close()
+        if os.getpid() == self._owner_pid:
+            self._data_memory.unlink()
+            self._meta_memory.unlink()
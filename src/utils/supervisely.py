@@ -0,0 +1,24 @@
+# Layout and classes of the CT log datasets in the Supervisely format. They live outside the dataset classes, so
+# scripts that only need them do not import torch.
+ANNOTATIONS_DIR = "ann"
+IMAGE_DIR = "img"
+IMAGE_INFO_DIR = "img_info"
+
+CLASS_TO_ID: dict[str, int] = {
+    "background": 0,
+    "compression_wood": 1,
+    "crack": 2,
+    "insects": 3,
+    "knot_sound": 4,
+    "moisture": 5,
+    "moisture_real": 6,
+    "pith": 7,
+    "resign_pocket": 8,
+    "rot": 9,
+    "wood": 10,
+}
+
+
+def supervisely_layout() -> dict[str, str]:
+    """Returns for every directory of a dataset the suffix of its files after the image file name."""
+    return {ANNOTATIONS_DIR: ".json", IMAGE_DIR: "", IMAGE_INFO_DIR: ".json"}
@@ -0,0 +1,163 @@
+import json
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from src.utils.mask import mask_to_base64
+
+DEFAULT_GEOMETRY_MIX: dict[str, float] = {"point": 0.1, "polygon": 0.6, "bitmap": 0.3}
+
+
+def random_polygon(
+    rng: np.random.Generator, center: tuple[float, float], radius: float, num_vertices: int,
+) -> list[list[int]]:
+    """Creates a random star-shaped polygon around a center.
+
+    Args:
+        rng: Random number generator.
+        center: (x, y) center of the polygon.
+        radius: Mean distance of the vertices from the center.
+        num_vertices: Number of vertices.
+
+    Returns:
+        list[list[int]]: Polygon exterior as a list of [x, y] points.
+    """
+    angles = np.sort(rng.uniform(0, 2 * np.pi, num_vertices))
+    radii = radius * rng.uniform(0.6, 1.0, num_vertices)
+    xs = center[0] + radii * np.cos(angles)
+    ys = center[1] + radii * np.sin(angles)
+
+    return np.rint(np.stack([xs, ys], axis=1)).astype(int).tolist()
+
+
+def random_bitmap(rng: np.random.Generator, shape: tuple[int, int], max_size: int) -> tuple[np.ndarray, list[int]]:
+    """Creates a random elliptic blob bitmap that lies fully inside the frame.
+
+    Args:
+        rng: Random number generator.
+        shape: (height, width) of the frame.
+        max_size: Maximum height and width of the bitmap.
+
+    Returns:
+        tuple[np.ndarray, list[int]]: [h, w] boolean bitmap and its [x, y] origin.
+    """
+    height, width = shape
+    bitmap_height = int(rng.integers(2, max(3, min(max_size, height))))
+    bitmap_width = int(rng.integers(2, max(3, min(max_size, width))))
+
+    blob = Image.new("L", (bitmap_width, bitmap_height), 0)
+    ImageDraw.Draw(blob).ellipse([0, 0, bitmap_width - 1, bitmap_height - 1], fill=1)
+    bitmap = np.asarray(blob, dtype=bool)
+
+    origin = [int(rng.integers(0, width - bitmap_width + 1)), int(rng.integers(0, height - bitmap_height + 1))]
+    return bitmap, origin
+
+
+def random_object(
+    rng: np.random.Generator, geometry_type: str, class_title: str, shape: tuple[int, int],
+) -> dict[str, Any]:
+    """Creates a random Supervisely object of the given geometry type inside the frame.
+
+    Args:
+        rng: Random number generator.
+        geometry_type: "point", "polygon" or "bitmap".
+        class_title: Class title of the object.
+        shape: (height, width) of the frame.
+
+    Returns:
+        dict[str, Any]: Supervisely object.
+    """
+    height, width = shape
+    obj: dict[str, Any] = {"classTitle": class_title, "geometryType": geometry_type, "tags": [], "description": ""}
+
+    if geometry_type == "point":
+        obj["points"] = {"exterior": [[int(rng.integers(0, width)), int(rng.integers(0, height))]], "interior": []}
+
+    elif geometry_type == "polygon":
+        radius = rng.uniform(0.02, 0.25) * min(height, width)
+        center = (rng.uniform(radius, width - radius), rng.uniform(radius, height - radius))
+        exterior = random_polygon(rng, center, radius, int(rng.integers(3, 24)))
+        obj["points"] = {"exterior": exterior, "interior": []}
+
+    elif geometry_type == "bitmap":
+        bitmap, origin = random_bitmap(rng, shape, max(2, min(height, width) // 4))
+        obj["bitmap"] = {"data": mask_to_base64(bitmap), "origin": origin}
+
+    else:
+        message = f"Unsupported geometry type: {geometry_type}"
+        raise ValueError(message)
+
+    return obj
+
+
+def random_image(rng: np.random.Generator, shape: tuple[int, int]) -> Image.Image:
+    """Creates a noisy grayscale RGB image with a bright log cross-section in the middle."""
+    height, width = shape
+    pixels = rng.integers(0, 64, size=(height, width), dtype=np.uint8)
+
+    image = Image.fromarray(pixels).convert("RGB")
+    ImageDraw.Draw(image).ellipse([width * 0.1, height * 0.1, width * 0.9, height * 0.9], fill=(150, 150, 150))
+
+    return image
+
+
+def generate_synthetic_dataset(
+    out_dir: str | Path,
+    num_items: int,
+    resolutions: list[tuple[int, int]],
+    class_titles: list[str],
+    objects_per_item: int = 20,
+    geometry_mix: dict[str, float] | None = None,
+    seed: int = 0,
+) -> list[str]:
+    """Writes a synthetic dataset in the Supervisely format with "ann", "img" and "img_info" directories.
+
+    Args:
+        out_dir: Directory where the dataset is written.
+        num_items: Number of images.
+        resolutions: (height, width) resolutions the images are drawn from uniformly.
+        class_titles: Class titles the objects are drawn from uniformly.
+        objects_per_item: Number of objects per annotation.
+        geometry_mix: Relative frequency of the "point", "polygon" and "bitmap" geometry types.
+        seed: Seed of the random number generator.
+
+    Returns:
+        list[str]: Names of the generated images.
+    """
+    out_dir = Path(out_dir)
+    for directory in ("ann", "img", "img_info"):
+        (out_dir / directory).mkdir(parents=True, exist_ok=True)
+
+    geometry_mix = geometry_mix if geometry_mix is not None else DEFAULT_GEOMETRY_MIX
+    geometry_types = list(geometry_mix)
+    probabilities = np.array([geometry_mix[geometry] for geometry in geometry_types], dtype=np.float64)
+    probabilities /= probabilities.sum()
+
+    rng = np.random.default_rng(seed)
+    names = []
+    for idx in range(num_items):
+        name = f"synthetic_{idx:06d}.png"
+        height, width = resolutions[int(rng.integers(0, len(resolutions)))]
+
+        objects = [
+            random_object(
+                rng,
+                geometry_types[int(rng.choice(len(geometry_types), p=probabilities))],
+                class_titles[int(rng.integers(0, len(class_titles)))],
+                (height, width),
+            )
+            for _ in range(objects_per_item)
+        ]
+        annotation = {"description": "", "tags": [], "size": {"height": height, "width": width}, "objects": objects}
+
+        random_image(rng, (height, width)).save(out_dir / "img" / name)
+        with (out_dir / "ann" / f"{name}.json").open("w") as f:
+            json.dump(annotation, f)
+        with (out_dir / "img_info" / f"{name}.json").open("w") as f:
+            json.dump({"id": idx, "name": name, "height": height, "width": width}, f)
+
+        names.append(name)
+
+    return names
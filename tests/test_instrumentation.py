@@ -0,0 +1,62 @@
+import multiprocessing
+import random
+
+import pytest
+
+from src.utils.instrumentation import RESERVOIR_SIZE, Instrumentation, StageStats
+
+
+def record_stages(instrumentation: Instrumentation, count: int) -> None:
+    for _ in range(count):
+        instrumentation.record("decode", 0.5, nbytes=10, pixels=1)
+
+
+def test_forked_process_sends_remaining_records_on_exit() -> None:
+    instrumentation = Instrumentation()
+    # No periodic send happens within the lifetime of the child, only the final one.
+    instrumentation.enable(share_across_processes=True, flush_interval=3600)
+    record_stages(instrumentation, 1)
+
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=record_stages, args=(instrumentation, 5)) for _ in range(2)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    # The records of the parent are not inherited by the children, so they are not counted twice.
+    summary = instrumentation.poll()
+    assert summary["decode"]["count"] == 11
+    assert summary["decode"]["total_s"] == pytest.approx(5.5)
+    assert summary["decode"]["bytes"] == 110
+
+
+def test_records_are_bounded() -> None:
+    instrumentation = Instrumentation()
+    instrumentation.enable()
+    for idx in range(3 * RESERVOIR_SIZE):
+        instrumentation.record("decode", idx * 1e-3, pixels=2)
+
+    stats = instrumentation.records["decode"]
+    assert stats.count == 3 * RESERVOIR_SIZE
+    assert stats.pixels == 6 * RESERVOIR_SIZE
+    assert len(stats.samples) == RESERVOIR_SIZE
+
+    summary = instrumentation.summary()["decode"]
+    assert summary["total_s"] == pytest.approx(sum(idx * 1e-3 for idx in range(3 * RESERVOIR_SIZE)))
+    assert summary["p50_ms"] == pytest.approx(1.5 * RESERVOIR_SIZE, rel=0.1)
+
+
+def test_merge_weights_samples_by_count() -> None:
+    rng = random.Random(0)
+    fast, slow = StageStats(), StageStats()
+    for _ in range(9 * RESERVOIR_SIZE):
+        fast.add(0.001, 0, 0, rng)
+    for _ in range(RESERVOIR_SIZE):
+        slow.add(1.0, 0, 0, rng)
+
+    fast.merge(slow, rng)
+
+    assert fast.count == 10 * RESERVOIR_SIZE
+    assert len(fast.samples) == RESERVOIR_SIZE
+    assert fast.samples.count(1.0) / RESERVOIR_SIZE == pytest.approx(0.1, abs=0.03)
@@ -0,0 +1,70 @@
+import json
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from src.utils.integrity import check_dataset
+from src.utils.supervisely import CLASS_TO_ID, supervisely_layout
+from src.utils.synthetic import generate_synthetic_dataset
+
+CLASS_TITLES = [title.replace("_", " ").capitalize() for title in CLASS_TO_ID]
+
+
+@pytest.fixture
+def data_dir(tmp_path: Path) -> Path:
+    generate_synthetic_dataset(
+        tmp_path,
+        num_items=8,
+        resolutions=[(40, 50)],
+        class_titles=CLASS_TITLES,
+        objects_per_item=6,
+        geometry_mix={"polygon": 0.5, "bitmap": 0.5},
+    )
+    return tmp_path
+
+
+def corrupt_annotation(data_dir: Path, idx: int, corrupt: Any) -> None:
+    path = data_dir / "ann" / f"synthetic_{idx:06d}.png.json"
+    annotation = json.loads(path.read_text())
+    corrupt(annotation)
+    path.write_text(json.dumps(annotation))
+
+
+def first_bitmap(annotation: dict[str, Any]) -> dict[str, Any]:
+    return next(obj for obj in annotation["objects"] if obj["geometryType"] == "bitmap")
+
+
+def test_check_dataset_passes_valid_dataset(data_dir: Path) -> None:
+    report = check_dataset(data_dir, supervisely_layout(), frozenset(CLASS_TO_ID), workers=1)
+
+    assert report["items"] == 8
+    assert report["passed"], report["issues"]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_check_dataset_reports_corrupted_annotations(data_dir: Path, workers: int) -> None:
+    corrupt_annotation(data_dir, 0, lambda ann: first_bitmap(ann)["bitmap"].update(origin=["1", "2"]))
+    corrupt_annotation(data_dir, 1, lambda ann: first_bitmap(ann)["bitmap"].update(origin=[1]))
+    corrupt_annotation(data_dir, 2, lambda ann: first_bitmap(ann)["bitmap"].update(data="not base64"))
+    corrupt_annotation(data_dir, 3, lambda ann: ann.update(objects=None))
+    corrupt_annotation(data_dir, 4, lambda ann: ann["objects"].extend([None, "bitmap", 3]))
+    corrupt_annotation(data_dir, 5, lambda ann: ann["objects"][0].update(classTitle=None))
+    corrupt_annotation(data_dir, 6, lambda ann: ann.pop("size"))
+    (data_dir / "ann" / "synthetic_000007.png.json").write_text("{not json")
+
+    report = check_dataset(data_dir, supervisely_layout(), frozenset(CLASS_TO_ID), workers=workers)
+    found = {(issue["item"], issue["check"]) for issue in report["issues"]}
+
+    assert not report["passed"]
+    assert found == {
+        ("synthetic_000000.png", "invalid_bitmap"),
+        ("synthetic_000001.png", "invalid_bitmap"),
+        ("synthetic_000002.png", "invalid_bitmap"),
+        ("synthetic_000003.png", "invalid_annotation"),
+        ("synthetic_000004.png", "invalid_object"),
+        ("synthetic_000005.png", "invalid_class_title"),
+        ("synthetic_000006.png", "invalid_annotation"),
+        ("synthetic_000007.png", "invalid_annotation"),
+    }
+    assert report["counts"]["invalid_object"] == 3
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+from src.utils.mask_codec import (
+    decode_rle,
+    decode_rle_many,
+    decode_rle_region,
+    encode_rle,
+    encode_rle_many,
+)
+
+
+def random_mask(rng: np.random.Generator, shape: tuple[int, int], num_classes: int = 4) -> np.ndarray:
+    # Repeating the values of a coarse grid gives runs of varying length that cross row boundaries.
+    coarse = rng.integers(0, num_classes, size=(shape[0], max(1, shape[1] // 3) + 1), dtype=np.uint8)
+    return np.repeat(coarse, 3, axis=1)[:, : shape[1]]
+
+
+MASKS = {
+    "random": random_mask(np.random.default_rng(0), (37, 53)),
+    "noise": np.random.default_rng(1).integers(0, 3, size=(16, 9), dtype=np.uint8),
+    "background": np.zeros((12, 20), dtype=np.uint8),
+    "single_run": np.full((7, 5), 6, dtype=np.uint8),
+    "single_row": random_mask(np.random.default_rng(2), (1, 40)),
+    "single_column": random_mask(np.random.default_rng(3), (30, 1)),
+    "no_rows": np.zeros((0, 8), dtype=np.uint8),
+    "no_columns": np.zeros((8, 0), dtype=np.uint8),
+}
+
+
+def regions(shape: tuple[int, int]) -> list[tuple[int, int, int, int]]:
+    """Returns (top, left, height, width) regions covering the whole mask, its edges, corners and interior."""
+    height, width = shape
+    candidates = [
+        (0, 0, height, width),
+        (0, 0, min(height, 1), width),
+        (height - min(height, 1), 0, min(height, 1), width),
+        (0, 0, height, min(width, 1)),
+        (0, width - min(width, 1), height, min(width, 1)),
+        (0, 0, height // 2, width // 2),
+        (height - height // 2, width - width // 2, height // 2, width // 2),
+        (height // 3, width // 3, height // 3, width // 3),
+        (height // 2, 0, 0, width),
+    ]
+    return sorted(set(candidates))
+
+
+@pytest.mark.parametrize("name", MASKS)
+def test_encode_decode_roundtrip(name: str) -> None:
+    mask = MASKS[name]
+    decoded = decode_rle(encode_rle(mask))
+
+    assert decoded.dtype == np.uint8
+    np.testing.assert_array_equal(decoded, mask)
+
+
+@pytest.mark.parametrize("name", MASKS)
+def test_decode_rle_region_matches_full_decode(name: str) -> None:
+    mask = MASKS[name]
+    data = encode_rle(mask)
+    full = decode_rle(data)
+
+    for top, left, height, width in regions(mask.shape):
+        region = decode_rle_region(data, top, left, height, width)
+        np.testing.assert_array_equal(
+            region, full[top : top + height, left : left + width], err_msg=f"{top=} {left=} {height=} {width=}",
+        )
+
+
+def test_decode_rle_region_matches_full_decode_on_random_regions() -> None:
+    rng = np.random.default_rng(4)
+    for _ in range(50):
+        shape = (int(rng.integers(1, 40)), int(rng.integers(1, 40)))
+        mask = random_mask(rng, shape, num_classes=int(rng.integers(1, 5)))
+        data = encode_rle(mask)
+
+        top, left = int(rng.integers(0, shape[0])), int(rng.integers(0, shape[1]))
+        height, width = int(rng.integers(1, shape[0] - top + 1)), int(rng.integers(1, shape[1] - left + 1))
+        np.testing.assert_array_equal(
+            decode_rle_region(data, top, left, height, width), mask[top : top + height, left : left + width],
+        )
+
+
+def test_bulk_codec_matches_single_codec() -> None:
+    masks = list(MASKS.values())
+    blobs = encode_rle_many(masks)
+
+    assert blobs == [encode_rle(mask) for mask in masks]
+    for decoded, mask in zip(decode_rle_many(blobs), masks):
+        np.testing.assert_array_equal(decoded, mask)
+
+
+def test_bulk_codec_of_no_masks() -> None:
+    assert encode_rle_many([]) == []
+    assert decode_rle_many([]) == []
@@ -0,0 +1,80 @@
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pytest
+
+from src.dataset.ct_log_mask_preprocessor import CTLogMaskPreprocessor
+from src.utils.mask import mask_to_base64
+from src.utils.rasterizer import rasterize_objects
+from src.utils.synthetic import generate_synthetic_dataset
+
+# Class titles as Supervisely stores them, e.g. "Knot sound", which both paths normalize to the keys of class_to_id.
+CLASS_TITLES = [title.replace("_", " ").capitalize() for title in CTLogMaskPreprocessor.class_to_id]
+
+
+@pytest.fixture
+def preprocessor(tmp_path: Path) -> CTLogMaskPreprocessor:
+    # Many objects on small frames, so objects of different classes overlap in every item.
+    generate_synthetic_dataset(
+        tmp_path, num_items=6, resolutions=[(48, 64), (33, 17)], class_titles=CLASS_TITLES, objects_per_item=40,
+    )
+    return CTLogMaskPreprocessor(tmp_path)
+
+
+def assert_matches_legacy(preprocessor: CTLogMaskPreprocessor, annotation: dict[str, Any]) -> None:
+    shape = (annotation["size"]["height"], annotation["size"]["width"])
+    expected = preprocessor.rasterize_legacy(annotation, shape).numpy()
+    actual = rasterize_objects(
+        annotation["objects"], shape, preprocessor.class_to_id, preprocessor.class_priority,
+    )
+
+    assert actual.shape == expected.shape
+    np.testing.assert_array_equal(actual, expected)
+
+
+def bitmap_object(class_title: str, bitmap: np.ndarray, origin: tuple[int, int]) -> dict[str, Any]:
+    return {
+        "classTitle": class_title,
+        "geometryType": "bitmap",
+        "bitmap": {"data": mask_to_base64(bitmap), "origin": list(origin)},
+    }
+
+
+def point_object(class_title: str, x: int, y: int) -> dict[str, Any]:
+    return {"classTitle": class_title, "geometryType": "point", "points": {"exterior": [[x, y]], "interior": []}}
+
+
+def polygon_object(class_title: str, exterior: list[list[int]]) -> dict[str, Any]:
+    return {"classTitle": class_title, "geometryType": "polygon", "points": {"exterior": exterior, "interior": []}}
+
+
+def test_rasterize_objects_matches_legacy_on_synthetic_annotations(preprocessor: CTLogMaskPreprocessor) -> None:
+    assert len(preprocessor) == 6
+    for idx in range(len(preprocessor)):
+        assert_matches_legacy(preprocessor, preprocessor.load_annotation(idx))
+
+
+def test_rasterize_objects_matches_legacy_at_frame_edges(preprocessor: CTLogMaskPreprocessor) -> None:
+    height, width = 20, 30
+    blob = np.ones((6, 8), dtype=bool)
+    blob[0, 0] = blob[-1, -1] = False
+
+    objects = [
+        polygon_object("Wood", [[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]]),
+        # Overlapping classes, drawn in an order different from their priority.
+        polygon_object("Moisture", [[2, 2], [20, 3], [12, 18]]),
+        polygon_object("Crack", [[5, 5], [25, 8], [10, 15]]),
+        # Bitmaps touching every edge of the frame.
+        bitmap_object("Rot", blob, (0, 0)),
+        bitmap_object("Knot sound", blob, (width - blob.shape[1], height - blob.shape[0])),
+        bitmap_object("Insects", blob, (width - blob.shape[1], 0)),
+        bitmap_object("Resign pocket", np.ones((height, 2), dtype=bool), (14, 0)),
+        # Pith points whose blobs are clipped by the frame.
+        point_object("Pith", 0, 0),
+        point_object("Pith", width - 1, height - 1),
+        point_object("Pith", 15, 10),
+    ]
+    annotation = {"size": {"height": height, "width": width}, "objects": objects}
+
+    assert_matches_legacy(preprocessor, annotation)
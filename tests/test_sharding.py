@@ -0,0 +1,107 @@
+import json
+from pathlib import Path
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from src.utils.manifest import load_manifest
+from src.utils.sharding import shard_path
+from src.utils.supervisely import CLASS_TO_ID
+from src.utils.synthetic import generate_synthetic_dataset
+
+ROOT = Path(__file__).resolve().parent.parent
+NUM_SHARDS = 3
+
+
+def run_preprocessing(source_dir: Path, output_dir: Path, *args: str) -> subprocess.Popen:
+    command = [
+        sys.executable,
+        "-m",
+        "scripts.preprocess_dataset",
+        "--source_data_dir",
+        str(source_dir),
+        "--output_data_dir",
+        str(output_dir),
+        *args,
+    ]
+    return subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+
+
+def wait(process: subprocess.Popen) -> None:
+    _, stderr = process.communicate()
+    assert process.returncode == 0, stderr
+
+
+def load_manifest_without_mask_mtimes(output_dir: Path) -> dict:
+    manifest = load_manifest(output_dir / "manifest.json")
+    for entry in manifest.values():
+        entry["mask"].pop("mtime_ns")
+    return manifest
+
+
+@pytest.fixture(scope="module")
+def outputs(tmp_path_factory: pytest.TempPathFactory) -> tuple[Path, Path]:
+    tmp_path = tmp_path_factory.mktemp("sharding")
+    source_dir, single_dir, sharded_dir = tmp_path / "raw", tmp_path / "single", tmp_path / "sharded"
+    generate_synthetic_dataset(
+        source_dir, num_items=16, resolutions=[(48, 64), (40, 40)], class_titles=list(CLASS_TO_ID),
+    )
+
+    # The single-node run and all shards run concurrently in separate processes.
+    processes = [run_preprocessing(source_dir, single_dir)]
+    processes += [
+        run_preprocessing(source_dir, sharded_dir, "--num_shards", str(NUM_SHARDS), "--shard_index", str(index))
+        for index in range(NUM_SHARDS)
+    ]
+    for process in processes:
+        wait(process)
+    wait(run_preprocessing(source_dir, sharded_dir, "--num_shards", str(NUM_SHARDS), "--merge"))
+
+    return single_dir, sharded_dir
+
+
+def test_every_shard_processes_a_disjoint_part(outputs: tuple[Path, Path]) -> None:
+    _, sharded_dir = outputs
+    names = [
+        set(load_manifest(shard_path(sharded_dir / "manifest.json", index, NUM_SHARDS)))
+        for index in range(NUM_SHARDS)
+    ]
+
+    assert sum(map(len, names)) == 16
+    assert set().union(*names) == set(load_manifest(sharded_dir / "manifest.json"))
+
+
+def test_merged_masks_match_single_node_run(outputs: tuple[Path, Path]) -> None:
+    single_dir, sharded_dir = outputs
+    single_masks = sorted(path.name for path in (single_dir / "mask").iterdir())
+
+    assert len(single_masks) == 16
+    assert sorted(path.name for path in (sharded_dir / "mask").iterdir()) == single_masks
+    for name in single_masks:
+        assert (sharded_dir / "mask" / name).read_bytes() == (single_dir / "mask" / name).read_bytes()
+
+
+def test_merged_manifest_matches_single_node_run(outputs: tuple[Path, Path]) -> None:
+    single_dir, sharded_dir = outputs
+
+    assert load_manifest_without_mask_mtimes(sharded_dir) == load_manifest_without_mask_mtimes(single_dir)
+
+
+def test_merged_resolutions_match_single_node_run(outputs: tuple[Path, Path]) -> None:
+    single_dir, sharded_dir = outputs
+    single = json.loads((single_dir / "resolutions.json").read_text())
+    merged = json.loads((sharded_dir / "resolutions.json").read_text())
+
+    assert {key: value for key, value in merged.items() if not key.endswith("-recommended-resolution")} == single
+    assert {"square-recommended-resolution", "non-square-recommended-resolution"} <= set(merged)
+
+
+def test_merged_class_stats_match_single_node_run(outputs: tuple[Path, Path]) -> None:
+    single_dir, sharded_dir = outputs
+    with np.load(single_dir / "class_stats.npz") as single, np.load(sharded_dir / "class_stats.npz") as merged:
+        assert set(merged.files) == set(single.files)
+        # The source stamp holds the modification times of the masks, which differ between the runs.
+        for key in set(single.files) - {"source_stamp"}:
+            np.testing.assert_array_equal(merged[key], single[key], err_msg=key)
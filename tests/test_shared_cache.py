@@ -0,0 +1,106 @@
+from collections.abc import Iterator
+import multiprocessing
+from multiprocessing.shared_memory import SharedMemory
+import pickle
+
+import pytest
+
+from src.utils.shared_cache import SharedSampleCache
+
+
+@pytest.fixture
+def cache() -> Iterator[SharedSampleCache]:
+    cache = SharedSampleCache(capacity_bytes=4096, max_entries=4)
+    yield cache
+    cache.close()
+
+
+def payload(size: int) -> bytes:
+    """Returns a value whose pickle takes slightly more than `size` bytes."""
+    return b"x" * size
+
+
+def use_cache(cache: SharedSampleCache, results: "multiprocessing.Queue") -> None:
+    results.put(cache.get(0))
+    cache.put(10, {"from": "worker"})
+    results.put(cache.get(99))
+    cache.close()
+
+
+def test_get_returns_stored_sample_and_counts_hits_and_misses(cache: SharedSampleCache) -> None:
+    sample = {"image": list(range(10)), "path": "0001.png"}
+    assert cache.get(0) is None
+    cache.put(0, sample)
+
+    assert cache.get(0) == sample
+    assert cache.get(0) == sample
+    assert cache.get(1) is None
+    assert cache.stats() == {
+        "hits": 2,
+        "misses": 2,
+        "evictions": 0,
+        "entries": 1,
+        "used_bytes": len(pickle.dumps(sample, protocol=pickle.HIGHEST_PROTOCOL)),
+        "capacity_bytes": 4096,
+    }
+
+
+def test_least_recently_used_entry_is_evicted_when_the_arena_is_full(cache: SharedSampleCache) -> None:
+    for key in range(3):
+        cache.put(key, payload(1200))
+    # Reading 0 makes 1 the least recently used entry.
+    assert cache.get(0) is not None
+
+    cache.put(3, payload(1200))
+
+    assert cache.get(1) is None
+    assert all(cache.get(key) is not None for key in (0, 2, 3))
+    assert cache.stats()["evictions"] == 1
+
+
+def test_least_recently_used_entry_is_evicted_when_all_slots_are_taken(cache: SharedSampleCache) -> None:
+    for key in range(4):
+        cache.put(key, key)
+    cache.put(0, 0)  # Storing an existing key only refreshes it.
+
+    cache.put(4, 4)
+
+    assert cache.get(1) is None
+    assert [cache.get(key) for key in (0, 2, 3, 4)] == [0, 2, 3, 4]
+    assert cache.stats()["entries"] == 4
+
+
+def test_samples_larger_than_the_arena_are_not_cached(cache: SharedSampleCache) -> None:
+    cache.put(0, payload(5000))
+
+    assert cache.get(0) is None
+    assert cache.stats()["entries"] == 0
+
+
+@pytest.mark.parametrize("start_method", ["spawn", "fork"])
+def test_worker_process_shares_the_cache(cache: SharedSampleCache, start_method: str) -> None:
+    cache.put(0, "from main")
+    context = multiprocessing.get_context(start_method)
+    results = context.Queue()
+
+    # Spawned workers receive the cache pickled, forked workers inherit it.
+    process = context.Process(target=use_cache, args=(cache, results))
+    process.start()
+    assert results.get(timeout=60) == "from main"
+    assert results.get(timeout=60) is None
+    process.join(timeout=60)
+
+    assert process.exitcode == 0
+    # The worker closed the cache without unlinking the shared memory of the main process.
+    assert cache.get(10) == {"from": "worker"}
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 1
+
+
+def test_close_unlinks_the_shared_memory_in_the_creating_process() -> None:
+    cache = SharedSampleCache(capacity_bytes=1024, max_entries=2)
+    name = cache._data_memory.name
+    cache.close()
+
+    with pytest.raises(FileNotFoundError):
+        SharedMemory(name=name)